@@ -0,0 +1,246 @@
+"""Asyncio HTTP server for the agent (AGENT_SERVER_MODE=async).
+
+Serves the same /chat, /chat/stream, /health, /ready and /metrics contract as AgentHandler,
+but each turn awaits the graph through ainvoke so a slow LLM call only parks
+its own coroutine. Minimal HTTP/1.1: Content-Length bodies and keep-alive.
+SIGTERM drains: idle connections close, in-flight turns get
+AGENT_DRAIN_TIMEOUT seconds to finish.
+"""
+
+import os
+import signal
+import socket
+import asyncio
+from http import HTTPStatus
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable
+
+import metrics
+import startup
+import serialization
+from http_clients import aclose_clients
+
+MAX_CONCURRENCY = int(os.environ.get("AGENT_MAX_CONCURRENCY", 256))
+MAX_CONNECTIONS = int(os.environ.get("AGENT_MAX_CONNECTIONS", 1024))
+QUEUE_TIMEOUT = float(os.environ.get("AGENT_QUEUE_TIMEOUT", 10))
+MAX_BODY_BYTES = int(os.environ.get("AGENT_MAX_BODY_BYTES", 1 << 20))
+KEEPALIVE_TIMEOUT = float(os.environ.get("AGENT_KEEPALIVE_TIMEOUT", 75))
+DRAIN_TIMEOUT = float(os.environ.get("AGENT_DRAIN_TIMEOUT", 30))
+
+# (session_id, message, tenant from the X-Tenant-Id header)
+TurnHandler = Callable[[str, str, str | None], Awaitable[dict]]
+StreamHandler = Callable[[str, str, str | None], AsyncIterator[bytes]]
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _encode(status: int, body: bytes, content_type: str = "application/json",
+            keep_alive: bool = True) -> tuple[bytes, bytes]:
+    """Response head and body as separate buffers for writelines, which sends
+    them with one sendmsg (Python 3.12+) instead of joining them."""
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1"), body
+
+
+def _json(status: int, payload: dict, keep_alive: bool = True) -> tuple[bytes, bytes]:
+    return _encode(status, serialization.dumps(payload), keep_alive=keep_alive)
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict, bytes] | None:
+    """Read one request; None on clean EOF between requests."""
+    try:
+        raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise _BadRequest("Headers too large")
+
+    lines = raw.decode("latin-1").split("\r\n")
+    try:
+        method, path, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise _BadRequest("Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    headers[":version"] = version
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise _BadRequest("Malformed Content-Length")
+    if length < 0:
+        raise _BadRequest("Malformed Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise _BadRequest("Body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+class AsyncAgentServer:
+    """Dispatches /chat turns to an async turn handler under a concurrency cap."""
+
+    def __init__(self, handle_turn: TurnHandler, stream_turn: StreamHandler | None = None,
+                 max_concurrency: int = MAX_CONCURRENCY, max_connections: int = MAX_CONNECTIONS):
+        self.handle_turn = handle_turn
+        self.stream_turn = stream_turn
+        self.turns = asyncio.Semaphore(max_concurrency)
+        self.connections = asyncio.Semaphore(max_connections)
+        # Connections waiting for their next request, closed on drain
+        self.idle: set[asyncio.StreamWriter] = set()
+        self.open = 0
+        self.draining = False
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async with self.connections:
+            self.open += 1
+            try:
+                while True:
+                    self.idle.add(writer)
+                    try:
+                        request = await _read_request(reader)
+                    except _BadRequest as e:
+                        writer.writelines(_json(400, {"error": str(e)}, keep_alive=False))
+                        break
+                    finally:
+                        self.idle.discard(writer)
+                    if request is None:
+                        break
+
+                    method, path, headers, body = request
+                    if method == "POST" and path == "/chat/stream" and self.stream_turn:
+                        await self.stream(writer, body, headers.get("x-tenant-id"))
+                        break
+
+                    keep_alive = (
+                        headers.get("connection", "").lower() != "close"
+                        and headers[":version"] == "HTTP/1.1"
+                        and not self.draining
+                    )
+                    writer.writelines(await self.dispatch(method, path, body, keep_alive, headers.get("x-tenant-id")))
+                    await writer.drain()
+                    if not keep_alive or self.draining:
+                        break
+            except ConnectionError:
+                pass
+            finally:
+                self.open -= 1
+                writer.close()
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT, idle_grace: float = 1.0) -> None:
+        """Finish in-flight requests, answering each with Connection: close.
+
+        Connections still idle after idle_grace are closed; the grace lets a
+        request a client has already sent on a keep-alive connection be
+        served instead of reset.
+        """
+        self.draining = True
+        loop = asyncio.get_running_loop()
+        grace_end, deadline = loop.time() + idle_grace, loop.time() + timeout
+        while self.open and loop.time() < deadline:
+            if loop.time() >= grace_end:
+                for writer in list(self.idle):
+                    writer.close()
+            await asyncio.sleep(0.05)
+
+    async def stream(self, writer: asyncio.StreamWriter, body: bytes, tenant: str | None = None) -> None:
+        """Write a turn as Server-Sent Events, flushing each event; closes after."""
+        try:
+            payload = serialization.loads(body or b"{}")
+        except ValueError:
+            writer.writelines(_json(400, {"error": "Invalid JSON"}, keep_alive=False))
+            return
+
+        try:
+            await asyncio.wait_for(self.turns.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            writer.writelines(_json(503, {"error": "Agent is at capacity, retry shortly"}, keep_alive=False))
+            return
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+            )
+            session_id, message = payload.get("session_id", "default"), payload.get("message", "")
+            # Closed explicitly so a client that disconnects doesn't leave the turn (and its session lock) to GC
+            async with aclosing(self.stream_turn(session_id, message, tenant)) as events:
+                async for event in events:
+                    writer.write(event)
+                    await writer.drain()
+        finally:
+            self.turns.release()
+
+    async def dispatch(self, method: str, path: str, body: bytes, keep_alive: bool,
+                       tenant: str | None = None) -> tuple[bytes, bytes]:
+        if method == "GET" and path == "/health":
+            return _json(200, {"status": "ok", "agent": "taxpilot"}, keep_alive)
+        if method == "GET" and path == "/ready":
+            ready = startup.is_ready() and not self.draining
+            return _json(200 if ready else 503,
+                         {"status": "ready" if ready else "not_ready", "agent": "taxpilot"}, keep_alive)
+        if method == "GET" and path == "/metrics":
+            return _encode(200, metrics.render().encode(), metrics.CONTENT_TYPE, keep_alive)
+
+        if method == "POST" and path == "/chat":
+            try:
+                payload = serialization.loads(body or b"{}")
+            except ValueError:
+                return _json(400, {"error": "Invalid JSON"}, keep_alive)
+
+            try:
+                await asyncio.wait_for(self.turns.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return _json(503, {"error": "Agent is at capacity, retry shortly"}, keep_alive)
+            try:
+                response = await self.handle_turn(
+                    payload.get("session_id", "default"), payload.get("message", ""), tenant,
+                )
+            finally:
+                self.turns.release()
+            # A drain may have started during the turn
+            return _json(200, response, keep_alive and not self.draining)
+
+        return _encode(404, b"", keep_alive=keep_alive)
+
+
+async def serve(handle_turn: TurnHandler, stream_turn: StreamHandler | None = None,
+                host: str = "0.0.0.0", port: int = 8000, sock: socket.socket | None = None,
+                ready: Callable[[], None] | None = None) -> None:
+    """Run the async server until SIGTERM or SIGINT, then drain it.
+
+    ``sock`` is an already listening socket to serve instead of binding
+    host:port; ``ready`` is called once the server is accepting.
+    """
+    agent_server = AsyncAgentServer(handle_turn, stream_turn)
+    if sock is not None:
+        server = await asyncio.start_server(agent_server.handle_connection, sock=sock)
+    else:
+        server = await asyncio.start_server(agent_server.handle_connection, host, port, backlog=1024)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    print(f"TaxPilot agent (async, max {MAX_CONCURRENCY} concurrent turns) running on port {port}")
+    if ready:
+        ready()
+    try:
+        async with server:
+            await stop.wait()
+            startup.set_ready(False)
+            # Stop accepting, then let in-flight turns finish
+            server.close()
+            await agent_server.drain()
+    finally:
+        await aclose_clients()
@@ -0,0 +1,298 @@
+"""Batch filing: run the pipeline over a CSV or JSONL file of filers.
+
+    python batch.py filers.csv -o results.jsonl [--workers 8] [--resume]
+    python batch.py filers.jsonl -o results/ --format parquet
+
+Each record becomes a TaxPilotState and goes through classifier → deduction
+→ form_builder → review (no conversational intake) in a process pool. Rows
+are written in input order. A checkpoint next to the output
+(``<output>.checkpoint``) records progress after every chunk, so ``--resume``
+continues a crashed run where it stopped (and is a no-op on a finished one).
+
+Record fields (CSV columns or JSONL keys): filer_id, name, filing_status,
+state, dependents, wages, federal_withheld, state_withheld, employer. JSONL
+records may instead carry an ``income_items`` list of IncomeItem dicts.
+Withholding that is not given is estimated like the classifier does.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Iterator
+
+from state import TaxPilotState, IncomeItem, item_dict, new_session_state
+from nodes.classifier import classifier_node, w2_item
+from nodes.deduction import deduction_node
+from nodes.form_builder import form_builder_node
+from nodes.review import review_node
+from tools.kb_index import get_index
+from tools.tax_tables import FILING_STATUSES
+
+PIPELINE = (classifier_node, deduction_node, form_builder_node, review_node)
+
+OUTPUT_FIELDS = (
+    "filer_id", "filing_status", "total_income", "total_withheld", "standard_deduction", "itemized_total",
+    "use_standard", "taxable_income", "federal_tax", "estimated_refund", "confidence_score", "needs_review",
+    "review_flags", "error",
+)
+
+
+def read_records(path: str) -> Iterator[dict]:
+    """Filer records from a .csv or .jsonl file."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in ("", None)}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _amount(record: dict, key: str) -> float | None:
+    value = record.get(key)
+    if value is None:
+        return None
+    return float(str(value).replace(",", "").lstrip("$"))
+
+
+def _filer_id(record: dict, index: int) -> str:
+    return str(record.get("filer_id") or record.get("id") or index)
+
+
+def filer_state(record: dict, index: int) -> TaxPilotState:
+    """TaxPilotState for one filer, as if intake had collected the record."""
+    filer_id = _filer_id(record, index)
+    filing_status = str(record.get("filing_status", "")).strip().lower().replace(" ", "_")
+    if filing_status not in FILING_STATUSES:
+        raise ValueError(f"Unknown filing_status: {record.get('filing_status')!r}")
+
+    if "income_items" in record:
+        items = [IncomeItem(**{"source": item.get("type", "other"), **item}) for item in record["income_items"]]
+    elif (wages := _amount(record, "wages")) is not None:
+        items = [w2_item(
+            wages, _amount(record, "federal_withheld"), _amount(record, "state_withheld"),
+            record.get("employer") or "Employer (from W-2)",
+        )]
+    else:
+        items = []
+
+    state = new_session_state(filer_id, "")
+    state.update({
+        "name": record.get("name"),
+        "filing_status": filing_status,
+        "state": record.get("state"),
+        "dependents": int(record.get("dependents") or 0),
+        "income_items": items,
+        "current_node": "classifier",
+    })
+    return state
+
+
+def summarize(filer_id: str, state: TaxPilotState) -> dict:
+    row = {"filer_id": filer_id, **{field: state.get(field) for field in OUTPUT_FIELDS[1:-2]}}
+    row["review_flags"] = [item_dict(flag) for flag in state.get("review_flags", [])]
+    row["error"] = None
+    return row
+
+
+def process_record(record: dict, index: int) -> dict:
+    filer_id = _filer_id(record, index)
+    try:
+        state = filer_state(record, index)
+        for node in PIPELINE:
+            state.update(node(state))
+        return summarize(filer_id, state)
+    except Exception as e:
+        return {**dict.fromkeys(OUTPUT_FIELDS), "filer_id": filer_id, "review_flags": [], "error": repr(e)}
+
+
+def process_chunk(start: int, records: list[dict]) -> list[dict]:
+    return [process_record(record, start + i) for i, record in enumerate(records)]
+
+
+def _init_worker() -> None:
+    # Build the KB index once per worker instead of on its first record
+    get_index()
+
+
+class JsonlSink:
+    """Appends rows to one JSONL file; its byte size is the resume point."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab")
+
+    def position(self) -> int:
+        return self._file.tell()
+
+    def truncate(self, position: int) -> None:
+        # Drop rows written after the last checkpoint
+        self._file.truncate(position)
+        self._file.seek(position)
+
+    def write(self, rows: list[dict]) -> None:
+        self._file.write(b"".join(json.dumps(row, separators=(",", ":")).encode() + b"\n" for row in rows))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSink:
+    """Writes each chunk as a numbered part file in a directory. Needs pyarrow."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise RuntimeError("--format parquet requires the pyarrow package") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = 0
+
+    def _part(self, number: int) -> str:
+        return os.path.join(self.path, f"part-{number:06d}.parquet")
+
+    def position(self) -> int:
+        return self.parts
+
+    def truncate(self, position: int) -> None:
+        # Drop parts written after the last checkpoint (all of them on a fresh run)
+        number = self.parts = position
+        while os.path.exists(self._part(number)):
+            os.remove(self._part(number))
+            number += 1
+
+    def write(self, rows: list[dict]) -> None:
+        rows = [{**row, "review_flags": json.dumps(row["review_flags"])} for row in rows]
+        self._pq.write_table(self._pa.Table.from_pylist(rows), self._part(self.parts))
+        self.parts += 1
+
+    def close(self) -> None:
+        pass
+
+
+class Checkpoint:
+    """Rows completed and the sink position they end at, rewritten atomically."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {"rows": 0, "position": 0}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, rows: int, position: int, complete: bool = False) -> None:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=os.path.basename(self.path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"rows": rows, "position": position, "complete": complete}, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _chunks(records: Iterator[dict], size: int, skip: int) -> Iterator[tuple[int, list[dict]]]:
+    chunk, start = [], skip
+    for index, record in enumerate(records):
+        if index < skip:
+            continue
+        chunk.append(record)
+        if len(chunk) == size:
+            yield start, chunk
+            start += size
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+def run_batch(input_path: str, output_path: str, fmt: str = "jsonl", workers: int | None = None,
+              chunk_size: int = 256, resume: bool = False, progress: bool = True) -> dict:
+    """Process every record of input_path; returns row counts and rows/s."""
+    workers = workers or os.cpu_count() or 1
+    checkpoint = Checkpoint(f"{output_path.rstrip('/')}.checkpoint")
+    if not resume:
+        checkpoint.clear()
+        if fmt == "jsonl" and os.path.exists(output_path):
+            os.remove(output_path)
+    done = checkpoint.load() if resume else {"rows": 0, "position": 0}
+
+    sink = ParquetSink(output_path) if fmt == "parquet" else JsonlSink(output_path)
+    sink.truncate(done["position"])
+
+    rows, errors = done["rows"], 0
+    start = last_report = time.perf_counter()
+    # Bounded window of in-flight chunks, drained in submission order
+    window: list[Future] = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            chunks = _chunks(read_records(input_path), chunk_size, done["rows"])
+            while True:
+                while len(window) < workers * 4:
+                    item = next(chunks, None)
+                    if item is None:
+                        break
+                    window.append(pool.submit(process_chunk, *item))
+                if not window:
+                    break
+
+                results = window.pop(0).result()
+                sink.write(results)
+                rows += len(results)
+                errors += sum(row["error"] is not None for row in results)
+                checkpoint.save(rows, sink.position())
+
+                now = time.perf_counter()
+                if progress and now - last_report >= 5:
+                    last_report = now
+                    print(f"{rows} rows, {(rows - done['rows']) / (now - start):,.0f} rows/s", file=sys.stderr)
+        checkpoint.save(rows, sink.position(), complete=True)
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    processed = rows - done["rows"]
+    return {
+        "rows": rows,
+        "processed": processed,
+        "resumed_from": done["rows"],
+        "errors": errors,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(processed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="filers .csv or .jsonl")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file, or directory for parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--resume", action="store_true", help="continue from the output's checkpoint")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, args.format, args.workers, args.chunk_size, args.resume)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Benchmarks for the TaxPilot agent. Run from agent/: python -m benchmarks.<name>"""
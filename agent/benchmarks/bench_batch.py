@@ -0,0 +1,63 @@
+"""Batch-filing throughput (rows/s) by worker count.
+
+    python -m benchmarks.bench_batch [--rows 20000] [--workers 1 2 4 8]
+
+Generates synthetic filers as JSONL and runs batch.run_batch over them once
+per worker count, reporting rows/s and speedup over one worker.
+"""
+
+import os
+import json
+import random
+import argparse
+import tempfile
+
+from batch import run_batch
+from tools.tax_tables import FILING_STATUSES
+
+STATES = ("CA", "NY", "TX", "FL", "WA", "IL", "PA", "OH")
+
+
+def make_filers(path: str, rows: int, seed: int = 2025) -> None:
+    rng = random.Random(seed)
+    statuses = list(FILING_STATUSES)
+    with open(path, "w") as f:
+        for i in range(rows):
+            wages = round(rng.lognormvariate(11.0, 0.8), 2)
+            record = {
+                "filer_id": f"F{i:07d}",
+                "filing_status": rng.choice(statuses),
+                "state": rng.choice(STATES),
+                "dependents": rng.choice((0, 0, 1, 2, 3)),
+                "wages": wages,
+            }
+            if rng.random() < 0.5:
+                record["federal_withheld"] = round(wages * rng.uniform(0.05, 0.3), 2)
+            f.write(json.dumps(record) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "filers.jsonl")
+        make_filers(source, args.rows)
+        print(f"{args.rows} filers, {cpus} CPUs")
+        print(f"{'workers':>8} {'rows/s':>10} {'speedup':>8}")
+        baseline = None
+        for n in workers:
+            summary = run_batch(source, os.path.join(tmp, f"out-{n}.jsonl"), workers=n,
+                                chunk_size=args.chunk_size, progress=False)
+            baseline = baseline or summary["rows_per_s"]
+            print(f"{n:>8} {summary['rows_per_s']:>10,.0f} {summary['rows_per_s'] / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
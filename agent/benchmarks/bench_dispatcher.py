@@ -0,0 +1,162 @@
+"""Inference dispatcher under concurrent load: coalescing, batching and shedding.
+
+    python -m benchmarks.bench_dispatcher [--calls 2000] [--concurrency 64] [--duplicates 0.5] [--json results.json]
+
+Makes --calls completions from --concurrency threads (and, for ``async``,
+as many concurrent tasks) against the local stub. A --duplicates fraction of
+calls repeat one of a few hot messages, as when many filers send the same
+greeting at once. Modes:
+
+- ``direct``: inference.complete, one upstream request per call
+- ``dispatcher``: through dispatcher.Dispatcher with coalescing
+- ``async``: the same, through acomplete on one event loop
+- ``batched``: also micro-batching into the stub's batch endpoint
+- ``overloaded``: --max-in-flight slots and a queue of --max-queue, so calls
+  beyond that are shed (they would get intake's fallback reply)
+
+Each mode reports calls/s, latency percentiles of answered calls, upstream
+requests made, and calls coalesced or shed.
+"""
+
+import os
+import time
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import StubProcess
+from benchmarks.results import write_results
+
+SYSTEM_PROMPT = "You are TaxPilot's intake assistant."
+HOT_MESSAGES = ("Hi", "Hello, I'd like to file my taxes", "What do you need from me?", "Help")
+
+
+def messages(calls: int, duplicates: float, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        rng.choice(HOT_MESSAGES) if rng.random() < duplicates else f"My question number {i} about deductions"
+        for i in range(calls)
+    ]
+
+
+def summarize(latencies: list[float], elapsed: float, calls: int, shed: int, upstream: int, coalesced: int) -> dict:
+    ordered = sorted(latencies) or [0.0]
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {
+        "calls": calls,
+        "calls_per_s": calls / elapsed,
+        "p50_ms": round(1000 * pick(0.50), 2),
+        "p99_ms": round(1000 * pick(0.99), 2),
+        "upstream_requests": upstream,
+        "coalesced": coalesced,
+        "shed": shed,
+    }
+
+
+def run_threads(call, batch: list[str], concurrency: int) -> tuple[list[float], int, float]:
+    def one(message: str):
+        start = time.perf_counter()
+        try:
+            call(SYSTEM_PROMPT, message)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, batch))
+    elapsed = time.perf_counter() - start
+    latencies = [r for r in results if r is not None]
+    return latencies, len(results) - len(latencies), elapsed
+
+
+async def run_tasks(call, batch: list[str], concurrency: int) -> tuple[list[float], int, float]:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(message: str):
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await call(SYSTEM_PROMPT, message)
+            except Exception:
+                return None
+            return time.perf_counter() - start
+
+    from http_clients import aclose_clients
+
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(one(message) for message in batch))
+    finally:
+        # The async pool is bound to this loop; close it before the loop goes
+        elapsed = time.perf_counter() - start
+        await aclose_clients()
+    latencies = [r for r in results if r is not None]
+    return latencies, len(results) - len(latencies), elapsed
+
+
+def run(args, batch_url: str) -> dict:
+    # Imported only once the stub's URLs are in the environment
+    import inference
+    import dispatcher
+    from dispatcher import Dispatcher
+
+    batch = messages(args.calls, args.duplicates)
+    results = {}
+
+    def measure(name: str, **options) -> None:
+        d = Dispatcher(**options)
+        coalesced = dispatcher.COALESCED.value()
+        if name == "direct":
+            latencies, shed, elapsed = run_threads(inference.complete, batch, args.concurrency)
+        elif name == "async":
+            latencies, shed, elapsed = asyncio.run(run_tasks(d.acomplete, batch, args.concurrency))
+        else:
+            latencies, shed, elapsed = run_threads(d.complete, batch, args.concurrency)
+        upstream = len(batch) if name == "direct" else d.upstream_requests
+        results[name] = summarize(latencies, elapsed, len(batch), shed, upstream,
+                                  int(dispatcher.COALESCED.value() - coalesced))
+
+    measure("direct")
+    measure("dispatcher", batch_url="")
+    measure("async", batch_url="")
+    measure("batched", batch_url=batch_url, batch_window_ms=args.window_ms)
+    measure("overloaded", batch_url="", max_in_flight=args.max_in_flight,
+            max_queue=args.max_queue, queue_timeout=args.queue_timeout)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duplicates", type=float, default=0.5, help="fraction of calls repeating a hot message")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--window-ms", type=float, default=5, help="batch window for the batched mode")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="slots for the overloaded mode")
+    parser.add_argument("--max-queue", type=int, default=16, help="queue bound for the overloaded mode")
+    parser.add_argument("--queue-timeout", type=float, default=0.5, help="queue timeout for the overloaded mode")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    with StubProcess(args.latency_ms) as stub:
+        os.environ.update({
+            "GRADIENT_INFERENCE_URL": f"{stub.url}/v1/chat/completions",
+            "GRADIENT_API_KEY": "stub",
+        })
+        results = run(args, f"{stub.url}/v1/chat/completions/batch")
+
+    print(f"{args.calls} calls, {args.concurrency} concurrent, {args.duplicates:.0%} hot messages, "
+          f"{args.latency_ms:.0f} ms upstream")
+    print(f"{'mode':<11} {'calls/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9} {'coalesced':>10} {'shed':>6}")
+    for name, r in results.items():
+        print(f"{name:<11} {r['calls_per_s']:>8.0f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['upstream_requests']:>9} {r['coalesced']:>10} {r['shed']:>6}")
+
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    write_results(args.json, "dispatcher", params, results)
+
+
+if __name__ == "__main__":
+    main()
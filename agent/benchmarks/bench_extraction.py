@@ -0,0 +1,155 @@
+"""Extraction engine throughput and accuracy against the labelled fixture set.
+
+    python -m benchmarks.bench_extraction [--seconds 0.5] [--json results.json]
+
+Runs tools.extraction over benchmarks/fixtures/extraction.jsonl and reports,
+per field, the share of messages it gets exactly right. The legacy parser is
+run over the same messages for comparison. That parser is the substring
+scan the intake and classifier nodes used before the engine, copied here,
+and it only knew filing status, name and a single wages amount. Throughput
+is messages per second over the whole fixture with the memo bypassed, so
+every message is parsed each time.
+
+A fixture line is ``{"message": ..., "expected": {...}}``. Fields left out
+of ``expected`` are expected to be empty (None, or no income).
+"""
+
+import os
+import re
+import json
+import timeit
+import argparse
+
+from tools.extraction import extract
+from benchmarks.results import write_results
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "extraction.jsonl")
+FIELDS = ("filing_status", "name", "state", "dependents", "income", "federal_withheld", "state_withheld")
+
+_FILING_STATUS_WORDS = {"single", "married", "filing", "head", "widow", "widower", "qualifying"}
+
+
+def legacy_extract(message: str) -> dict:
+    """The pre-engine parsing: intake's keyword scan plus the classifier's largest amount."""
+    lower = message.lower()
+    filing_status = None
+    if "single" in lower:
+        filing_status = "single"
+    elif "married" in lower and "joint" in lower:
+        filing_status = "married_filing_jointly"
+    elif "married" in lower and "separate" in lower:
+        filing_status = "married_filing_separately"
+    elif "head" in lower and "household" in lower:
+        filing_status = "head_of_household"
+    elif "widow" in lower or "qualifying" in lower:
+        filing_status = "qualifying_widow"
+
+    name = None
+    for prefix in ["my name is ", "i'm ", "i am "]:
+        if prefix in lower:
+            idx = lower.index(prefix) + len(prefix)
+            candidate = message[idx:].strip().split(",")[0].split(".")[0].split(" and")[0].strip()
+            if candidate and not _FILING_STATUS_WORDS.intersection(candidate.lower().split()):
+                name = candidate
+            break
+
+    amounts = [float(a.replace(",", "")) for a in re.findall(r"\$?(\d[\d,]*(?:\.\d{2})?)", message)]
+    amounts = [a for a in amounts if a > 100]
+    return {
+        "filing_status": filing_status,
+        "name": name,
+        "income": [("w2", max(amounts))] if amounts else [],
+    }
+
+
+def engine_extract(message: str) -> dict:
+    found = extract.__wrapped__(message)
+    return {
+        "filing_status": found.filing_status,
+        "name": found.name,
+        "state": found.state,
+        "dependents": found.dependents,
+        "income": [(item.type, item.amount) for item in found.income],
+        "federal_withheld": found.federal_withheld,
+        "state_withheld": found.state_withheld,
+    }
+
+
+def load_fixtures(path: str = FIXTURES) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _normalize(field: str, value):
+    if field == "income":
+        return sorted((kind, float(amount)) for kind, amount in value or [])
+    return value
+
+
+def accuracy(parse, fixtures: list[dict]) -> tuple[dict, list[tuple[str, str, object, object]]]:
+    """Per-field and all-fields-correct share, and the misses."""
+    correct = dict.fromkeys(FIELDS, 0)
+    exact = 0
+    misses = []
+    for fixture in fixtures:
+        got = parse(fixture["message"])
+        message_ok = True
+        for field in FIELDS:
+            expected = _normalize(field, fixture["expected"].get(field))
+            actual = _normalize(field, got.get(field))
+            if expected == actual:
+                correct[field] += 1
+            else:
+                message_ok = False
+                misses.append((fixture["message"], field, expected, actual))
+        exact += message_ok
+    n = len(fixtures)
+    return {**{field: correct[field] / n for field in FIELDS}, "all_fields": exact / n}, misses
+
+
+def throughput(parse, messages: list[str], seconds: float, repeat: int) -> float:
+    """Messages per second, best of repeat runs."""
+    def run():
+        for message in messages:
+            parse(message)
+    timer = timeit.Timer(run)
+    number = max(1, int(seconds / max(timer.timeit(1), 1e-9)))
+    best = min(timer.repeat(repeat, number)) / number
+    return len(messages) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--seconds", type=float, default=0.5, help="time per throughput run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--misses", action="store_true", help="print every field the engine got wrong")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    messages = [fixture["message"] for fixture in fixtures]
+    results = {}
+    for name, parse in (("engine", engine_extract), ("legacy", legacy_extract)):
+        scores, misses = accuracy(parse, fixtures)
+        results[name] = {
+            "messages_per_s": throughput(parse, messages, args.seconds, args.repeat),
+            "accuracy": scores,
+        }
+        if args.misses and name == "engine":
+            for message, field, expected, actual in misses:
+                print(f"  miss {field}: expected {expected!r}, got {actual!r} in {message!r}")
+
+    print(f"{len(fixtures)} labelled messages")
+    print(f"{'parser':<8} {'msg/s':>10} " + " ".join(f"{field[:12]:>12}" for field in (*FIELDS, "all_fields")))
+    for name, result in results.items():
+        scores = result["accuracy"]
+        print(f"{name:<8} {result['messages_per_s']:>10,.0f} "
+              + " ".join(f"{scores[field]:>12.0%}" for field in (*FIELDS, "all_fields")))
+
+    params = {key: value for key, value in vars(args).items() if key not in ("json", "misses")}
+    write_results(args.json, "extraction", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""End-to-end latency of app.invoke, per turn type and per graph node.
+
+    python -m benchmarks.bench_graph [--turns 200] [--latency-ms 50] [--error-rate 0.1] [--json results.json]
+
+Runs the compiled graph in-process against the local stub
+(benchmarks.stub_server) standing in for Gradient inference and the
+knowledge base. The intake fast path and completion cache are turned off so
+every turn's intake reply comes from the stub, unless --fast-path is given.
+Turn types:
+
+- ``intake_llm``: a new session's first message, which stays in intake
+- ``filing``: a message that completes intake and runs the whole pipeline
+- ``repeat``: the filing message again on a finished session, so the
+  incremental wrapper can skip unchanged nodes
+
+Per-node mean cost comes from the taxpilot_node_duration_seconds histogram
+and includes skipped calls, which are also counted separately.
+
+--remote-kb empties the local KB index and turns off the KB cache, so every
+deduction lookup is a stub round-trip; --sequential (AGENT_FAN_OUT=false)
+then shows what the retrieval fan-out saves on ``filing`` turns.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.stub_server import StubProcess
+from benchmarks.results import write_results
+
+GREETING = "Hi, I'd like to file my taxes"
+FILING = "Hi, my name is Ann. I'm single and I earned $85,000 at Acme last year"
+NODES = ("intake", "classifier", "retrieval", "deduction", "form_builder", "review")
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {
+        "turns": len(samples),
+        "mean_ms": round(1000 * statistics.fmean(samples), 3),
+        "p50_ms": round(1000 * pick(0.50), 3),
+        "p95_ms": round(1000 * pick(0.95), 3),
+        "p99_ms": round(1000 * pick(0.99), 3),
+    }
+
+
+def run(turns: int) -> dict:
+    # Imported only once the stub's URLs are in the environment
+    import metrics
+    from incremental import NODE_SKIPS
+    from main import app
+    from state import new_session_state
+
+    def timed(make_state) -> dict:
+        samples, errors = [], 0
+        fallbacks = metrics.FALLBACKS.value(node="intake")
+        for i in range(turns):
+            state = make_state(i)
+            start = time.perf_counter()
+            try:
+                app.invoke(state)
+            except Exception:
+                errors += 1
+                continue
+            samples.append(time.perf_counter() - start)
+        return {
+            **summarize(samples),
+            "errors": errors,
+            "fallbacks": int(metrics.FALLBACKS.value(node="intake") - fallbacks),
+        }
+
+    finished = app.invoke(new_session_state("bench-finished", FILING))
+
+    def repeat_state(i: int) -> dict:
+        return {**finished, "user_message": FILING, "node_trace": []}
+
+    results = {
+        "intake_llm": timed(lambda i: new_session_state(f"bench-greet-{i}", GREETING)),
+        "filing": timed(lambda i: new_session_state(f"bench-file-{i}", FILING)),
+        "repeat": timed(repeat_state),
+    }
+    results["nodes"] = {
+        node: {
+            "calls": metrics.NODE_DURATION.count(node=node),
+            "skipped": int(NODE_SKIPS.value(node=node)),
+            "mean_us": round(1e6 * metrics.NODE_DURATION.sum(node=node) / max(1, metrics.NODE_DURATION.count(node=node)), 1),
+        }
+        for node in NODES
+    }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200, help="turns per turn type")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--fast-path", action="store_true", help="keep the intake fast path and cache on")
+    parser.add_argument("--remote-kb", action="store_true", help="answer every KB lookup from the stub, uncached")
+    parser.add_argument("--sequential", action="store_true", help="no retrieval fan-out (AGENT_FAN_OUT=false)")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    with (StubProcess(args.latency_ms, args.jitter_ms, error_rate=args.error_rate) as stub,
+          tempfile.TemporaryDirectory() as empty_kb):
+        os.environ.update({
+            "GRADIENT_INFERENCE_URL": f"{stub.url}/v1/chat/completions",
+            "DO_KB_URL": stub.url,
+            "GRADIENT_API_KEY": "stub",
+            "DO_KB_API_KEY": "stub",
+        })
+        if not args.fast_path:
+            os.environ.update({"INTAKE_FAST_PATH": "off", "INTAKE_CACHE_SIZE": "0"})
+        if args.remote_kb:
+            os.environ.update({"KB_DIR": empty_kb, "KB_CACHE_TTL": "0"})
+        if args.sequential:
+            os.environ["AGENT_FAN_OUT"] = "false"
+        results = run(args.turns)
+
+    for name in ("intake_llm", "filing", "repeat"):
+        r = results[name]
+        print(f"{name:<11} p50={r['p50_ms']:8.2f}ms p95={r['p95_ms']:8.2f}ms p99={r['p99_ms']:8.2f}ms "
+              f"errors={r['errors']} fallbacks={r['fallbacks']}")
+    for node, r in results["nodes"].items():
+        print(f"  {node:<13} {r['calls']:>6} calls {r['skipped']:>6} skipped {r['mean_us']:>10,.1f} µs mean")
+
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    write_results(args.json, "graph", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Per-call latency of a fresh httpx.post vs. the shared upstream pool.
+
+    python -m benchmarks.bench_http_pool [--calls 300] [--latency-ms 0]
+
+Runs against the local stub (benchmarks.stub_server) over plain HTTP, so the
+savings shown are client construction plus TCP setup; against the real
+HTTPS endpoints the pooled path also skips a TLS handshake per call.
+"""
+
+import argparse
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stub_server import StubProcess
+from http_clients import get_client, pool_metrics
+
+
+def time_calls(call, n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50={statistics.median(samples):7.2f}ms mean={statistics.fmean(samples):7.2f}ms p99={p99:7.2f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    with StubProcess(latency_ms=args.latency_ms) as stub:
+        url = f"{stub.url}/query"
+        body = {"query": "standard deduction single filer", "top_k": 3}
+
+        fresh = time_calls(lambda: httpx.post(url, json=body, timeout=10).raise_for_status(), args.calls)
+        pooled = time_calls(lambda: get_client("kb").post(url, json=body).raise_for_status(), args.calls)
+
+    print(f"fresh httpx.post : {summarize(fresh)}")
+    print(f"shared kb pool   : {summarize(pooled)}")
+    print(f"saved per call   : {statistics.median(fresh) - statistics.median(pooled):.2f}ms (p50)")
+    kb = pool_metrics()["kb"]
+    print(
+        f"kb pool          : requests={kb['requests']} connections_opened={kb['connections_opened']} "
+        f"idle={kb['idle_connections']} avg_wait={kb['avg_wait_ms']:.3f}ms avg_connect={kb['avg_connect_ms']:.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
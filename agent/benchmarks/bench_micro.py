@@ -0,0 +1,72 @@
+"""Microbenchmarks for the tax calculator and the message-parsing regexes.
+
+    python -m benchmarks.bench_micro [--seconds 0.2] [--json results.json]
+
+Each case is timed with timeit's autorange over --repeat runs and reported
+as the best ns per call, which is the least noisy figure on a shared machine.
+"""
+
+import timeit
+import argparse
+
+from nodes.classifier import updated_income
+from nodes.intake import _extract
+from tools.extraction import extract
+from tools.tax_calculator import (
+    calculate_federal_tax,
+    calculate_marginal_rate,
+    get_schedule,
+)
+from tools.tax_tables import _load
+from benchmarks.results import write_results
+
+SHORT = "I'm single"
+LONG = (
+    "Hi, my name is Jordan Lee. I'm married filing jointly, we live in California and I earned "
+    "$85,000 at Acme plus $12,500.50 freelancing; $9,800 was withheld and we have 2 kids."
+)
+
+
+def cases() -> dict:
+    schedule = get_schedule("single")
+    state = {"user_message": LONG, "income_items": []}
+    return {
+        "calculate_federal_tax": lambda: calculate_federal_tax(85_000, "single"),
+        "calculate_marginal_rate": lambda: calculate_marginal_rate(85_000, "head_of_household"),
+        "schedule_evaluate": lambda: schedule.evaluate(85_000),
+        "get_schedule_cached": lambda: get_schedule("married_filing_jointly"),
+        # A table's first use: read, parse and compile the file, bypassing the memo
+        "get_table_load": lambda: _load.__wrapped__(2025, "US"),
+        # __wrapped__ bypasses the per-message memo, so these time a full parse
+        "extract_short": lambda: extract.__wrapped__(SHORT),
+        "extract_long": lambda: extract.__wrapped__(LONG),
+        "extract_memoized": lambda: extract(LONG),
+        "classifier_updated_income": lambda: updated_income(state),
+        "intake_extract_long": lambda: _extract({"user_message": LONG}),
+    }
+
+
+def measure(fn, repeat: int, seconds: float) -> float:
+    """Best ns per call over repeat runs of about `seconds` each."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * seconds / max(elapsed, 1e-9)))
+    return 1e9 * min(timer.repeat(repeat, number)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=0.2, help="target duration of each run")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in cases().items():
+        results[name] = {"ns_per_call": round(measure(fn, args.repeat, args.seconds), 1)}
+        print(f"{name:<26} {results[name]['ns_per_call']:>10,.1f} ns")
+    write_results(args.json, "micro", {"repeat": args.repeat, "seconds": args.seconds}, results)
+
+
+if __name__ == "__main__":
+    main()
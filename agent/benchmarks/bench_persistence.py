@@ -0,0 +1,196 @@
+"""Write-behind persistence throughput in rows per second, against per-node writes.
+
+    python -m benchmarks.bench_persistence [--sessions 2000] [--turns 2] [--dsn postgresql://...] [--json results.json]
+
+Replays the node updates and chat messages of a filing conversation (intake,
+classifier, deduction, form_builder and review, then the user message and the
+reply) for --sessions sessions and --turns turns each, in the interleaved
+order concurrent sessions would produce them. Two ways of writing them:
+
+- ``write_behind``: persistence.WriteBehind, so the hot path only records
+  the change and the writer thread flushes coalesced batches
+- ``per_node``: the same backend writing each node's changes in its own
+  transaction as it happens, which is what writing through from the node
+  would cost
+
+``rows_per_s`` counts rows the database received; write-behind coalesces a
+session's node updates within a batch, so it also reports the rows recorded
+(``recorded_rows_per_s``, rows a write-through would have written). The
+``record_us`` of write_behind is the hot path's cost per node.
+
+The SQLite stand-in is used unless --dsn points at a Postgres database with
+sql/schema.sql applied; tax_sessions rows for the benchmark are created there
+first, under a new user.
+"""
+
+import os
+import time
+import uuid
+import argparse
+import tempfile
+
+from persistence import WriteBehind, SQLitePersistence, PostgresPersistence, SessionChanges, session_values, LEDGER_TABLES
+from state import new_session_state, IncomeItem, DeductionItem, ReviewFlag
+from benchmarks.results import write_results
+
+FILING = "Hi, my name is Ann. I'm single and I earned $85,000 at Acme last year"
+REPLY = "Here's your estimated 2025 tax return: ..."
+
+
+def conversation(turn: int) -> list[dict]:
+    """The node updates of one turn that runs the whole pipeline."""
+    income = [IncomeItem(source="W-2 Employment", type="w2", amount=85_000, employer_name="Acme",
+                         federal_withheld=14_195, state_withheld=4_250)]
+    income += [IncomeItem(source="1099", type="1099", amount=5_000)] * turn
+    deductions = [
+        DeductionItem(category=f"category {i}", description=f"Deduction {i} (Line {i})", amount=0,
+                      confidence=0, is_itemized=i < 4, ai_suggested=True)
+        for i in range(9)
+    ]
+    return [
+        {"name": "Ann", "filing_status": "single", "current_node": "intake", "response": ""},
+        {"income_items": income, "total_income": sum(item.amount for item in income), "current_node": "classifier"},
+        {"deductions": deductions, "standard_deduction": 15_000, "itemized_total": 0, "use_standard": True,
+         "current_node": "deduction"},
+        {"taxable_income": 70_000, "federal_tax": 10_314, "estimated_refund": 3_881, "current_node": "form_builder"},
+        {"confidence_score": 0.85, "review_flags": [ReviewFlag("total_income", "90000", "Multiple 1099s", 0.7)] * turn,
+         "needs_review": bool(turn), "current_node": "review", "completed": True},
+    ]
+
+
+def events(session_ids: list[str], turns: int) -> list[tuple]:
+    """(session_id, node update or None for the turn's messages), sessions interleaved per node."""
+    out = []
+    for turn in range(turns):
+        updates = conversation(turn)
+        for update in updates:
+            out += [(session_id, update) for session_id in session_ids]
+        out += [(session_id, None) for session_id in session_ids]
+    return out
+
+
+def _messages() -> list[tuple]:
+    return [("user", FILING, None), ("assistant", REPLY, [{"type": "refund_card"}])]
+
+
+def replay(session_ids: list[str], turns: int, record_node, record_turn) -> None:
+    states = {session_id: new_session_state(session_id, FILING) for session_id in session_ids}
+    for session_id, update in events(session_ids, turns):
+        if update is None:
+            record_turn(session_id)
+            continue
+        state = states[session_id]
+        state.update(update)
+        record_node(state, update)
+
+
+def run_write_behind(backend, session_ids: list[str], turns: int, batch_rows: int) -> dict:
+    writer = WriteBehind(backend, flush_interval=0.05, batch_rows=batch_rows)
+    recorded = [0]
+
+    def record_node(state, update):
+        ledgers = {key: update[key] for key in LEDGER_TABLES if key in update}
+        recorded[0] += 1 + sum(map(len, ledgers.values()))
+        writer.record_update(state["session_id"], update, state)
+
+    def record_turn(session_id):
+        recorded[0] += 2
+        writer.record_messages(session_id, _messages())
+
+    start = time.perf_counter()
+    replay(session_ids, turns, record_node, record_turn)
+    hot = time.perf_counter() - start
+    writer.flush()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    nodes = len(session_ids) * turns * 5
+    return {
+        "rows": writer.rows_written,
+        "rows_recorded": recorded[0],
+        "batches": writer.batches,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": writer.rows_written / elapsed,
+        "recorded_rows_per_s": recorded[0] / elapsed,
+        "record_us": round(1e6 * hot / (nodes + len(session_ids) * turns), 2),
+    }
+
+
+def run_per_node(backend, session_ids: list[str], turns: int) -> dict:
+    rows = [0]
+
+    def record_node(state, update):
+        ledgers = {key: update[key] for key in LEDGER_TABLES if key in update}
+        changes = SessionChanges(values=session_values(state), updated_at=time.time(), ledgers=ledgers)
+        rows[0] += sum(backend.write({state["session_id"]: changes}).values())
+
+    def record_turn(session_id):
+        now = time.time()
+        changes = SessionChanges(messages=[(role, content, None, now) for role, content, _ in _messages()])
+        rows[0] += sum(backend.write({session_id: changes}).values())
+
+    start = time.perf_counter()
+    replay(session_ids, turns, record_node, record_turn)
+    elapsed = time.perf_counter() - start
+    backend.close()
+    nodes = len(session_ids) * turns * 5
+    return {
+        "rows": rows[0],
+        "seconds": round(elapsed, 3),
+        "rows_per_s": rows[0] / elapsed,
+        "record_us": round(1e6 * elapsed / (nodes + len(session_ids) * turns), 2),
+    }
+
+
+def postgres_sessions(dsn: str, n: int) -> list[str]:
+    """Create n tax_sessions rows under a new user; their ids."""
+    import psycopg
+
+    session_ids = [str(uuid.uuid4()) for _ in range(n)]
+    with psycopg.connect(dsn) as conn:
+        user_id = conn.execute(
+            "INSERT INTO users (name, email) VALUES ('bench', %s) RETURNING id", (f"bench-{uuid.uuid4()}@example.com",),
+        ).fetchone()[0]
+        with conn.cursor().copy("COPY tax_sessions (id, user_id) FROM STDIN") as copy:
+            for session_id in session_ids:
+                copy.write_row((session_id, user_id))
+    return session_ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=2)
+    parser.add_argument("--batch-rows", type=int, default=5000, help="PERSIST_BATCH_ROWS for write_behind")
+    parser.add_argument("--dsn", help="Postgres DSN with sql/schema.sql applied (default: SQLite stand-in)")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("write_behind", "per_node"):
+            if args.dsn:
+                backend = PostgresPersistence(args.dsn)
+                session_ids = postgres_sessions(args.dsn, args.sessions)
+            else:
+                backend = SQLitePersistence(os.path.join(tmp, f"{mode}.db"))
+                session_ids = [f"bench-{i}" for i in range(args.sessions)]
+            if mode == "write_behind":
+                results[mode] = run_write_behind(backend, session_ids, args.turns, args.batch_rows)
+            else:
+                results[mode] = run_per_node(backend, session_ids, args.turns)
+
+    print(f"{args.sessions} sessions x {args.turns} turns on {'postgres' if args.dsn else 'sqlite'}")
+    print(f"{'mode':<13} {'rows':>8} {'seconds':>8} {'rows/s':>10} {'record µs':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<13} {r['rows']:>8} {r['seconds']:>8.2f} {r['rows_per_s']:>10,.0f} {r['record_us']:>10.2f}")
+    wb = results["write_behind"]
+    print(f"write_behind coalesced {wb['rows_recorded']} recorded rows into {wb['rows']} "
+          f"in {wb['batches']} batches ({wb['recorded_rows_per_s']:,.0f} recorded rows/s)")
+
+    params = {key: value for key, value in vars(args).items() if key not in ("json", "dsn")}
+    params["backend"] = "postgres" if args.dsn else "sqlite"
+    write_results(args.json, "persistence", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Chaos benchmark: inference calls against a stub injecting latency tails, errors and outages.
+
+    python -m benchmarks.bench_resilience [--calls 200] [--concurrency 32] [--timeout 5] [--json results.json]
+
+Each scenario runs a stub with one fault. Every mode first warms up on a
+healthy stub, so the adaptive timeout has seen normal latency. It then
+sends --calls inference.complete calls from --concurrency threads to the
+faulty stub:
+
+- ``healthy``: --latency-ms +/- 20%
+- ``tail``: 2% of requests take --slow-ms longer, a p99 tail
+- ``flaky``: 20% of requests fail with 503
+- ``outage``: every request fails with 503
+- ``brownout``: every request takes --brownout-ms, past any timeout
+
+Three modes per scenario:
+
+- ``baseline``: no breaker, retries or hedging, and the fixed upstream
+  timeout (--timeout, standing in for GRADIENT_TIMEOUT)
+- ``resilient``: resilience.py's defaults (breaker, adaptive timeout, retries)
+- ``hedged``: the defaults with hedging on
+
+``p50_ms`` and ``p99_ms`` cover every call, answered or not. A failed call
+costs the turn its fallback reply after that long. ``ok_ratio`` is the
+fraction answered. The counters are upstream requests made, calls failed
+fast by the breaker, retries, hedges and timeouts.
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_server import StubProcess
+from benchmarks.results import write_results
+
+SYSTEM_PROMPT = "You are TaxPilot's intake assistant."
+MODES = {
+    "baseline": {"breaker": False, "adaptive_timeout": False, "retries": 0, "hedge": False},
+    "resilient": {},
+    "hedged": {"hedge": True},
+}
+
+
+def scenarios(args) -> dict[str, dict]:
+    base = {"latency_ms": args.latency_ms, "jitter_ms": args.latency_ms / 5}
+    return {
+        "healthy": base,
+        "tail": {**base, "slow_rate": 0.02, "slow_ms": args.slow_ms},
+        "flaky": {**base, "error_rate": 0.2},
+        "outage": {**base, "error_rate": 1.0},
+        "brownout": {"latency_ms": args.brownout_ms},
+    }
+
+
+def run_calls(calls: int, concurrency: int) -> tuple[list[float], int, float]:
+    import inference
+
+    def one(i: int) -> tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            inference.complete(SYSTEM_PROMPT, f"Question {i} about my W-2")
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - start
+    return [seconds for seconds, _ in results], sum(ok for _, ok in results), elapsed
+
+
+def counters() -> dict[str, float]:
+    import metrics
+    import resilience
+
+    return {
+        "upstream_requests": metrics.UPSTREAM_DURATION.count(upstream="inference"),
+        "rejected": resilience.BREAKER_REJECTED.value(upstream="inference"),
+        "retries": resilience.RETRIES.value(upstream="inference", result="retried"),
+        "hedges": sum(resilience.HEDGES.value(upstream="inference", winner=w) for w in ("primary", "hedge")),
+        "timeouts": resilience.TIMEOUTS.value(upstream="inference"),
+    }
+
+
+def run_mode(mode: str, healthy_url: str, url: str, args) -> dict:
+    import inference
+    import resilience
+
+    r = resilience.configure("inference", **MODES[mode])
+    inference.INFERENCE_URL = healthy_url
+    run_calls(args.warmup, args.concurrency)
+
+    inference.INFERENCE_URL = url
+    before = counters()
+    latencies, ok, elapsed = run_calls(args.calls, args.concurrency)
+    after = counters()
+
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {
+        "calls_per_s": args.calls / elapsed,
+        "ok_ratio": round(ok / args.calls, 3),
+        "p50_ms": round(1000 * pick(0.50), 1),
+        "p99_ms": round(1000 * pick(0.99), 1),
+        **{key: int(after[key] - before[key]) for key in after},
+        "breaker_opened": r.breaker.opened,
+        "timeout_ms": round(1000 * r.timeout(), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--slow-ms", type=float, default=1000, help="extra latency of the tail scenario's slow requests")
+    parser.add_argument("--brownout-ms", type=float, default=10_000)
+    parser.add_argument("--timeout", type=float, default=5, help="upstream HTTP timeout in seconds")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    # Read by http_clients and resilience on import
+    os.environ.update({"HTTP_INFERENCE_TIMEOUT": str(args.timeout), "GRADIENT_API_KEY": "stub"})
+
+    results = {}
+    with StubProcess(args.latency_ms, args.latency_ms / 5) as healthy:
+        for name, faults in scenarios(args).items():
+            if args.scenario and name not in args.scenario:
+                continue
+            with StubProcess(**faults) as stub:
+                for mode in MODES:
+                    results[f"{name}_{mode}"] = run_mode(mode, f"{healthy.url}/v1/chat/completions",
+                                                         f"{stub.url}/v1/chat/completions", args)
+
+    print(f"{args.calls} calls per run, {args.concurrency} concurrent, {args.timeout:.0f} s upstream timeout")
+    print(f"{'run':<20} {'ok':>6} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9} {'rejected':>9} "
+          f"{'retries':>8} {'hedges':>7} {'timeouts':>9}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['ok_ratio']:>6.1%} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['upstream_requests']:>9} "
+              f"{r['rejected']:>9} {r['retries']:>8} {r['hedges']:>7} {r['timeouts']:>9}")
+
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    write_results(args.json, "resilience", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Latency of pricing a grid of what-if scenarios for one return.
+
+    python -m benchmarks.bench_scenarios [--sizes 2 10 100 1000] [--repeat 200]
+
+Compares tools.scenarios.evaluate_scenarios (one vectorized pass) with
+re-running form_builder_node once per scenario, and checks both agree on
+every estimated refund.
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from nodes.form_builder import form_builder_node
+from tools.scenarios import evaluate_scenarios, scenario_grid
+from tools.tax_batch import FILING_STATUSES
+from tools.tax_calculator import get_standard_deduction
+
+BASE = {
+    "filing_status": "single",
+    "dependents": 2,
+    "total_income": 85_000.0,
+    "total_withheld": 14_195.0,
+    "standard_deduction": 15_000,
+    "itemized_total": 9_000.0,
+    "use_standard": True,
+    "credits": 0.0,
+}
+
+
+def make_grid(size: int) -> list:
+    rng = np.random.default_rng(size)
+    grid = scenario_grid(FILING_STATUSES, (None, True, False), (0.0, 5_000.0), (0.0, 2_000.0), (0.0, -1_000.0))
+    return [grid[i] for i in rng.integers(0, len(grid), size)]
+
+
+def form_builder_refunds(state: dict, grid: list) -> list[float]:
+    refunds = []
+    for scenario in grid:
+        filing_status = scenario.filing_status or state["filing_status"]
+        standard = get_standard_deduction(filing_status)
+        itemized = state["itemized_total"] + scenario.extra_deductions
+        use_standard = standard >= itemized if scenario.use_standard is None else scenario.use_standard
+        refunds.append(form_builder_node({
+            **state,
+            "filing_status": filing_status,
+            "standard_deduction": standard,
+            "itemized_total": itemized,
+            "use_standard": use_standard,
+            "credits": state["credits"] + scenario.extra_credits,
+            "total_withheld": state["total_withheld"] + scenario.extra_withholding,
+        })["estimated_refund"])
+    return refunds
+
+
+def timed(fn, repeat: int) -> float:
+    """µs per call"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return 1e6 * (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'scenarios':>10} {'form_builder µs':>16} {'vectorized µs':>14} {'speedup':>8}  check")
+    for size in args.sizes:
+        grid = make_grid(size)
+        expected = sorted(form_builder_refunds(BASE, grid), reverse=True)
+        actual = [r.estimated_refund for r in evaluate_scenarios(BASE, grid)]
+        check = "exact" if expected == actual else "MISMATCH"
+
+        loop_us = timed(lambda: form_builder_refunds(BASE, grid), args.repeat)
+        vector_us = timed(lambda: evaluate_scenarios(BASE, grid), args.repeat)
+        print(f"{size:>10,} {loop_us:>16,.1f} {vector_us:>14,.1f} {loop_us / vector_us:>7.1f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Serialization cost per session: /chat response bodies, stored state snapshots and socket writes.
+
+    python -m benchmarks.bench_serialization [--seconds 0.1] [--json results.json]
+
+Runs the graph for a few representative sessions: intake only, a finished
+filing, and a two-turn filing with review flags. For each session it times
+encoding and decoding, reporting the mean over the sessions of bytes and best
+µs per call (as in bench_micro):
+
+- ``response``: the /chat body, with ``json.dumps(...).encode()`` as before
+  (``json``) and with serialization.dumps (``fast``)
+- ``state``: the stored session state, as the stock ``json.dumps`` of it
+  (``json``), the previous zlib-compressed JSON format of the session store
+  (``json_zlib``), and serialization's snapshot with its msgpack body
+  (``snapshot``) and its JSON body (``snapshot_json``, used when no msgpack
+  package is installed)
+- ``write``: sending a response over a socketpair three ways: the headers and
+  body as two writes (AgentHandler before), joined into one buffer, and as one
+  sendmsg via serialization.send_buffers
+"""
+
+import json
+import zlib
+import socket
+import argparse
+import threading
+
+import serialization
+from main import app, chat_response
+from state import new_session_state, item_dict, TRANSIENT_FIELDS, IncomeItem, DeductionItem, ReviewFlag
+from benchmarks.bench_micro import measure
+from benchmarks.results import write_results
+
+FILING = "Hi, my name is Ann. I'm single and I earned $85,000 at Acme last year"
+HEAD = b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+
+
+def sessions() -> dict[str, dict]:
+    intake = app.invoke(new_session_state("bench-intake", "I'm single"))
+    filing = app.invoke(new_session_state("bench-filing", FILING))
+    flagged = app.invoke(new_session_state("bench-flagged", FILING))
+    flagged["user_message"] = "I also got a 1099 for $5,000 freelancing"
+    flagged = app.invoke(flagged)
+    flagged["review_flags"] = [ReviewFlag("total_income", "90000", "Multiple 1099s", 0.7)]
+    return {"intake": intake, "filing": filing, "flagged": flagged}
+
+
+def _default(obj):
+    return item_dict(obj)
+
+
+def json_state(state: dict) -> bytes:
+    durable = {key: value for key, value in state.items() if key not in TRANSIENT_FIELDS}
+    return json.dumps(durable, default=_default).encode()
+
+
+# Ledger fields and their item class, for the format before snapshots
+LEDGERS = {"income_items": IncomeItem, "deductions": DeductionItem, "review_flags": ReviewFlag}
+
+
+def json_zlib_state(state: dict) -> bytes:
+    """The session store's format before snapshots."""
+    data = {
+        key: [item_dict(item, exclude_defaults=True) for item in value] if key in LEDGERS else value
+        for key, value in state.items() if key not in TRANSIENT_FIELDS
+    }
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)
+
+
+def json_zlib_decode(blob: bytes) -> dict:
+    data = json.loads(zlib.decompress(blob))
+    for key, cls in LEDGERS.items():
+        if key in data:
+            data[key] = [cls(**item) for item in data[key]]
+    return data
+
+
+def snapshot_json(state: dict) -> bytes:
+    module, serialization.MSGPACK_MODULE = serialization.MSGPACK_MODULE, None
+    try:
+        return serialization.encode_snapshot(state)
+    finally:
+        serialization.MSGPACK_MODULE = module
+
+
+def codecs() -> dict[str, dict]:
+    """Per case and format: (encode(obj) -> bytes, decode(bytes))."""
+    return {
+        "response": {
+            "json": (lambda body: json.dumps(body).encode(), json.loads),
+            "fast": (serialization.dumps, serialization.loads),
+        },
+        "state": {
+            "json": (json_state, json.loads),
+            "json_zlib": (json_zlib_state, json_zlib_decode),
+            "snapshot": (serialization.encode_snapshot, serialization.decode_snapshot),
+            "snapshot_json": (snapshot_json, serialization.decode_snapshot),
+        },
+    }
+
+
+def socket_writes(body: bytes, args) -> dict[str, float]:
+    """Best µs per response written over a socketpair, drained by a reader thread."""
+    sender, receiver = socket.socketpair()
+    stop = threading.Event()
+
+    def drain():
+        while not stop.is_set():
+            if not receiver.recv(1 << 20):
+                break
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    head = HEAD % len(body)
+    ways = {
+        "two_writes": lambda: (sender.sendall(head), sender.sendall(body)),
+        "joined": lambda: sender.sendall(head + body),
+        "sendmsg": lambda: serialization.send_buffers(sender, (head, body)),
+    }
+    try:
+        return {name: round(measure(fn, args.repeat, args.seconds) / 1000, 2) for name, fn in ways.items()}
+    finally:
+        stop.set()
+        sender.close()
+        reader.join()
+        receiver.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=0.1, help="target duration of each timing run")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    states = sessions()
+    inputs = {
+        "response": {name: chat_response(state) for name, state in states.items()},
+        "state": states,
+    }
+
+    results = {}
+    for case, formats in codecs().items():
+        for fmt, (encode, decode) in formats.items():
+            rows = []
+            for obj in inputs[case].values():
+                blob = encode(obj)
+                rows.append((
+                    len(blob),
+                    measure(lambda: encode(obj), args.repeat, args.seconds) / 1000,
+                    measure(lambda: decode(blob), args.repeat, args.seconds) / 1000,
+                ))
+            results[f"{case}_{fmt}"] = {
+                "bytes": round(sum(row[0] for row in rows) / len(rows), 1),
+                "encode_us": round(sum(row[1] for row in rows) / len(rows), 2),
+                "decode_us": round(sum(row[2] for row in rows) / len(rows), 2),
+            }
+
+    body = serialization.dumps(inputs["response"]["flagged"])
+    results["write"] = {f"{name}_us": us for name, us in socket_writes(body, args).items()}
+    results["write"]["bytes"] = len(body)
+
+    print(f"{'format':<22} {'bytes':>8} {'encode µs':>10} {'decode µs':>10}")
+    for name, r in results.items():
+        if name != "write":
+            print(f"{name:<22} {r['bytes']:>8.0f} {r['encode_us']:>10.2f} {r['decode_us']:>10.2f}")
+    w = results["write"]
+    print(f"write ({w['bytes']} B body): two writes {w['two_writes_us']} µs, joined {w['joined_us']} µs, "
+          f"sendmsg {w['sendmsg_us']} µs")
+
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    params["orjson"] = serialization.ORJSON_AVAILABLE
+    params["msgpack"] = serialization.MSGPACK_MODULE
+    write_results(args.json, "serialization", params, results)
+
+
+if __name__ == "__main__":
+    main()
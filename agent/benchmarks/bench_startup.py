@@ -0,0 +1,165 @@
+"""Agent cold start: import time per module, and time to the first served request.
+
+    python -m benchmarks.bench_startup [--runs 5] [--json results.json]
+
+``import`` runs ``python -X importtime -c "import main"`` in --runs fresh
+interpreters and keeps the best of each figure:
+
+- ``main_ms``: importing main, graph build included
+- ``modules``: cumulative ms of each of the agent's own modules, with
+  whatever it was first to import
+- ``packages``: self ms summed per third-party package, for packages above
+  --min-ms
+
+Each start-up case then starts main.py against the stub (as load_test does)
+--runs times, polling its port from the moment the process is spawned, and
+reports medians:
+
+- ``listen_ms``: spawn until the port accepts
+- ``first_chat_ms``: spawn until the first /chat, sent as soon as the port
+  accepts, is answered; this is what a request that woke a scaled-to-zero
+  agent waits
+- ``first_turn_ms``: that first /chat alone
+- ``warm_turn_ms``: a second /chat, for comparison
+
+The /chat turns are intake turns that call the (stub) model. Cases are each
+server mode with warm-up before binding (``warm``, AGENT_WARMUP=true) and
+without (``cold``).
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+from benchmarks.load_test import start_agent
+from benchmarks.stub_server import StubProcess, free_port
+from benchmarks.results import AGENT_DIR, write_results
+
+FIRST_MESSAGE = "Hi, I'd like to file my taxes"
+SECOND_MESSAGE = "Hello, I want to get my return done"
+CASES = {
+    "threaded_warm": ("threaded", "true"),
+    "threaded_cold": ("threaded", "false"),
+    "async_warm": ("async", "true"),
+    "async_cold": ("async", "false"),
+}
+
+
+def _first_party() -> set[str]:
+    names = {name[:-3] for name in os.listdir(AGENT_DIR) if name.endswith(".py")}
+    return names | {"nodes", "tools"}
+
+
+def import_times(runs: int) -> tuple[float, dict[str, float], dict[str, float]]:
+    """Best (main ms, ms per own module, self ms per third-party package) over ``runs``."""
+    ours = _first_party()
+    main_ms, modules, packages = float("inf"), {}, {}
+    for _ in range(runs):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"], cwd=AGENT_DIR,
+            capture_output=True, text=True, check=True,
+        ).stderr
+        run_packages: dict[str, float] = {}
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            root = name.split(".")[0]
+            if name == "main":
+                main_ms = min(main_ms, int(cumulative) / 1000)
+            elif root in ours:
+                modules[name] = min(modules.get(name, float("inf")), int(cumulative) / 1000)
+            else:
+                run_packages[root] = run_packages.get(root, 0.0) + int(own) / 1000
+        for root, ms in run_packages.items():
+            packages[root] = min(packages.get(root, float("inf")), ms)
+    return main_ms, modules, packages
+
+
+def _wait_listening(port: int, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.002)
+    raise RuntimeError(f"Agent on port {port} did not start listening")
+
+
+def _chat(url: str, session_id: str, message: str) -> float:
+    start = time.perf_counter()
+    response = httpx.post(f"{url}/chat", json={"session_id": session_id, "message": message}, timeout=60)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def cold_start(mode: str, warmup: str, stub_url: str) -> dict[str, float]:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    spawned = time.perf_counter()
+    agent = start_agent(mode, port, stub_url, {"AGENT_WARMUP": warmup})
+    try:
+        _wait_listening(port)
+        listening = time.perf_counter()
+        first_turn = _chat(url, "cold-1", FIRST_MESSAGE)
+        answered = time.perf_counter()
+        warm_turn = _chat(url, "cold-2", SECOND_MESSAGE)
+    finally:
+        agent.terminate()
+        agent.wait()
+    return {
+        "listen_ms": 1000 * (listening - spawned),
+        "first_chat_ms": 1000 * (answered - spawned),
+        "first_turn_ms": 1000 * first_turn,
+        "warm_turn_ms": 1000 * warm_turn,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20, help="stub model latency")
+    parser.add_argument("--min-ms", type=float, default=5, help="smallest package import time to report")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="run only these start-up cases")
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    main_ms, modules, packages = import_times(args.runs)
+    results = {"import": {
+        "main_ms": round(main_ms, 1),
+        "modules": {name: round(ms, 1) for name, ms in sorted(modules.items(), key=lambda item: -item[1])},
+        "packages": {name: round(ms, 1) for name, ms in sorted(packages.items(), key=lambda item: -item[1])
+                     if ms >= args.min_ms},
+    }}
+
+    with StubProcess(args.latency_ms) as stub:
+        for case, (mode, warmup) in CASES.items():
+            if args.case and case not in args.case:
+                continue
+            runs = [cold_start(mode, warmup, stub.url) for _ in range(args.runs)]
+            results[case] = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+
+    imports = results["import"]
+    print(f"import main: {imports['main_ms']:.0f} ms (best of {args.runs})")
+    print("  own modules:", ", ".join(f"{name} {ms:.1f}" for name, ms in list(imports["modules"].items())[:8]))
+    print("  packages:   ", ", ".join(f"{name} {ms:.0f}" for name, ms in imports["packages"].items()))
+    print(f"{'case':<15} {'listen ms':>10} {'first chat ms':>14} {'first turn ms':>14} {'warm turn ms':>13}")
+    for case, r in results.items():
+        if case != "import":
+            print(f"{case:<15} {r['listen_ms']:>10.0f} {r['first_chat_ms']:>14.0f} {r['first_turn_ms']:>14.1f} "
+                  f"{r['warm_turn_ms']:>13.1f}")
+
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    write_results(args.json, "startup", params, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Per-session memory and per-turn allocation cost of the agent state.
+
+    python -m benchmarks.bench_state_memory [--sessions 2000] [--turns 2000]
+
+Runs one complete filing turn per session through the compiled graph (the
+turn hands off past intake, so no LLM is called) and reports:
+
+- retained bytes per session for the finished states held in memory
+- encoded bytes per session as stored by the session store
+- peak bytes allocated while running one turn, through the graph and through
+  the bare node pipeline (classifier → deduction → form_builder → review)
+- microseconds per turn for both
+"""
+
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+
+from main import app, chat_response
+from state import new_session_state
+from session_store import encode_state
+from batch import PIPELINE
+
+MESSAGE = "Hi, my name is Ann. I'm single and I earned $85,000 at Acme last year"
+
+
+def turn_state(i: int) -> dict:
+    return new_session_state(f"bench-{i}", MESSAGE)
+
+
+def retained_bytes(sessions: int) -> tuple[float, float]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [app.invoke(turn_state(i)) for i in range(sessions)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    encoded = sum(len(encode_state(r)) for r in results) / sessions
+    return retained / sessions, encoded
+
+
+def per_turn(run, turns: int) -> tuple[float, float]:
+    """(peak bytes allocated during one turn, µs per turn)"""
+    for i in range(50):
+        run(i)
+    tracemalloc.start()
+    peaks = []
+    for i in range(min(turns, 200)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for i in range(turns):
+        run(i)
+    return sum(peaks) / len(peaks), 1e6 * (time.perf_counter() - start) / turns
+
+
+def graph_turn(i: int) -> dict:
+    return chat_response(app.invoke(turn_state(i)))
+
+
+def pipeline_turn(i: int) -> dict:
+    state = turn_state(i)
+    state["filing_status"] = "single"
+    for node in PIPELINE:
+        state = {**state, **node(state)}
+    return chat_response(state)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    retained, encoded = retained_bytes(args.sessions)
+    graph_peak, graph_us = per_turn(graph_turn, args.turns)
+    pipeline_peak, pipeline_us = per_turn(pipeline_turn, args.turns)
+    print(json.dumps({
+        "retained_bytes_per_session": round(retained),
+        "encoded_bytes_per_session": round(encoded),
+        "graph_peak_bytes_per_turn": round(graph_peak),
+        "graph_us_per_turn": round(graph_us, 1),
+        "pipeline_peak_bytes_per_turn": round(pipeline_peak),
+        "pipeline_us_per_turn": round(pipeline_us, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of the vectorized tax engine vs. the scalar bracket loop.
+
+    python -m benchmarks.bench_tax_batch [--sizes 10000 1000000 10000000] [--loop-limit 1000000]
+
+The scalar loop is timed on at most --loop-limit rows and its throughput is
+extrapolated for larger sizes.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from tools.tax_batch import FILING_STATUSES, calculate_federal_tax_batch
+from tools.tax_calculator import (
+    calculate_federal_tax,
+    calculate_effective_rate,
+    calculate_marginal_rate,
+)
+
+
+def make_returns(n: int, seed: int = 2025) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    incomes = np.round(rng.lognormal(mean=11.0, sigma=0.9, size=n), 2)
+    codes = rng.integers(0, len(FILING_STATUSES), size=n)
+    return incomes, codes
+
+
+def run_loop(incomes: np.ndarray, codes: np.ndarray) -> list[tuple[float, float, float]]:
+    out = []
+    for income, code in zip(incomes.tolist(), codes.tolist()):
+        status = FILING_STATUSES[code]
+        out.append((
+            calculate_federal_tax(income, status),
+            calculate_effective_rate(income, status),
+            calculate_marginal_rate(income, status),
+        ))
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--loop-limit", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'loop rows/s':>14} {'batch rows/s':>14} {'speedup':>9}  check")
+    for n in args.sizes:
+        incomes, codes = make_returns(n)
+
+        start = time.perf_counter()
+        batch = calculate_federal_tax_batch(incomes, codes)
+        batch_s = time.perf_counter() - start
+
+        m = min(n, args.loop_limit)
+        start = time.perf_counter()
+        loop = run_loop(incomes[:m], codes[:m])
+        loop_s = time.perf_counter() - start
+
+        expected = np.array(loop)
+        actual = np.column_stack([
+            batch["federal_tax"][:m], batch["effective_rate"][:m], batch["marginal_rate"][:m],
+        ])
+        check = "exact" if np.array_equal(expected, actual) else "MISMATCH"
+        if m < n:
+            check += f" ({m:,} rows checked)"
+
+        loop_rps = m / loop_s
+        batch_rps = n / batch_s
+        print(f"{n:>12,} {loop_rps:>14,.0f} {batch_rps:>14,.0f} {batch_rps / loop_rps:>8.1f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
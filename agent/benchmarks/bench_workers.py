@@ -0,0 +1,67 @@
+"""/chat throughput by worker count under the multi-process supervisor.
+
+    python -m benchmarks.bench_workers [--workers 1 2 4 8] [--mode threaded] [--json results.json]
+
+For each worker count, starts main.py with AGENT_WORKERS=N against the local
+stub, drives the same concurrent load as benchmarks.load_test and reports
+req/s, speedup over the first count and latency percentiles. Every run uses
+a fresh SQLite session store, so one worker pays the same session I/O as
+many. Speedup is bounded by the cores left over for the load generator and
+the stub, so compare counts up to the machine's CPU count.
+"""
+
+import os
+import asyncio
+import argparse
+import tempfile
+
+from benchmarks.load_test import start_agent, wait_healthy, run_load
+from benchmarks.results import write_results
+from benchmarks.stub_server import StubProcess, free_port
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--mode", choices=["async", "threaded"], default="threaded")
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--reuse-port", action="store_true", help="per-worker SO_REUSEPORT sockets")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{os.cpu_count()} CPUs, mode={args.mode}, {args.sessions} sessions x {args.turns} turns")
+    print(f"{'workers':>8} {'req/s':>8} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    with StubProcess(latency_ms=args.latency_ms) as stub, tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        for n in args.workers:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            agent = start_agent(args.mode, port, stub.url, {
+                "AGENT_WORKERS": str(n),
+                "AGENT_REUSE_PORT": str(args.reuse_port).lower(),
+                "SESSION_STORE": "sqlite",
+                "SESSION_STORE_PATH": os.path.join(tmp, f"sessions-{n}.db"),
+            })
+            try:
+                wait_healthy(url)
+                result = asyncio.run(run_load(url, args.sessions, args.turns, args.timeout))
+            finally:
+                agent.terminate()
+                agent.wait()
+
+            baseline = baseline or result["throughput_rps"]
+            result["speedup"] = result["throughput_rps"] / baseline if baseline else 0.0
+            results[f"workers_{n}"] = result
+            print(f"{n:>8} {result['throughput_rps']:>8.1f} {result['speedup']:>7.2f}x "
+                  f"{result['p50_ms']:>8.0f} {result['p99_ms']:>8.0f} {result['errors']:>7}")
+
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    write_results(args.json, "workers", params, results)
+
+
+if __name__ == "__main__":
+    main()
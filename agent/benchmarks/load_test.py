@@ -0,0 +1,144 @@
+"""Concurrent /chat load test against a local agent and stub inference server.
+
+    python -m benchmarks.load_test --mode async --sessions 200 --turns 3 --latency-ms 500 [--json results.json]
+
+Starts the stub (benchmarks.stub_server) in a subprocess, launches main.py in the
+requested AGENT_SERVER_MODE as a subprocess pointed at the stub, then drives
+--sessions concurrent conversations of --turns intake turns each. --jitter-ms
+and --error-rate are passed to the stub to exercise the agent's fallbacks.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.stub_server import StubProcess, free_port
+from benchmarks.results import write_results
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TURNS = [
+    "Hi, I'd like to file my taxes",
+    "I'm single",
+    "My name is Jordan",
+    "I live in California",
+]
+
+
+def start_agent(mode: str, port: int, stub_url: str, extra_env: dict | None = None) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "AGENT_SERVER_MODE": mode,
+        "GRADIENT_INFERENCE_URL": f"{stub_url}/v1/chat/completions",
+        "DO_KB_URL": stub_url,
+        "GRADIENT_API_KEY": "stub",
+        "DO_KB_API_KEY": "stub",
+        **(extra_env or {}),
+    }
+    return subprocess.Popen(
+        [sys.executable, "main.py"], cwd=AGENT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_healthy(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Agent at {url} did not become healthy")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_load(url: str, sessions: int, turns: int, timeout: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    error_kinds: dict[str, int] = {}
+
+    async def conversation(client: httpx.AsyncClient, session_id: str):
+        nonlocal errors
+        for message in (TURNS * turns)[:turns]:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}/chat", json={"session_id": session_id, "message": message})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                errors += 1
+                kind = f"http_{e.response.status_code}" if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+                error_kinds[kind] = error_kinds.get(kind, 0) + 1
+
+    # One small client per 16 sessions: httpx pools slow down sharply with
+    # hundreds of connections, which would make the generator the bottleneck.
+    shards = max(1, sessions // 16)
+    clients = [httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_keepalive_connections=16))
+               for _ in range(shards)]
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(clients[i % shards], f"load-{i}") for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.aclose()
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_kinds": error_kinds,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["async", "threaded"], default="async")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of stub requests to fail")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="write results to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    with StubProcess(args.latency_ms, args.jitter_ms, error_rate=args.error_rate) as stub:
+        agent = start_agent(args.mode, port, stub.url)
+        try:
+            wait_healthy(url)
+            result = asyncio.run(run_load(url, args.sessions, args.turns, args.timeout))
+        finally:
+            agent.terminate()
+            agent.wait()
+
+    print(
+        f"mode={args.mode} sessions={args.sessions} turns={args.turns} stub_latency={args.latency_ms:.0f}ms\n"
+        f"  requests={result['requests']} errors={result['errors']} {result['error_kinds'] or ''} elapsed={result['elapsed_s']:.2f}s "
+        f"throughput={result['throughput_rps']:.1f} req/s\n"
+        f"  p50={result['p50_ms']:.0f}ms p95={result['p95_ms']:.0f}ms p99={result['p99_ms']:.0f}ms"
+    )
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    write_results(args.json, "load", params, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Machine-readable benchmark results, and comparison between two runs.
+
+    python -m benchmarks.results baseline.json candidate.json [--threshold 10]
+
+Benchmarks given ``--json PATH`` write a document of the form::
+
+    {"benchmark": "graph", "environment": {...}, "params": {...}, "results": {...}}
+
+``environment`` records the git commit, Python version and CPU count so runs
+from different commits can be lined up. Comparing two such files prints every
+numeric result that changed by more than --threshold percent; it exits 1 if
+any changed in the bad direction (metrics named ``*_rps``, ``*_per_s``,
+``speedup`` or ``*hit*`` regress when they fall, everything else when it rises).
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_HIGHER_IS_BETTER = ("_rps", "_per_s", "speedup", "hit")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=AGENT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def write_results(path: str | None, benchmark: str, params: dict, results: dict) -> dict:
+    """Build the results document and write it to path (``-`` for stdout, None to skip)."""
+    document = {"benchmark": benchmark, "environment": environment(), "params": params, "results": results}
+    if path == "-":
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    elif path:
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+    return document
+
+
+def flatten(value, prefix: str = "") -> dict[str, float]:
+    """Numeric leaves of a results tree, keyed by dotted path."""
+    if isinstance(value, dict):
+        out = {}
+        for key, child in value.items():
+            out.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+        return out
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+
+def compare(baseline: dict, candidate: dict, threshold: float = 10.0) -> list[tuple[str, float, float, float, bool]]:
+    """(metric, baseline, candidate, % change, regressed) for metrics that moved past threshold."""
+    before, after = flatten(baseline["results"]), flatten(candidate["results"])
+    changes = []
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        if old == new:
+            continue
+        change = 100.0 * (new - old) / abs(old) if old else float("inf")
+        if abs(change) < threshold:
+            continue
+        higher_is_better = any(marker in metric.rsplit(".", 1)[-1] for marker in _HIGHER_IS_BETTER)
+        changes.append((metric, old, new, change, (change < 0) == higher_is_better))
+    return changes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="ignore changes below this percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"{baseline['environment'].get('commit')} -> {candidate['environment'].get('commit')}")
+    changes = compare(baseline, candidate, args.threshold)
+    for metric, old, new, change, regressed in changes:
+        print(f"{'REGRESSED' if regressed else 'improved ':>9}  {metric:<48} {old:>12,.3f} -> {new:>12,.3f} ({change:+.1f}%)")
+    if not changes:
+        print(f"No result moved by more than {args.threshold:g}%")
+    sys.exit(1 if any(regressed for *_, regressed in changes) else 0)
+
+
+if __name__ == "__main__":
+    main()
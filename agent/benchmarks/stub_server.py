@@ -0,0 +1,189 @@
+"""Local stand-in for Gradient inference and the DO Knowledge Base.
+
+    python -m benchmarks.stub_server --port 8900 --latency-ms 500 [--error-rate 0.05] [--slow-rate 0.05 --slow-ms 2000]
+
+Serves POST /v1/chat/completions (OpenAI-compatible), POST /query (KB) and
+POST /v1/chat/completions/batch, the batch format in inference.py; a batch
+costs one request's latency.
+Every response is delayed by --latency-ms (+/- --jitter-ms), and a random
+--slow-rate fraction by --slow-ms more, for a latency tail; completions
+requested with "stream": true are sent as SSE chunks, one word every
+--token-ms. A random --error-rate fraction of requests instead fails with
+--error-status after the same delay. The stub is asyncio-based so hundreds of parked requests cost no
+threads; benchmarks run it in its own process (StubProcess) to keep it off
+the client's GIL.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Stub:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, token_ms: float = 0,
+                 error_rate: float = 0, error_status: int = 503, slow_rate: float = 0, slow_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.token_ms = token_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+
+    @staticmethod
+    def reply_text(request: dict) -> str:
+        user = request.get("messages", [{}])[-1].get("content", "")
+        return f"Stub reply to: {user[:80]}"
+
+    async def stream_reply(self, writer: asyncio.StreamWriter, request: dict) -> None:
+        """Chunked SSE in the OpenAI streaming format, one word per event."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        words = self.reply_text(request).split(" ")
+        for i, word in enumerate(words):
+            delta = {"choices": [{"delta": {"content": word if i == 0 else f" {word}"}}]}
+            event = f"data: {json.dumps(delta)}\n\n".encode()
+            writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+            await writer.drain()
+            if self.token_ms:
+                await asyncio.sleep(self.token_ms / 1000)
+        done = b"data: [DONE]\n\n"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(done), done))
+        await writer.drain()
+
+    async def respond(self, path: str, request: dict) -> tuple[int, dict]:
+        if path.endswith("/chat/completions/batch"):
+            return 200, {"responses": [
+                {"choices": [{"message": {"role": "assistant", "content": self.reply_text(item)}}]}
+                for item in request.get("requests", [])
+            ]}
+        if path.endswith("/chat/completions"):
+            return 200, {
+                "choices": [{"message": {"role": "assistant", "content": self.reply_text(request)}}],
+            }
+        if path.endswith("/query"):
+            return 200, {
+                "results": [
+                    {"text": f"Stub KB passage {i} for: {request.get('query', '')}", "score": 1.0 / (i + 1), "metadata": {}}
+                    for i in range(request.get("top_k", 3))
+                ],
+            }
+        return 404, {"error": "not found"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                path = lines[0].split(" ")[1]
+                length = 0
+                for line in lines[1:]:
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = await reader.readexactly(length) if length else b""
+
+                request = json.loads(body or b"{}")
+                delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+                if self.slow_rate and random.random() < self.slow_rate:
+                    delay += self.slow_ms
+                if delay > 0:
+                    await asyncio.sleep(delay / 1000)
+                if self.error_rate and random.random() < self.error_rate:
+                    status, payload = self.error_status, {"error": "injected failure"}
+                elif request.get("stream") and path.endswith("/chat/completions"):
+                    await self.stream_reply(writer, request)
+                    continue
+                else:
+                    status, payload = await self.respond(path, request)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, ready=None):
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        if ready:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubProcess:
+    """Run the stub in a subprocess for the duration of a with-block."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, token_ms: float = 0,
+                 error_rate: float = 0, error_status: int = 503, slow_rate: float = 0, slow_ms: float = 0):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.args = ["--port", str(self.port), "--latency-ms", str(latency_ms),
+                     "--jitter-ms", str(jitter_ms), "--token-ms", str(token_ms),
+                     "--error-rate", str(error_rate), "--error-status", str(error_status),
+                     "--slow-rate", str(slow_rate), "--slow-ms", str(slow_ms)]
+        self.proc: subprocess.Popen | None = None
+
+    def __enter__(self) -> "StubProcess":
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.stub_server", *self.args],
+            cwd=AGENT_DIR, stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("Stub server did not start")
+
+    def __exit__(self, *exc):
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--token-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests to fail (0-1)")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--slow-rate", type=float, default=0, help="fraction of requests delayed by --slow-ms (0-1)")
+    parser.add_argument("--slow-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    stub = Stub(args.latency_ms, args.jitter_ms, args.token_ms, args.error_rate, args.error_status,
+                args.slow_rate, args.slow_ms)
+    ready = lambda port: print(f"Stub inference/KB server on http://{args.host}:{port}", flush=True)
+    try:
+        asyncio.run(stub.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
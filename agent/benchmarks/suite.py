@@ -0,0 +1,82 @@
+"""Run every benchmark, micro through HTTP load, into one JSON file.
+
+    python -m benchmarks.suite -o bench-<commit>.json [--quick]
+    python -m benchmarks.results bench-<old>.json bench-<new>.json
+
+Each benchmark runs in its own process (so the graph benchmark's environment
+and imports don't leak into the others) and writes its results with --json;
+the suite merges them under one ``results`` (and ``params``) key per
+benchmark. Benchmark output goes to stderr. --quick shrinks every run for a
+smoke check.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+from benchmarks.results import AGENT_DIR, write_results
+
+FULL = {
+    "micro": ["benchmarks.bench_micro"],
+    "extraction": ["benchmarks.bench_extraction"],
+    "graph": ["benchmarks.bench_graph", "--turns", "200", "--latency-ms", "50"],
+    "graph_errors": ["benchmarks.bench_graph", "--turns", "200", "--latency-ms", "50", "--error-rate", "0.1"],
+    "graph_remote_kb": ["benchmarks.bench_graph", "--turns", "200", "--latency-ms", "50", "--remote-kb"],
+    "persistence": ["benchmarks.bench_persistence", "--sessions", "2000"],
+    "dispatcher": ["benchmarks.bench_dispatcher", "--calls", "2000", "--latency-ms", "50"],
+    "resilience": ["benchmarks.bench_resilience"],
+    "serialization": ["benchmarks.bench_serialization"],
+    "startup": ["benchmarks.bench_startup"],
+    "load_threaded": ["benchmarks.load_test", "--mode", "threaded", "--sessions", "50", "--turns", "3",
+                      "--latency-ms", "100"],
+    "load_async": ["benchmarks.load_test", "--mode", "async", "--sessions", "200", "--turns", "3",
+                   "--latency-ms", "100"],
+}
+
+QUICK = {
+    "micro": ["--seconds", "0.02", "--repeat", "3"],
+    "extraction": ["--seconds", "0.05", "--repeat", "3"],
+    "graph": ["--turns", "20"],
+    "graph_errors": ["--turns", "20"],
+    "graph_remote_kb": ["--turns", "20"],
+    "persistence": ["--sessions", "200"],
+    "dispatcher": ["--calls", "200"],
+    "resilience": ["--calls", "40", "--warmup", "40", "--brownout-ms", "3000", "--timeout", "2"],
+    "serialization": ["--seconds", "0.02", "--repeat", "2"],
+    "startup": ["--runs", "1"],
+    "load_threaded": ["--sessions", "10", "--turns", "2"],
+    "load_async": ["--sessions", "20", "--turns", "2"],
+}
+
+
+def run_one(name: str, args: list[str], out_dir: str) -> dict:
+    path = os.path.join(out_dir, f"{name}.json")
+    subprocess.run([sys.executable, "-m", *args, "--json", path], cwd=AGENT_DIR, check=True, stdout=sys.stderr)
+    with open(path) as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default="-", help="results file ('-' for stdout)")
+    parser.add_argument("--only", nargs="+", choices=list(FULL), help="run just these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="small runs, for a smoke check")
+    args = parser.parse_args()
+
+    params, results = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.only or FULL:
+            # argparse keeps the last value, so quick overrides replace the full ones
+            command = FULL[name] + (QUICK[name] if args.quick else [])
+            print(f"== {name}", file=sys.stderr, flush=True)
+            document = run_one(name, command, tmp)
+            params[name], results[name] = document["params"], document["results"]
+
+    write_results(args.output, "suite", {"quick": args.quick, **params}, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Response cards, rendered from the state when a response is built.
+
+Nodes only update state fields. Each node module's ``render_cards`` derives
+the cards that node shows from the state, so cards are never stored in
+sessions or carried from node to node.
+"""
+
+from state import TaxPilotState
+from nodes import intake, classifier, deduction, form_builder, review
+
+CARD_RENDERERS = {
+    "intake": intake.render_cards,
+    "classifier": classifier.render_cards,
+    "deduction": deduction.render_cards,
+    "form_builder": form_builder.render_cards,
+    "review": review.render_cards,
+}
+
+
+def render_cards(state: TaxPilotState, node: str | None = None) -> list[dict]:
+    """Cards for ``node`` (default: the node that produced the state)."""
+    renderer = CARD_RENDERERS.get(node or state.get("current_node", "intake"))
+    return renderer(state) if renderer else []
@@ -0,0 +1,222 @@
+"""Cache of intake completions keyed by prompt state and user message.
+
+INTAKE_PROMPT only varies in a few fields (name, filing status, state,
+dependents, income count) and intake messages are highly repetitive, so a
+completion is reused when both the normalized fields and the normalized
+message match. With INTAKE_CACHE_SIMILARITY > 0, a message whose word set is
+at least that Jaccard-similar to a cached one under the same fields (and
+mentions the same numbers) also hits.
+
+Entries are LRU-bounded (INTAKE_CACHE_SIZE) with a per-entry TTL
+(INTAKE_CACHE_TTL). Set INTAKE_CACHE_PATH to persist the cache to disk so a
+warm cache survives restarts.
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import tempfile
+import threading
+from collections import OrderedDict
+
+import metrics
+from cache import TTLCache
+from fast_path import llm_latency
+
+INTAKE_CACHE_SIZE = int(os.environ.get("INTAKE_CACHE_SIZE", 4096))
+INTAKE_CACHE_TTL = float(os.environ.get("INTAKE_CACHE_TTL", 24 * 3600))
+INTAKE_CACHE_PATH = os.environ.get("INTAKE_CACHE_PATH", "")
+# Minimum Jaccard similarity for a near-duplicate hit; 0 disables
+INTAKE_CACHE_SIMILARITY = float(os.environ.get("INTAKE_CACHE_SIMILARITY", 0))
+# Write the cache to INTAKE_CACHE_PATH after this many new entries
+INTAKE_CACHE_SAVE_EVERY = int(os.environ.get("INTAKE_CACHE_SAVE_EVERY", 100))
+
+# Messages remembered per prompt key for near-duplicate matching
+_BUCKET_SIZE = 256
+_FORMAT_VERSION = 1
+_TOKEN = re.compile(r"\$?\d[\d,]*(?:\.\d+)?|[a-z]+(?:'[a-z]+)?")
+
+LOOKUPS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_intake_cache_lookups_total", "Intake completion cache lookups", ("result",)))
+LATENCY_SAVED = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_intake_cache_latency_saved_seconds_total", "Estimated model latency avoided by cache hits"))
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(_TOKEN.findall(message.casefold()))
+
+
+def prompt_key(fields: dict) -> tuple:
+    """Normalized INTAKE_PROMPT fields."""
+    return (
+        str(fields.get("name") or "").strip().casefold(),
+        str(fields.get("filing_status") or "").strip().casefold(),
+        str(fields.get("state") or "").strip().casefold(),
+        int(fields.get("dependents") or 0),
+        int(fields.get("income_count") or 0),
+    )
+
+
+def _numbers(tokens: frozenset[str]) -> frozenset[str]:
+    return frozenset(t for t in tokens if t[0].isdigit() or t[0] == "$")
+
+
+class CompletionCache:
+    def __init__(self, maxsize: int = INTAKE_CACHE_SIZE, ttl: float = INTAKE_CACHE_TTL,
+                 similarity: float = INTAKE_CACHE_SIMILARITY, path: str = INTAKE_CACHE_PATH):
+        self.similarity = similarity
+        self.path = path
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # prompt key -> normalized message -> its word set, oldest first
+        self._buckets: dict[tuple, OrderedDict[str, frozenset[str]]] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = {"exact": 0, "near": 0}
+        self.misses = 0
+
+    def _near(self, key: tuple, message: str) -> str | None:
+        tokens = frozenset(message.split())
+        if not tokens:
+            return None
+        numbers = _numbers(tokens)
+        best, best_score = None, self.similarity
+        with self._lock:
+            candidates = list(self._buckets.get(key, {}).items())
+        for cached_message, cached_tokens in candidates:
+            if _numbers(cached_tokens) != numbers:
+                continue
+            score = len(tokens & cached_tokens) / len(tokens | cached_tokens)
+            if score >= best_score:
+                best, best_score = cached_message, score
+        return best
+
+    def lookup(self, fields: dict, message: str) -> str | None:
+        """Cached completion for this prompt state and message, or None."""
+        key, message = prompt_key(fields), normalize_message(message)
+        reply = self._cache.get((key, message))
+        result = "exact"
+        if reply is None and self.similarity > 0:
+            similar = self._near(key, message)
+            if similar is not None:
+                reply = self._cache.get((key, similar))
+                result = "near"
+
+        with self._lock:
+            if reply is None:
+                self.misses += 1
+            else:
+                self.hits[result] += 1
+        if reply is None:
+            LOOKUPS.inc(result="miss")
+            return None
+        LOOKUPS.inc(result=result)
+        LATENCY_SAVED.inc(llm_latency.value)
+        return reply
+
+    def _insert(self, key: tuple, message: str, reply: str, ttl: float | None) -> None:
+        self._cache.set((key, message), reply, ttl)
+        with self._lock:
+            bucket = self._buckets.setdefault(key, OrderedDict())
+            bucket[message] = frozenset(message.split())
+            bucket.move_to_end(message)
+            if len(bucket) > _BUCKET_SIZE:
+                bucket.popitem(last=False)
+
+    def store(self, fields: dict, message: str, reply: str, ttl: float | None = None) -> None:
+        if not reply:
+            return
+        self._insert(prompt_key(fields), normalize_message(message), reply, ttl)
+        with self._lock:
+            self._unsaved += 1
+            due = self.path and self._unsaved >= INTAKE_CACHE_SAVE_EVERY
+        if due:
+            self.save()
+
+    def save(self, path: str | None = None) -> None:
+        """Atomically write live entries with their wall-clock expiry."""
+        path = path or self.path
+        if not path:
+            return
+        with self._save_lock:
+            with self._lock:
+                self._unsaved = 0
+            now = time.time()
+            entries = [[list(key), message, reply, now + left] for (key, message), reply, left in self._cache.items()]
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # Worker processes sharing INTAKE_CACHE_PATH each write their own temp file
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"version": _FORMAT_VERSION, "llm_seconds": llm_latency.value, "entries": entries},
+                              f, separators=(",", ":"))
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def load(self, path: str | None = None) -> int:
+        """Restore unexpired entries saved by ``save``; returns how many."""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("version") != _FORMAT_VERSION:
+            return 0
+
+        # Price hits in a process that has not called the model yet
+        if not llm_latency.value:
+            llm_latency.update(data.get("llm_seconds", 0.0))
+        now, loaded = time.time(), 0
+        for key, message, reply, expires_at in data.get("entries", []):
+            if expires_at > now:
+                self._insert(tuple(key), message, reply, expires_at - now)
+                loaded += 1
+        return loaded
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "exact_hits": self.hits["exact"],
+            "near_hits": self.hits["near"],
+            "misses": self.misses,
+            "evictions": self._cache.evictions,
+            "expirations": self._cache.expirations,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": LATENCY_SAVED.value(),
+        }
+
+
+_cache: CompletionCache | None = None
+_lock = threading.Lock()
+
+
+def get_completion_cache() -> CompletionCache:
+    """Process-wide intake cache, loaded from INTAKE_CACHE_PATH on first use."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                cache = CompletionCache()
+                cache.load()
+                if cache.path:
+                    atexit.register(cache.save)
+                _cache = cache
+    return _cache
+
+
+metrics.REGISTRY.add_collector(
+    lambda: metrics.stats_gauges("taxpilot_cache", "cache", {"intake": get_completion_cache().stats()}, (
+        "size", "exact_hits", "near_hits", "misses", "evictions", "hit_ratio",
+    ))
+)
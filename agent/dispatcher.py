@@ -0,0 +1,444 @@
+"""Inference dispatcher: admission, coalescing, queueing and micro-batching of completions.
+
+Intake's completions go through here on their way to inference.py:
+
+1. Admission: each tenant has a token bucket (INFERENCE_TENANT_RPS requests
+   a second, bursts of INFERENCE_TENANT_BURST; 0 turns limits off). A call
+   over its tenant's rate, or arriving with INFERENCE_MAX_QUEUE calls already
+   waiting, is shed at once.
+2. Coalescing: a call whose system prompt and message match one already in
+   flight shares that call's reply instead of making its own.
+3. Queueing: at most INFERENCE_MAX_IN_FLIGHT upstream requests run at once;
+   others wait in FIFO order, and a call still waiting after
+   INFERENCE_QUEUE_TIMEOUT seconds is shed.
+4. Micro-batching, only when GRADIENT_INFERENCE_BATCH_URL names a batch
+   endpoint: calls arriving within INFERENCE_BATCH_WINDOW_MS of the first,
+   up to INFERENCE_BATCH_SIZE, go up as one request holding one slot. The
+   chat completions API has no batch call, so without one there is no
+   window and nothing is held back.
+
+Shed calls raise Overloaded, and intake answers them (and CircuitOpen) with
+its fallback reply, as for any other upstream failure.
+
+Threads (the threaded server) and coroutines (the async server) share one
+queue, in-flight table and batch: every wait is a concurrent.futures.Future,
+which threads block on and coroutines await through asyncio.wrap_future.
+Streamed completions are admitted and queued the same way but never coalesced
+or batched.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout, wait as wait_futures
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Iterator
+
+import metrics
+import inference
+import resilience
+from cache import TTLCache
+
+INFERENCE_TENANT_RPS = float(os.environ.get("INFERENCE_TENANT_RPS", 0))
+INFERENCE_TENANT_BURST = float(os.environ.get("INFERENCE_TENANT_BURST", 0)) or max(1.0, INFERENCE_TENANT_RPS)
+INFERENCE_MAX_IN_FLIGHT = int(os.environ.get("INFERENCE_MAX_IN_FLIGHT", 64))
+INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", 512))
+INFERENCE_QUEUE_TIMEOUT = float(os.environ.get("INFERENCE_QUEUE_TIMEOUT", 10))
+INFERENCE_BATCH_WINDOW_MS = float(os.environ.get("INFERENCE_BATCH_WINDOW_MS", 5))
+INFERENCE_BATCH_SIZE = int(os.environ.get("INFERENCE_BATCH_SIZE", 16))
+INFERENCE_COALESCE = os.environ.get("INFERENCE_COALESCE", "true").lower() in ("1", "true", "yes")
+
+DEFAULT_TENANT = "default"
+
+QUEUE_DEPTH = metrics.REGISTRY.register(metrics.Gauge(
+    "taxpilot_inference_queue_depth", "Completions waiting for an upstream slot"))
+QUEUE_WAIT = metrics.REGISTRY.register(metrics.Histogram(
+    "taxpilot_inference_queue_wait_seconds", "Time completions waited for an upstream slot"))
+BATCH_SIZE = metrics.REGISTRY.register(metrics.Histogram(
+    "taxpilot_inference_batch_size", "Completions per upstream inference request",
+    buckets=(1, 2, 4, 8, 16, 32, 64)))
+COALESCED = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_inference_coalesced_total", "Completions answered by an identical call already in flight"))
+SHED = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_inference_shed_total", "Completions refused before reaching upstream", ("reason",)))
+
+
+class Overloaded(RuntimeError):
+    """A completion shed by the dispatcher; ``reason`` is the shed metric's label."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Inference dispatcher shed the request ({reason})")
+        self.reason = reason
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "_lock")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Slots:
+    """FIFO admission to a fixed number of concurrent upstream requests.
+
+    ``request`` returns a future that resolves once a slot is granted; a
+    waiter that gives up must hand its future to ``abandon``.
+    """
+
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.used = 0
+        self._waiters: deque[Future] = deque()
+        self._lock = threading.Lock()
+
+    def request(self) -> Future:
+        future = Future()
+        with self._lock:
+            if self.used < self.limit and not self._waiters:
+                self.used += 1
+                future.set_running_or_notify_cancel()
+                future.set_result(None)
+                return future
+            if len(self._waiters) >= self.max_waiting:
+                raise Overloaded("queue_full")
+            self._waiters.append(future)
+            QUEUE_DEPTH.set(len(self._waiters))
+        return future
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                future = self._waiters.popleft()
+                # False when the waiter gave up; its slot goes to the next one
+                if future.set_running_or_notify_cancel():
+                    QUEUE_DEPTH.set(len(self._waiters))
+                    future.set_result(None)
+                    return
+            QUEUE_DEPTH.set(0)
+            self.used -= 1
+
+    def abandon(self, future: Future) -> None:
+        with self._lock:
+            try:
+                self._waiters.remove(future)
+                QUEUE_DEPTH.set(len(self._waiters))
+            except ValueError:
+                pass
+        # A slot granted after the waiter timed out goes back
+        if not future.cancel():
+            self.release()
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+def _abandoned() -> RuntimeError:
+    return RuntimeError("Inference batch abandoned before it was sent")
+
+
+def _leader_cancelled() -> RuntimeError:
+    return RuntimeError("Coalesced inference call cancelled before it replied")
+
+
+def _shared(future: Future) -> Awaitable[str]:
+    """Await a future other calls also wait on; cancelling this call leaves it to them."""
+    return asyncio.shield(asyncio.wrap_future(future))
+
+
+class _Batch:
+    __slots__ = ("items", "closed")
+
+    def __init__(self):
+        self.items: list[tuple[dict, Future]] = []
+        # Resolved once the batch is full, so its leader sends it before the window ends
+        self.closed: Future = Future()
+
+
+class Dispatcher:
+    def __init__(self, max_in_flight: int = INFERENCE_MAX_IN_FLIGHT, max_queue: int = INFERENCE_MAX_QUEUE,
+                 queue_timeout: float = INFERENCE_QUEUE_TIMEOUT, tenant_rps: float = INFERENCE_TENANT_RPS,
+                 tenant_burst: float = INFERENCE_TENANT_BURST, coalesce: bool = INFERENCE_COALESCE,
+                 batch_url: str = inference.INFERENCE_BATCH_URL, batch_window_ms: float = INFERENCE_BATCH_WINDOW_MS,
+                 batch_size: int = INFERENCE_BATCH_SIZE):
+        self.slots = Slots(max_in_flight, max_queue)
+        self.queue_timeout = queue_timeout
+        self.tenant_rps = tenant_rps
+        self.tenant_burst = tenant_burst
+        self.coalesce = coalesce
+        self.batch_url = batch_url
+        self.batching = bool(batch_url) and batch_size > 1
+        self.batch_window = batch_window_ms / 1000
+        self.batch_size = batch_size
+        self._buckets = TTLCache(maxsize=10_000, ttl=3600)
+        self._in_flight: dict[tuple[str, str], Future] = {}
+        self._batch: _Batch | None = None
+        self._lock = threading.Lock()
+        self.upstream_requests = 0
+
+    # Admission
+
+    def admit(self, tenant: str | None) -> None:
+        """Fail the call fast if the breaker is open, or shed it if its tenant is over its rate."""
+        resilience.get("inference").check()
+        if self.tenant_rps <= 0:
+            return
+        tenant = tenant or DEFAULT_TENANT
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = TokenBucket(self.tenant_rps, self.tenant_burst)
+            self._buckets.set(tenant, bucket)
+        if not bucket.take():
+            SHED.inc(reason="rate_limit")
+            raise Overloaded("rate_limit")
+
+    def _request_slot(self) -> tuple[Future, float]:
+        try:
+            return self.slots.request(), time.perf_counter()
+        except Overloaded as e:
+            SHED.inc(reason=e.reason)
+            raise
+
+    def _timed_out(self, future: Future) -> Overloaded:
+        self.slots.abandon(future)
+        SHED.inc(reason="queue_timeout")
+        return Overloaded("queue_timeout")
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one upstream slot, waiting in line for it."""
+        future, start = self._request_slot()
+        try:
+            future.result(self.queue_timeout)
+        except FutureTimeout:
+            raise self._timed_out(future) from None
+        QUEUE_WAIT.observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        future, start = self._request_slot()
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(future) from None
+        except asyncio.CancelledError:
+            self.slots.abandon(future)
+            raise
+        QUEUE_WAIT.observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    # Coalescing
+
+    def _join(self, key: tuple[str, str]) -> tuple[Future, bool]:
+        """The reply future for ``key`` and whether this call must produce it."""
+        if not self.coalesce:
+            return Future(), True
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                COALESCED.inc()
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def _settle(self, key: tuple[str, str], future: Future, reply: str | None, error: BaseException | None) -> None:
+        if self.coalesce:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        if error is None:
+            future.set_result(reply)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # The leader was cancelled or interrupted; that is its own, so the
+            # calls sharing its reply fail like any other upstream error
+            future.set_exception(_leader_cancelled())
+
+    # Batching
+
+    def _enter_batch(self, payload: dict) -> tuple[Future, _Batch | None]:
+        """Add the payload to the open batch; the batch is returned to the call that must send it."""
+        future = Future()
+        with self._lock:
+            batch, leader = self._batch, None
+            if batch is None:
+                batch = leader = self._batch = _Batch()
+            batch.items.append((payload, future))
+            if len(batch.items) >= self.batch_size:
+                self._batch = None
+                batch.closed.set_result(None)
+        return future, leader
+
+    def _close(self, batch: _Batch) -> list[tuple[dict, Future]]:
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+        return batch.items
+
+    def _sent(self, size: int) -> None:
+        self.upstream_requests += 1
+        BATCH_SIZE.observe(size)
+
+    @staticmethod
+    def _deliver(items: list[tuple[dict, Future]], replies: list[str | Exception] | BaseException) -> None:
+        for i, (_, future) in enumerate(items):
+            reply = replies if isinstance(replies, BaseException) else replies[i]
+            if isinstance(reply, BaseException):
+                future.set_exception(reply)
+            else:
+                future.set_result(reply)
+
+    def _send(self, payload: dict) -> str:
+        if not self.batching:
+            with self.slot():
+                self._sent(1)
+                return inference.send(payload)
+
+        future, batch = self._enter_batch(payload)
+        if batch is not None:
+            replies = None
+            try:
+                wait_futures([batch.closed], timeout=self.batch_window)
+                items = self._close(batch)
+                with self.slot():
+                    self._sent(len(items))
+                    replies = inference.send_batch([payload for payload, _ in items], self.batch_url)
+            except Exception as e:
+                replies = e
+            finally:
+                self._deliver(self._close(batch), replies if replies is not None else _abandoned())
+        return future.result()
+
+    async def _asend(self, payload: dict) -> str:
+        if not self.batching:
+            async with self.aslot():
+                self._sent(1)
+                return await inference.asend(payload)
+
+        future, batch = self._enter_batch(payload)
+        if batch is not None:
+            replies = None
+            try:
+                await asyncio.wait([asyncio.wrap_future(batch.closed)], timeout=self.batch_window)
+                items = self._close(batch)
+                async with self.aslot():
+                    self._sent(len(items))
+                    replies = await inference.asend_batch([payload for payload, _ in items], self.batch_url)
+            except Exception as e:
+                replies = e
+            finally:
+                # Also on cancellation: the batch stops taking calls and none is left waiting
+                self._deliver(self._close(batch), replies if replies is not None else _abandoned())
+        return await _shared(future)
+
+    # Entry points
+
+    def complete(self, system_prompt: str, message: str, tenant: str | None = None) -> str:
+        """inference.complete through admission, coalescing, the queue and batching."""
+        self.admit(tenant)
+        key = (system_prompt, message)
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            reply = self._send(inference._payload(system_prompt, message))
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, reply, None)
+        return reply
+
+    async def acomplete(self, system_prompt: str, message: str, tenant: str | None = None) -> str:
+        self.admit(tenant)
+        key = (system_prompt, message)
+        future, leader = self._join(key)
+        if not leader:
+            return await _shared(future)
+        try:
+            reply = await self._asend(inference._payload(system_prompt, message))
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, reply, None)
+        return reply
+
+    def stream_complete(self, system_prompt: str, message: str, tenant: str | None = None) -> Iterator[str]:
+        self.admit(tenant)
+        with self.slot():
+            self._sent(1)
+            yield from inference.stream_complete(system_prompt, message)
+
+    async def astream_complete(self, system_prompt: str, message: str,
+                               tenant: str | None = None) -> AsyncIterator[str]:
+        self.admit(tenant)
+        async with self.aslot():
+            self._sent(1)
+            async for token in inference.astream_complete(system_prompt, message):
+                yield token
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.slots.waiting(),
+            "in_flight": self.slots.used,
+            "coalescing": len(self._in_flight),
+            "upstream_requests": self.upstream_requests,
+        }
+
+
+_dispatcher: Dispatcher | None = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> Dispatcher:
+    """Process-wide dispatcher, configured from the environment on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = Dispatcher()
+    return _dispatcher
+
+
+def complete(system_prompt: str, message: str, tenant: str | None = None) -> str:
+    return get_dispatcher().complete(system_prompt, message, tenant)
+
+
+async def acomplete(system_prompt: str, message: str, tenant: str | None = None) -> str:
+    return await get_dispatcher().acomplete(system_prompt, message, tenant)
+
+
+def stream_complete(system_prompt: str, message: str, tenant: str | None = None) -> Iterator[str]:
+    return get_dispatcher().stream_complete(system_prompt, message, tenant)
+
+
+def astream_complete(system_prompt: str, message: str, tenant: str | None = None) -> AsyncIterator[str]:
+    return get_dispatcher().astream_complete(system_prompt, message, tenant)
+
+
+metrics.REGISTRY.add_collector(lambda: metrics.stats_gauges(
+    "taxpilot_inference_dispatcher", "upstream", {"inference": _dispatcher.stats()},
+    ("in_flight", "coalescing", "upstream_requests"),
+) if _dispatcher is not None else [])
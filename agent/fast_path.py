@@ -0,0 +1,148 @@
+"""Rule-driven replies that let intake_node skip the LLM round-trip.
+
+INTAKE_FAST_PATH sets how aggressive the fast-path is:
+
+- ``off``: every intake turn calls the model
+- ``conservative`` (default): skip when the turn hands off to the classifier
+  (intake's reply is overwritten there) or when a short, non-question message
+  was fully captured by the keyword extractor
+- ``aggressive``: also template every other turn that is not a question
+
+Questions always go to the model. Skips, and the model latency they saved
+(priced at the moving average of real intake calls), are exported on /metrics.
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+import metrics
+from state import TaxPilotState
+from tools.extraction import extract
+
+FAST_PATH_MODES = ("off", "conservative", "aggressive")
+FAST_PATH_MODE = os.environ.get("INTAKE_FAST_PATH", "conservative")
+# Longer messages are treated as free-form in conservative mode
+FAST_PATH_MAX_WORDS = int(os.environ.get("INTAKE_FAST_PATH_MAX_WORDS", 12))
+
+if FAST_PATH_MODE not in FAST_PATH_MODES:
+    raise ValueError(f"Unknown INTAKE_FAST_PATH mode: {FAST_PATH_MODE}")
+
+_QUESTION = re.compile(
+    r"\?|^\s*(what|how|why|when|where|which|who|can|could|should|would|do|does|did|is|are|will)\b",
+    re.IGNORECASE,
+)
+
+LLM_CALLS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_intake_llm_calls_total", "Intake turns answered by the model"))
+LLM_SKIPS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_intake_llm_skipped_total", "Intake turns answered from a template", ("rule",)))
+LATENCY_SAVED = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_intake_latency_saved_seconds_total", "Estimated model latency avoided by skipped turns"))
+
+
+@dataclass(frozen=True, slots=True)
+class Decision:
+    use_llm: bool
+    rule: str
+    reply: str | None = None
+
+
+class _LatencyEstimate:
+    """Moving average of intake model latency, used to price a skipped call."""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, seconds: float) -> None:
+        with self._lock:
+            self.value = seconds if not self.value else self.value + self.alpha * (seconds - self.value)
+
+
+llm_latency = _LatencyEstimate()
+
+
+def ready_for_classifier(state: TaxPilotState) -> bool:
+    """Whether the turn continues past intake (routes main.should_continue)."""
+    return bool(state.get("filing_status")) and (
+        state.get("total_income", 0) > 0 or bool(extract(state.get("user_message", "")).income)
+    )
+
+
+def is_free_form(message: str) -> bool:
+    return bool(_QUESTION.search(message))
+
+
+def next_question(filing_status: str | None, name: str | None) -> str:
+    if not filing_status:
+        return "Thanks! What is your filing status? (Single, Married Filing Jointly, Married Filing Separately, Head of Household, or Qualifying Widow/Widower)"
+    if not name:
+        return f"Filing status set to {filing_status.replace('_', ' ').title()}. What's your name?"
+    return f"Great, {name}! Now let's gather your income. Do you have a W-2 from an employer?"
+
+
+def template_reply(state: TaxPilotState, filing_status: str | None, name: str | None) -> str:
+    """Acknowledge fields captured this turn, then ask for the next missing one."""
+    reply = next_question(filing_status, name)
+    # Once both fields are known next_question already greets by name
+    if name and not state.get("name") and not filing_status:
+        return f"Nice to meet you, {name}! {reply}"
+    return reply
+
+
+def decide(state: TaxPilotState, filing_status: str | None, name: str | None,
+           mode: str = FAST_PATH_MODE) -> Decision:
+    """Whether this intake turn needs the model, and the templated reply if not."""
+    if mode == "off":
+        return Decision(True, "disabled")
+
+    message = state.get("user_message", "")
+    if ready_for_classifier({**state, "filing_status": filing_status}):
+        return Decision(False, "handoff", template_reply(state, filing_status, name))
+    if is_free_form(message):
+        return Decision(True, "free_form")
+
+    if mode == "aggressive":
+        return Decision(False, "templated", template_reply(state, filing_status, name))
+
+    captured = (filing_status and not state.get("filing_status")) or (name and not state.get("name"))
+    if captured and len(message.split()) <= FAST_PATH_MAX_WORDS:
+        return Decision(False, "extracted", template_reply(state, filing_status, name))
+    return Decision(True, "no_new_fields")
+
+
+def record(decision: Decision, llm_seconds: float | None = None) -> None:
+    """Count a decision; llm_seconds is the model latency when it was called."""
+    if not metrics.recording():
+        return
+    if decision.use_llm:
+        LLM_CALLS.inc()
+        if llm_seconds is not None:
+            llm_latency.update(llm_seconds)
+    else:
+        LLM_SKIPS.inc(rule=decision.rule)
+        LATENCY_SAVED.inc(llm_latency.value)
+
+
+def stats() -> dict:
+    skipped = LLM_SKIPS.total()
+    calls = LLM_CALLS.value()
+    total = skipped + calls
+    return {
+        "mode": FAST_PATH_MODE,
+        "llm_calls": calls,
+        "llm_skipped": skipped,
+        "skip_rate": skipped / total if total else 0.0,
+        "latency_saved_seconds": LATENCY_SAVED.value(),
+        "avg_llm_ms": 1000 * llm_latency.value,
+    }
+
+
+metrics.REGISTRY.add_collector(
+    lambda: metrics.stats_gauges("taxpilot_intake_fast_path", "mode", {FAST_PATH_MODE: stats()}, (
+        "skip_rate", "avg_llm_ms",
+    ))
+)
@@ -0,0 +1,306 @@
+"""Shared, pooled HTTP clients for upstream services.
+
+One keep-alive connection pool per upstream (Gradient inference, DO Knowledge
+Base) instead of a fresh TCP+TLS handshake per ``httpx.post``. Each upstream
+has its own timeout and pool limits, configurable through the environment:
+
+    HTTP_<NAME>_TIMEOUT, HTTP_<NAME>_MAX_CONNECTIONS,
+    HTTP_<NAME>_MAX_KEEPALIVE, HTTP_<NAME>_HTTP2
+
+HTTP/2 is negotiated via ALPN when enabled and the ``h2`` package is present.
+Pools share TLS contexts, one per ALPN setting (httpcore sets the protocols
+on the context it is given): loading the CA bundle costs ~20 ms per context,
+and the async pools alone would otherwise build ASYNC_SHARDS of them.
+"""
+
+import os
+import ssl
+import time
+import itertools
+import threading
+import importlib.util
+from dataclasses import dataclass, field
+
+import httpx
+
+import metrics
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# httpcore's pool bookkeeping is quadratic in open connections, so each
+# upstream's async pool is split across a few clients used round-robin.
+ASYNC_SHARDS = int(os.environ.get("HTTP_ASYNC_SHARDS", 8))
+
+
+@dataclass(frozen=True)
+class Upstream:
+    name: str
+    timeout: float
+    max_connections: int
+    max_keepalive: int
+    http2: bool = True
+
+    @classmethod
+    def from_env(cls, name: str, timeout: float, max_connections: int = 100) -> "Upstream":
+        prefix = f"HTTP_{name.upper()}_"
+        max_connections = int(os.environ.get(prefix + "MAX_CONNECTIONS", max_connections))
+        return cls(
+            name=name,
+            timeout=float(os.environ.get(prefix + "TIMEOUT", timeout)),
+            max_connections=max_connections,
+            max_keepalive=int(os.environ.get(prefix + "MAX_KEEPALIVE", max_connections)),
+            http2=os.environ.get(prefix + "HTTP2", "true").lower() in ("1", "true", "yes"),
+        )
+
+
+UPSTREAMS: dict[str, Upstream] = {
+    "inference": Upstream.from_env(
+        "inference",
+        timeout=float(os.environ.get("GRADIENT_TIMEOUT", 30)),
+        max_connections=int(os.environ.get("GRADIENT_MAX_CONNECTIONS", 256)),
+    ),
+    "kb": Upstream.from_env("kb", timeout=10),
+}
+
+
+@dataclass
+class PoolStats:
+    """Request and connection-acquisition timings for one upstream."""
+
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    connections_opened: int = 0
+    connect_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, wait: float, connect: float, opened: bool, failed: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+            self.connections_opened += opened
+            self.connect_seconds += connect
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _Timing:
+    """Collects httpcore trace events for one request.
+
+    Pool wait is the time until request headers start going out, minus any
+    time spent opening a new connection.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks: dict[str, float] = {}
+
+    def event(self, name: str, info: dict) -> None:
+        self.marks.setdefault(name, time.perf_counter())
+
+    async def aevent(self, name: str, info: dict) -> None:
+        self.event(name, info)
+
+    def result(self) -> tuple[float, float, bool]:
+        m = self.marks
+        connect = 0.0
+        for step in ("connection.connect_tcp", "connection.start_tls"):
+            if f"{step}.complete" in m:
+                connect += m[f"{step}.complete"] - m[f"{step}.started"]
+        sent = m.get("http11.send_request_headers.started", m.get("http2.send_request_headers.started"))
+        wait = max(0.0, (sent - self.start) - connect) if sent else 0.0
+        return wait, connect, "connection.connect_tcp.complete" in m
+
+
+class _MeteredTransport(httpx.HTTPTransport):
+    def __init__(self, name: str, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        timing = _Timing()
+        request.extensions["trace"] = timing.event
+        self.stats.enter()
+        metrics.UPSTREAM_IN_FLIGHT.inc(upstream=self.name)
+        failed = True
+        try:
+            response = super().handle_request(request)
+            failed = False
+            return response
+        finally:
+            self.stats.exit()
+            metrics.UPSTREAM_IN_FLIGHT.dec(upstream=self.name)
+            metrics.record_upstream(self.name, time.perf_counter() - timing.start, failed)
+            self.stats.record(*timing.result(), failed=failed)
+
+
+class _AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, name: str, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timing = _Timing()
+        request.extensions["trace"] = timing.aevent
+        self.stats.enter()
+        metrics.UPSTREAM_IN_FLIGHT.inc(upstream=self.name)
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            failed = False
+            return response
+        finally:
+            self.stats.exit()
+            metrics.UPSTREAM_IN_FLIGHT.dec(upstream=self.name)
+            metrics.record_upstream(self.name, time.perf_counter() - timing.start, failed)
+            self.stats.record(*timing.result(), failed=failed)
+
+
+_lock = threading.Lock()
+_ssl_contexts: dict[bool, ssl.SSLContext] = {}
+_clients: dict[str, httpx.Client] = {}
+_async_clients: dict[str, list[httpx.AsyncClient]] = {}
+_async_cycle: dict[str, "itertools.cycle[httpx.AsyncClient]"] = {}
+_stats: dict[str, PoolStats] = {}
+
+
+def _upstream(name: str) -> Upstream:
+    upstream = UPSTREAMS.get(name)
+    if upstream is None:
+        raise KeyError(f"Unknown upstream: {name}")
+    return upstream
+
+
+def _stats_for(name: str) -> PoolStats:
+    if name not in _stats:
+        _stats[name] = PoolStats()
+    return _stats[name]
+
+
+def _tls(http2: bool) -> ssl.SSLContext:
+    """The shared TLS context for pools with this HTTP/2 setting; called under _lock."""
+    context = _ssl_contexts.get(http2)
+    if context is None:
+        context = _ssl_contexts[http2] = httpx.create_ssl_context()
+    return context
+
+
+def get_client(name: str) -> httpx.Client:
+    """Shared sync client for an upstream; created on first use."""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            upstream = _upstream(name)
+            limits = httpx.Limits(
+                max_connections=upstream.max_connections,
+                max_keepalive_connections=upstream.max_keepalive,
+            )
+            http2 = upstream.http2 and HTTP2_AVAILABLE
+            transport = _MeteredTransport(name, _stats_for(name), verify=_tls(http2), limits=limits, http2=http2)
+            _clients[name] = httpx.Client(transport=transport, timeout=upstream.timeout)
+        return _clients[name]
+
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+    """Shared async client for an upstream (round-robin over its shards)."""
+    cycle = _async_cycle.get(name)
+    if cycle is None:
+        with _lock:
+            if name not in _async_cycle:
+                upstream = _upstream(name)
+                http2 = upstream.http2 and HTTP2_AVAILABLE
+                per_shard = max(1, upstream.max_connections // ASYNC_SHARDS)
+                limits = httpx.Limits(
+                    max_connections=per_shard,
+                    max_keepalive_connections=min(per_shard, upstream.max_keepalive),
+                )
+                _async_clients[name] = [
+                    httpx.AsyncClient(
+                        transport=_AsyncMeteredTransport(
+                            name, _stats_for(name), verify=_tls(http2), limits=limits, http2=http2,
+                        ),
+                        timeout=upstream.timeout,
+                    )
+                    for _ in range(ASYNC_SHARDS)
+                ]
+                _async_cycle[name] = itertools.cycle(_async_clients[name])
+            cycle = _async_cycle[name]
+    return next(cycle)
+
+
+def _count_connections(transports: list) -> tuple[int, int]:
+    active = idle = 0
+    for transport in transports:
+        for conn in getattr(getattr(transport, "_pool", None), "connections", []):
+            if conn.is_closed():
+                continue
+            if conn.is_idle():
+                idle += 1
+            else:
+                active += 1
+    return active, idle
+
+
+def pool_metrics() -> dict[str, dict]:
+    """Per-upstream pool snapshot: connections, in-flight requests and wait time."""
+    snapshot = {}
+    for name in UPSTREAMS:
+        stats = _stats_for(name)
+        transports = []
+        if name in _clients:
+            transports.append(_clients[name]._transport)
+        transports.extend(c._transport for c in _async_clients.get(name, []))
+        active, idle = _count_connections(transports)
+        with stats._lock:
+            snapshot[name] = {
+                "active_connections": active,
+                "idle_connections": idle,
+                "in_flight": stats.in_flight,
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "connections_opened": stats.connections_opened,
+                "avg_connect_ms": 1000 * stats.connect_seconds / max(1, stats.connections_opened),
+                "avg_wait_ms": 1000 * stats.wait_seconds / max(1, stats.requests),
+                "max_wait_ms": 1000 * stats.max_wait_seconds,
+            }
+    return snapshot
+
+
+def _render_pool_metrics() -> list[str]:
+    return metrics.stats_gauges("taxpilot_http_pool", "upstream", pool_metrics(), (
+        "active_connections", "idle_connections", "connections_opened", "avg_connect_ms", "avg_wait_ms", "max_wait_ms",
+    ))
+
+
+metrics.REGISTRY.add_collector(_render_pool_metrics)
+
+
+def close_clients() -> None:
+    """Close shared sync clients."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def aclose_clients() -> None:
+    """Close shared async clients (server shutdown)."""
+    for clients in list(_async_clients.values()):
+        for client in clients:
+            await client.aclose()
+    _async_clients.clear()
+    _async_cycle.clear()
@@ -0,0 +1,94 @@
+"""Incremental recomputation: skip graph nodes whose inputs are unchanged.
+
+Each pipeline node declares a NodeSpec: the state fields it reads and
+writes, plus optional derived inputs (e.g. the wages found in the message
+rather than the raw message). Before a node runs, its inputs are
+fingerprinted; if the fingerprint matches the one memoized in the session's
+``node_memo`` from its last run, the node is skipped.
+
+Fields only one node writes still hold that node's last output, so a skip
+only has to replay the fields several nodes write (``SHARED_FIELDS``). Each
+turn's ``node_trace`` records which nodes ran and which were skipped.
+AGENT_INCREMENTAL=false runs every node every turn.
+"""
+
+import os
+import time
+import hashlib
+import functools
+import inspect
+from dataclasses import dataclass
+from typing import Callable
+
+import metrics
+
+INCREMENTAL = os.environ.get("AGENT_INCREMENTAL", "true").lower() in ("1", "true", "yes")
+
+# Written by every node, so a skipped node must restore its own values
+SHARED_FIELDS = ("current_node", "response")
+
+NODE_SKIPS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_node_skipped_total", "Graph node executions skipped because their inputs were unchanged", ("node",)))
+
+
+@dataclass(frozen=True, slots=True)
+class NodeSpec:
+    reads: tuple[str, ...]
+    writes: tuple[str, ...]
+    # Extra inputs computed from the state, fingerprinted alongside reads
+    derive: Callable[[dict], dict] | None = None
+
+
+def fingerprint(state: dict, spec: NodeSpec) -> str:
+    # A node's own outputs are not its inputs (e.g. classifier appending to income_items)
+    values = [(field, state.get(field)) for field in spec.reads if field not in spec.writes]
+    if spec.derive is not None:
+        values.append(("derived", spec.derive(state)))
+    return hashlib.blake2b(repr(values).encode(), digest_size=8).hexdigest()
+
+
+def incremental_node(name: str, fn: Callable, spec: NodeSpec | None = None,
+                     enabled: bool = INCREMENTAL) -> Callable:
+    """Wrap a node (sync or async) to skip it when its inputs are unchanged.
+
+    Nodes without a spec always run; they are still recorded in node_trace.
+    """
+    pass_config = "config" in inspect.signature(fn).parameters
+    track = spec is not None and enabled
+    # Shared by every session's trace rather than allocated per turn
+    ran_trace, skipped_trace = [{"node": name, "ran": True}], [{"node": name, "ran": False}]
+
+    def _skip(state: dict) -> tuple[str | None, dict | None]:
+        if not track:
+            return None, None
+        key = fingerprint(state, spec)
+        memo = (state.get("node_memo") or {}).get(name)
+        if memo and memo["fingerprint"] == key:
+            NODE_SKIPS.inc(node=name)
+            metrics.record_span(f"{name}:skipped", time.time(), 0.0)
+            return key, {**memo["outputs"], "node_trace": skipped_trace}
+        return key, None
+
+    def _ran(key: str | None, update: dict) -> dict:
+        update = {**update, "node_trace": ran_trace}
+        if key is not None:
+            outputs = {field: update[field] for field in SHARED_FIELDS if field in update}
+            update["node_memo"] = {name: {"fingerprint": key, "outputs": outputs}}
+        return update
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, config=None):
+            key, skipped = _skip(state)
+            if skipped is not None:
+                return skipped
+            return _ran(key, await (fn(state, config) if pass_config else fn(state)))
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, config=None):
+        key, skipped = _skip(state)
+        if skipped is not None:
+            return skipped
+        return _ran(key, fn(state, config) if pass_config else fn(state))
+    return wrapper
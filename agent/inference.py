@@ -0,0 +1,156 @@
+"""Gradient Serverless Inference client (OpenAI-compatible chat completions).
+
+Intake calls go through dispatcher.py, which queues, coalesces and batches
+them on top of these functions. GRADIENT_INFERENCE_BATCH_URL, when set, is an endpoint
+taking ``{"requests": [payload, ...]}`` and answering ``{"responses": [...]}``
+with one completion (or ``{"error": ...}``) per request, in order.
+
+Every request goes through resilience.get("inference"): its circuit breaker,
+adaptive timeout and retries (hedging when enabled); streams get the breaker.
+"""
+
+import os
+import json
+from typing import AsyncIterator, Iterator
+
+import resilience
+from http_clients import get_client, get_async_client
+
+INFERENCE_URL = os.environ.get(
+    "GRADIENT_INFERENCE_URL",
+    "https://inference.do-ai.run/v1/chat/completions"
+)
+MODEL = os.environ.get("GRADIENT_MODEL", "meta-llama/Llama-3.3-70B-Instruct")
+API_KEY = os.environ.get("GRADIENT_API_KEY", "")
+INFERENCE_BATCH_URL = os.environ.get("GRADIENT_INFERENCE_BATCH_URL", "")
+
+
+def _payload(system_prompt: str, message: str, stream: bool = False) -> dict:
+    payload = {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": message},
+        ],
+        "temperature": 0.7,
+        "max_tokens": 500,
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def _delta(line: str) -> str | None:
+    """Token text from one server-sent event line; None when the stream ends."""
+    if not line.startswith("data:"):
+        return ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None
+    choices = json.loads(data).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+def _headers() -> dict:
+    return {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
+
+
+def _reply(completion: dict) -> str:
+    return completion["choices"][0]["message"]["content"]
+
+
+class BatchItemError(RuntimeError):
+    """One request of a batch failed upstream."""
+
+
+def _batch_replies(body: dict, count: int) -> list[str | Exception]:
+    responses = body.get("responses") or []
+    if len(responses) != count:
+        raise ValueError(f"Batch endpoint returned {len(responses)} responses for {count} requests")
+    return [
+        BatchItemError(str(item["error"])) if "error" in item else _reply(item)
+        for item in responses
+    ]
+
+
+def _post(url: str, body: dict, timeout: float) -> dict:
+    response = get_client("inference").post(url, headers=_headers(), json=body, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+async def _apost(url: str, body: dict, timeout: float) -> dict:
+    response = await get_async_client("inference").post(url, headers=_headers(), json=body, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def send(payload: dict) -> str:
+    """POST one completion payload and return the reply text. Raises on failure."""
+    return _reply(resilience.get("inference").call(lambda timeout: _post(INFERENCE_URL, payload, timeout)))
+
+
+async def asend(payload: dict) -> str:
+    """Async variant of send() over the shared async pool."""
+    return _reply(await resilience.get("inference").acall(lambda timeout: _apost(INFERENCE_URL, payload, timeout)))
+
+
+def send_batch(payloads: list[dict], url: str = "") -> list[str | Exception]:
+    """POST payloads to the batch endpoint; a reply or the item's error per payload."""
+    body = resilience.get("inference").call(
+        lambda timeout: _post(url or INFERENCE_BATCH_URL, {"requests": payloads}, timeout),
+    )
+    return _batch_replies(body, len(payloads))
+
+
+async def asend_batch(payloads: list[dict], url: str = "") -> list[str | Exception]:
+    """Async variant of send_batch()."""
+    body = await resilience.get("inference").acall(
+        lambda timeout: _apost(url or INFERENCE_BATCH_URL, {"requests": payloads}, timeout),
+    )
+    return _batch_replies(body, len(payloads))
+
+
+def complete(system_prompt: str, message: str) -> str:
+    """Run a chat completion and return the reply text. Raises on failure."""
+    return send(_payload(system_prompt, message))
+
+
+async def acomplete(system_prompt: str, message: str) -> str:
+    """Async variant of complete() over the shared async pool."""
+    return await asend(_payload(system_prompt, message))
+
+
+def stream_complete(system_prompt: str, message: str) -> Iterator[str]:
+    """Yield reply tokens as the inference API streams them (stream: true)."""
+    with resilience.get("inference").guard(), get_client("inference").stream(
+        "POST",
+        INFERENCE_URL,
+        headers=_headers(),
+        json=_payload(system_prompt, message, stream=True),
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            token = _delta(line)
+            if token is None:
+                break
+            if token:
+                yield token
+
+
+async def astream_complete(system_prompt: str, message: str) -> AsyncIterator[str]:
+    """Async variant of stream_complete()."""
+    with resilience.get("inference").guard():
+        async with get_async_client("inference").stream(
+            "POST",
+            INFERENCE_URL,
+            headers=_headers(),
+            json=_payload(system_prompt, message, stream=True),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                token = _delta(line)
+                if token is None:
+                    break
+                if token:
+                    yield token
@@ -1,26 +1,70 @@
 """TaxPilot AI — Multi-node LangGraph agent for tax filing.
 
 Uses DigitalOcean Gradient ADK with Serverless Inference (Llama 3.3 70B).
-Implements a 5-node pipeline: intake → classifier → deduction → form_builder → review
+Implements a 5-node pipeline: intake → classifier → deduction → form_builder → review,
+with KB retrieval for deduction running alongside the classifier when it fans out (nodes/retrieval.py)
 """
 
 import os
-import json
-from typing import Literal
+import time
+import signal
+import socket
+import asyncio
+import logging
+import weakref
+import threading
+from contextlib import aclosing, closing, contextmanager
+from typing import AsyncIterator, Iterator, Literal
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from state import TaxPilotState
-from nodes.intake import intake_node
+import metrics
+import serialization
+from metrics import instrument_node
+from state import TaxPilotState, new_session_state
+from incremental import NodeSpec, incremental_node
+from nodes import classifier, retrieval, deduction, form_builder, review
+from nodes.intake import intake_node, aintake_node
 from nodes.classifier import classifier_node
 from nodes.deduction import deduction_node
+from nodes.retrieval import retrieval_node, FAN_OUT
 from nodes.form_builder import form_builder_node
 from nodes.review import review_node
+from tools.kb_index import get_index
+from tools.knowledge_base import KB_URL
+from tools.tax_tables import DEFAULT_TAX_YEAR, available, get_table
+from http_clients import get_client, get_async_client
+from completion_cache import get_completion_cache
+from session_store import create_session_store
+from cards import render_cards
+from fast_path import ready_for_classifier
 
+logger = logging.getLogger(__name__)
 
-def should_continue(state: TaxPilotState) -> Literal["classifier", "intake"]:
-    """Route after intake: proceed to classifier if we have enough info."""
-    if state.get("filing_status") and state.get("total_income", 0) > 0:
-        return "classifier"
+# Write-behind to the database (persistence.py) is off unless PERSIST_BACKEND
+# names a backend; only then is the module loaded and are nodes wrapped for it
+PERSIST = os.environ.get("PERSIST_BACKEND", "off").lower() not in ("", "off", "none")
+if PERSIST:
+    from persistence import persist_node, record_turn
+else:
+    def persist_node(fn):
+        return fn
+
+    def record_turn(session_id: str, message: str, response: dict) -> None:
+        pass
+
+
+# Branches that start once intake hands off; they join at deduction
+FILING_BRANCHES = ["classifier", "retrieval"] if FAN_OUT else ["classifier"]
+
+
+def should_continue(state: TaxPilotState) -> list[str] | Literal["intake"]:
+    """Route after intake: proceed to classifier (and retrieval) if we have enough info.
+
+    "intake" ends the turn so the user can answer the intake question.
+    """
+    if ready_for_classifier(state):
+        return FILING_BRANCHES
     return "intake"
 
 
@@ -31,22 +75,36 @@ def after_review(state: TaxPilotState) -> Literal["end", "awaiting_review"]:
     return "end"
 
 
+def _node(name: str, fn, spec: NodeSpec | None = None):
+    """A node with latency/error/in-flight metrics, skipped when its inputs are unchanged.
+
+    With PERSIST, its update is queued for write-behind to the database.
+    """
+    return persist_node(instrument_node(name, incremental_node(name, fn, spec)))
+
+
 # Build the LangGraph StateGraph
 graph = StateGraph(TaxPilotState)
 
 # Add nodes
-graph.add_node("intake", intake_node)
-graph.add_node("classifier", classifier_node)
-graph.add_node("deduction", deduction_node)
-graph.add_node("form_builder", form_builder_node)
-graph.add_node("review", review_node)
+graph.add_node("intake", RunnableLambda(_node("intake", intake_node), afunc=_node("intake", aintake_node), name="intake"))
+graph.add_node("classifier", _node("classifier", classifier_node, classifier.SPEC))
+if FAN_OUT:
+    graph.add_node("retrieval", _node("retrieval", retrieval_node, retrieval.SPEC))
+graph.add_node("deduction", _node("deduction", deduction_node, deduction.SPEC))
+graph.add_node("form_builder", _node("form_builder", form_builder_node, form_builder.SPEC))
+graph.add_node("review", _node("review", review_node, review.SPEC))
 
 # Set entry point
 graph.set_entry_point("intake")
 
 # Add edges
-graph.add_conditional_edges("intake", should_continue)
-graph.add_edge("classifier", "deduction")
+graph.add_conditional_edges("intake", should_continue, {
+    **{branch: branch for branch in FILING_BRANCHES},
+    "intake": END,
+})
+# Deduction waits for every branch that was started
+graph.add_edge(FILING_BRANCHES, "deduction")
 graph.add_edge("deduction", "form_builder")
 graph.add_edge("form_builder", "review")
 graph.add_conditional_edges("review", after_review, {
@@ -59,92 +117,349 @@ app = graph.compile()
 
 
 # HTTP server for the agent
+from http import HTTPStatus
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
-sessions: dict[str, TaxPilotState] = {}
+sessions = create_session_store()
+
+metrics.REGISTRY.add_collector(lambda: metrics.stats_gauges(
+    "taxpilot_session_store", "backend", {(stats := sessions.stats())["backend"]: stats},
+    ("sessions", "bytes", "eviction_rate"),
+))
+
+# Serializes concurrent turns of the same session in the async server
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def load_turn_state(session_id: str, message: str) -> TaxPilotState:
+    """Get or create the session's state, primed for a new turn."""
+    state = sessions.get(session_id) or new_session_state(session_id, message)
+    state["user_message"] = message
+    state["node_trace"] = []
+    state["prefetch"] = {}
+    return state
+
+
+def chat_response(result: TaxPilotState) -> dict:
+    """Shape a finished turn into the /chat response body."""
+    return {
+        "message": result.get("response", "I'm processing your request..."),
+        "cards": render_cards(result),
+        "state": {
+            "current_node": result.get("current_node", "intake"),
+            "confidence_score": result.get("confidence_score", 0),
+            "needs_review": result.get("needs_review", False),
+            "nodes": result.get("node_trace", []),
+        },
+    }
+
+
+def error_response(e: Exception, endpoint: str) -> dict:
+    logger.exception("Turn failed on %s", endpoint)
+    metrics.TURN_ERRORS.inc(endpoint=endpoint)
+    return {
+        "message": f"I encountered an issue: {str(e)}. Let me try a different approach.",
+        "cards": [],
+        "state": {"current_node": "intake", "confidence_score": 0, "needs_review": False},
+    }
+
+
+@contextmanager
+def observe_turn(endpoint: str, session_id: str):
+    """Turn latency and in-flight metrics, plus a trace if the session is sampled."""
+    token = metrics.start_trace(session_id)
+    metrics.TURN_IN_FLIGHT.inc(endpoint=endpoint)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        metrics.TURN_IN_FLIGHT.dec(endpoint=endpoint)
+        metrics.TURN_DURATION.observe(duration, endpoint=endpoint)
+        metrics.finish_trace(token, session_id, endpoint=endpoint, ms=round(1000 * duration, 3))
+
+
+def turn_config(tenant: str | None, **configurable) -> dict:
+    """Graph config for a turn; intake rate-limits its inference by ``tenant`` (dispatcher.py)."""
+    return {"configurable": {"tenant": tenant, **configurable}}
+
+
+def run_turn(session_id: str, message: str, tenant: str | None = None) -> dict:
+    """Run one /chat turn through the graph and return the response body."""
+    with observe_turn("chat", session_id):
+        state = load_turn_state(session_id, message)
+
+        try:
+            # Run the graph
+            result = app.invoke(state, turn_config(tenant))
+            sessions.put(session_id, result)
+            response = chat_response(result)
+            record_turn(session_id, message, response)
+            return response
+        except Exception as e:
+            return error_response(e, "chat")
+
+
+async def arun_turn(session_id: str, message: str, tenant: str | None = None) -> dict:
+    """run_turn for the async server, executing nodes through ainvoke."""
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+
+    async with lock:
+        with observe_turn("chat", session_id):
+            state = load_turn_state(session_id, message)
+
+            try:
+                result = await app.ainvoke(state, turn_config(tenant))
+                sessions.put(session_id, result)
+                response = chat_response(result)
+                record_turn(session_id, message, response)
+                return response
+            except Exception as e:
+                return error_response(e, "chat")
+
+
+# Streaming turns: LLM tokens, each node's cards, then the final state, as SSE
+STREAM_MODES = ["custom", "updates"]
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    return b"event: %s\ndata: %s\n\n" % (event.encode(), serialization.dumps(data))
+
+
+class _StreamTimer:
+    """Time to first event (first byte of the body) and total turn latency."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first: float | None = None
+
+    def mark(self, payload: bytes) -> bytes:
+        if self.first is None:
+            self.first = time.perf_counter()
+        return payload
+
+    def report(self) -> dict:
+        now = time.perf_counter()
+        metrics.STREAM_TTFB.observe((self.first or now) - self.start)
+        return {
+            "ttfb_ms": round(1000 * ((self.first or now) - self.start), 1),
+            "total_ms": round(1000 * (now - self.start), 1),
+        }
+
+
+def _stream_events(mode: str, chunk, result: TaxPilotState) -> list[bytes]:
+    """SSE events for one stream chunk; node updates are applied to ``result``."""
+    if mode == "custom" and "token" in chunk:
+        return [sse_event("token", {"text": chunk["token"]})]
+    if mode == "custom" and "discard" in chunk:
+        return [sse_event("discard", {})]
+    events = []
+    if mode == "updates":
+        for node, update in chunk.items():
+            result.update(update or {})
+            events.append(sse_event("node", {
+                "node": node,
+                "current_node": result.get("current_node", node),
+                "cards": render_cards(result, node),
+            }))
+    return events
+
+
+def stream_turn(session_id: str, message: str, tenant: str | None = None) -> Iterator[bytes]:
+    """run_turn as Server-Sent Events: token, node and a final done event.
+
+    If the model fails mid-reply, a discard event tells the client to drop the
+    text streamed so far; the fallback reply follows as a token.
+    """
+    timer = _StreamTimer()
+    with observe_turn("chat_stream", session_id):
+        state = load_turn_state(session_id, message)
+        config = turn_config(tenant, stream_tokens=True)
+
+        try:
+            result = dict(state)
+            with closing(app.stream(state, config, stream_mode=STREAM_MODES)) as chunks:
+                for mode, chunk in chunks:
+                    for event in _stream_events(mode, chunk, result):
+                        yield timer.mark(event)
+            sessions.put(session_id, result)
+            done = chat_response(result)
+            record_turn(session_id, message, done)
+        except Exception as e:
+            done = error_response(e, "chat_stream")
+    yield timer.mark(sse_event("done", {**done, "timing": timer.report()}))
+
+
+async def astream_turn(session_id: str, message: str, tenant: str | None = None) -> AsyncIterator[bytes]:
+    """stream_turn for the async server, through astream."""
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+
+    timer = _StreamTimer()
+    async with lock:
+        with observe_turn("chat_stream", session_id):
+            state = load_turn_state(session_id, message)
+            config = turn_config(tenant, stream_tokens=True)
+
+            try:
+                result = dict(state)
+                async with aclosing(app.astream(state, config, stream_mode=STREAM_MODES)) as chunks:
+                    async for mode, chunk in chunks:
+                        for event in _stream_events(mode, chunk, result):
+                            yield timer.mark(event)
+                sessions.put(session_id, result)
+                done = chat_response(result)
+                record_turn(session_id, message, done)
+            except Exception as e:
+                done = error_response(e, "chat_stream")
+    yield timer.mark(sse_event("done", {**done, "timing": timer.report()}))
+
+
+# Hands off past intake, so the warm-up turn runs every node
+WARM_UP_MESSAGE = "Hi, I'm Sam. I'm single and I earned $85,000 at Acme last year"
+
+
+def warm_turn() -> TaxPilotState:
+    """One filing turn through the graph that is neither stored nor persisted.
+
+    The fast path is forced on so intake never calls the model. With DO_KB_URL
+    set, retrieval queries the remote KB like any turn. No cards are rendered,
+    so review's what-if pricing (and numpy) still loads on first real use.
+    Node, upstream and fast-path metrics are suppressed, so /metrics shows
+    only real traffic.
+    """
+    state = new_session_state("warm-up", WARM_UP_MESSAGE)
+    with metrics.suppressed():
+        return app.invoke(state, turn_config(None, fast_path="conservative"))
+
+
+def warm_up_phases(server_mode: str) -> dict:
+    """startup.warm_up's phases: what the first turn would otherwise load."""
+    def clients():
+        if server_mode == "async":
+            get_async_client("inference")
+            # httpcore's async pools load anyio's asyncio backend on their first connection
+            import anyio
+            anyio.run(anyio.sleep, 0)
+        else:
+            get_client("inference")
+        if KB_URL:
+            get_client("kb")
+
+    return {
+        "kb_index": get_index,
+        "tax_tables": lambda: [get_table(DEFAULT_TAX_YEAR, jurisdiction)
+                               for jurisdiction in available().get(DEFAULT_TAX_YEAR, ())],
+        "completion_cache": get_completion_cache,
+        "http_clients": clients,
+        "graph": warm_turn,
+    }
 
 
 class AgentHandler(BaseHTTPRequestHandler):
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        """Status line, headers and body in one sendmsg, the head built here so the body is never copied into it."""
+        self.log_request(status)
+        head = (
+            f"{self.protocol_version} {status} {HTTPStatus(status).phrase}\r\n"
+            f"Server: {self.version_string()}\r\n"
+            f"Date: {self.date_time_string()}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        )
+        serialization.send_buffers(self.connection, (head.encode("latin-1"), body))
+
     def do_POST(self):
         if self.path == "/chat":
             content_length = int(self.headers.get("Content-Length", 0))
-            body = json.loads(self.rfile.read(content_length))
-
-            session_id = body.get("session_id", "default")
-            message = body.get("message", "")
-
-            # Get or create session state
-            state = sessions.get(session_id, {
-                "session_id": session_id,
-                "user_message": message,
-                "name": None,
-                "filing_status": None,
-                "state": None,
-                "dependents": 0,
-                "income_items": [],
-                "total_income": 0,
-                "deductions": [],
-                "standard_deduction": 0,
-                "itemized_total": 0,
-                "use_standard": True,
-                "taxable_income": 0,
-                "federal_tax": 0,
-                "credits": 0,
-                "total_withheld": 0,
-                "estimated_refund": 0,
-                "confidence_score": 0,
-                "review_flags": [],
-                "needs_review": False,
-                "current_node": "intake",
-                "response": "",
-                "cards": [],
-                "completed": False,
-            })
-
-            state["user_message"] = message
+            body = serialization.loads(self.rfile.read(content_length))
 
-            try:
-                # Run the graph
-                result = app.invoke(state)
-                sessions[session_id] = result
-
-                response = {
-                    "message": result.get("response", "I'm processing your request..."),
-                    "cards": result.get("cards", []),
-                    "state": {
-                        "current_node": result.get("current_node", "intake"),
-                        "confidence_score": result.get("confidence_score", 0),
-                        "needs_review": result.get("needs_review", False),
-                    },
-                }
-            except Exception as e:
-                response = {
-                    "message": f"I encountered an issue: {str(e)}. Let me try a different approach.",
-                    "cards": [],
-                    "state": {"current_node": "intake", "confidence_score": 0, "needs_review": False},
-                }
+            response = run_turn(body.get("session_id", "default"), body.get("message", ""),
+                                self.headers.get("X-Tenant-Id"))
+            self.send_body(200, serialization.dumps(response))
+        elif self.path == "/chat/stream":
+            content_length = int(self.headers.get("Content-Length", 0))
+            body = serialization.loads(self.rfile.read(content_length))
 
             self.send_response(200)
-            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
             self.end_headers()
-            self.wfile.write(json.dumps(response).encode())
+            events = stream_turn(body.get("session_id", "default"), body.get("message", ""),
+                                 self.headers.get("X-Tenant-Id"))
+            with closing(events):
+                for event in events:
+                    self.wfile.write(event)
+                    self.wfile.flush()
         else:
             self.send_response(404)
             self.end_headers()
 
     def do_GET(self):
         if self.path == "/health":
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "ok", "agent": "taxpilot"}).encode())
+            self.send_body(200, serialization.dumps({"status": "ok", "agent": "taxpilot"}))
+        elif self.path == "/ready":
+            import startup
+
+            ready = startup.is_ready()
+            self.send_body(200 if ready else 503,
+                           serialization.dumps({"status": "ready" if ready else "not_ready", "agent": "taxpilot"}))
+        elif self.path == "/metrics":
+            self.send_body(200, metrics.render().encode(), metrics.CONTENT_TYPE)
         else:
             self.send_response(404)
             self.end_headers()
 
 
-if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 8000))
-    server = HTTPServer(("0.0.0.0", port), AgentHandler)
+def serve_threaded(port: int, sock: socket.socket | None = None, ready=None) -> None:
+    """Serve AgentHandler until SIGTERM or SIGINT, finishing the request in progress."""
+    import startup
+
+    server = HTTPServer(("0.0.0.0", port), AgentHandler, bind_and_activate=sock is None)
+    if sock is not None:
+        server.socket.close()
+        server.socket = sock
+
+    def stop(signum, frame):
+        startup.set_ready(False)
+        # shutdown() blocks until serve_forever returns, so it can't run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, stop)
+
     print(f"TaxPilot agent running on port {port}")
+    if ready:
+        ready()
     server.serve_forever()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    import startup
+    import supervisor
+
+    port = int(os.environ.get("PORT", 8000))
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+    if supervisor.WORKERS > 1 and not supervisor.is_worker():
+        supervisor.run(port)
+    else:
+        server_mode = os.environ.get("AGENT_SERVER_MODE", "threaded")
+        # Load what the first turn needs before the port is bound (startup.py)
+        startup.warm_up(warm_up_phases(server_mode) if startup.WARMUP else {})
+        startup.set_ready(True)
+        if PERSIST:
+            import persistence
+
+            # Started after warm-up, so the warm-up turn is never written out
+            persistence.start()
+        sock = supervisor.worker_socket("0.0.0.0", port)
+        if server_mode == "async":
+            from aserver import serve
+
+            asyncio.run(serve(arun_turn, astream_turn, port=port, sock=sock, ready=supervisor.notify_ready))
+        else:
+            serve_threaded(port, sock, ready=supervisor.notify_ready)
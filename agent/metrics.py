@@ -0,0 +1,352 @@
+"""Latency/throughput instrumentation exposed in Prometheus text format.
+
+Every graph node is wrapped with ``instrument_node`` and every outbound HTTP
+call is timed by the metered transports in http_clients. ``/metrics`` renders
+the registry; histograms also export p50/p95/p99 estimates so they can be read
+without a Prometheus server.
+
+Tracing is optional: TRACE_SAMPLE_RATE (0-1) picks sessions by a stable hash
+of session_id, and each sampled turn logs its node spans as one JSON line on
+the ``taxpilot.trace`` logger.
+
+Work inside ``suppressed()`` (main.py's warm-up turn) leaves the per-turn
+metrics alone, so start-up doesn't show up as traffic.
+"""
+
+import os
+import json
+import time
+import zlib
+import bisect
+import inspect
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+
+# Seconds; covers sub-millisecond node work up to a timed-out LLM call
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+trace_logger = logging.getLogger("taxpilot.trace")
+
+
+def _escape_label(value) -> str:
+    """A label value as the text format quotes it: backslash, double quote and newline escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        """Sum over all label values."""
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def quantile(self, q: float, **labels) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if not series or not series[2]:
+                return 0.0
+            counts, count = list(series[0]), series[2]
+        rank = q * count
+        seen = 0
+        for i, c in enumerate(counts):
+            if seen + c >= rank and c:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def sum(self, **labels) -> float:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+
+        if items:
+            quantile_name = f"{self.name}_quantile"
+            lines += [f"# HELP {quantile_name} Bucket-interpolated quantiles of {self.name}",
+                      f"# TYPE {quantile_name} gauge"]
+            for key, _ in items:
+                labels = dict(zip(self.labelnames, key))
+                for q in QUANTILES:
+                    extra = f'quantile="{q}"'
+                    lines.append(f"{quantile_name}{_labels(self.labelnames, key, extra)} {self.quantile(q, **labels)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], list[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], list[str]]) -> None:
+        """Register a callback rendering extra lines (pool, cache, store stats)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            try:
+                lines += collector()
+            except Exception:
+                logging.getLogger(__name__).exception("Metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+NODE_DURATION = REGISTRY.register(Histogram(
+    "taxpilot_node_duration_seconds", "Graph node latency", ("node",)))
+NODE_CALLS = REGISTRY.register(Counter(
+    "taxpilot_node_calls_total", "Graph node executions", ("node",)))
+NODE_ERRORS = REGISTRY.register(Counter(
+    "taxpilot_node_errors_total", "Graph node executions that raised", ("node",)))
+NODE_IN_FLIGHT = REGISTRY.register(Gauge(
+    "taxpilot_node_in_flight", "Graph node executions in progress", ("node",)))
+
+UPSTREAM_DURATION = REGISTRY.register(Histogram(
+    "taxpilot_upstream_request_duration_seconds", "Outbound HTTP request latency", ("upstream",)))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "taxpilot_upstream_errors_total", "Outbound HTTP requests that failed", ("upstream",)))
+UPSTREAM_IN_FLIGHT = REGISTRY.register(Gauge(
+    "taxpilot_upstream_in_flight", "Outbound HTTP requests in progress", ("upstream",)))
+
+TURN_DURATION = REGISTRY.register(Histogram(
+    "taxpilot_turn_duration_seconds", "End-to-end /chat turn latency", ("endpoint",)))
+TURN_ERRORS = REGISTRY.register(Counter(
+    "taxpilot_turn_errors_total", "/chat turns that ended in an error response", ("endpoint",)))
+TURN_IN_FLIGHT = REGISTRY.register(Gauge(
+    "taxpilot_turn_in_flight", "/chat turns in progress", ("endpoint",)))
+STREAM_TTFB = REGISTRY.register(Histogram(
+    "taxpilot_stream_ttfb_seconds", "Time to first event on /chat/stream"))
+FALLBACKS = REGISTRY.register(Counter(
+    "taxpilot_fallback_total", "Upstream failures answered with a fallback", ("node",)))
+
+
+# Set inside suppressed(): node, upstream and fast-path metrics aren't recorded
+_suppressed: contextvars.ContextVar[bool] = contextvars.ContextVar("taxpilot_metrics_suppressed", default=False)
+
+
+@contextmanager
+def suppressed() -> Iterator[None]:
+    token = _suppressed.set(True)
+    try:
+        yield
+    finally:
+        _suppressed.reset(token)
+
+
+def recording() -> bool:
+    return not _suppressed.get()
+
+
+# Spans of the current turn when it is sampled for tracing, else None
+_trace: contextvars.ContextVar[list | None] = contextvars.ContextVar("taxpilot_trace", default=None)
+
+
+def trace_sampled(session_id: str) -> bool:
+    """Stable per-session sampling decision."""
+    if TRACE_SAMPLE_RATE <= 0:
+        return False
+    return zlib.crc32(session_id.encode()) / 2**32 < TRACE_SAMPLE_RATE
+
+
+def start_trace(session_id: str) -> contextvars.Token | None:
+    return _trace.set([]) if trace_sampled(session_id) else None
+
+
+def finish_trace(token: contextvars.Token | None, session_id: str, **fields) -> None:
+    if token is None:
+        return
+    spans = _trace.get()
+    try:
+        _trace.reset(token)
+    except ValueError:
+        # An abandoned stream finalized from another context
+        pass
+    trace_logger.info(json.dumps({"session_id": session_id, "spans": spans, **fields}))
+
+
+def record_span(name: str, start: float, duration: float, error: bool = False) -> None:
+    spans = _trace.get()
+    if spans is not None:
+        spans.append({"name": name, "start": start, "ms": round(duration * 1000, 3), "error": error})
+
+
+def _accepts_config(fn: Callable) -> bool:
+    return "config" in inspect.signature(fn).parameters
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Wrap a node (sync or async) with latency, count, error and in-flight metrics."""
+    pass_config = _accepts_config(fn)
+
+    def _done(start: float, failed: bool) -> None:
+        duration = time.perf_counter() - start
+        NODE_IN_FLIGHT.dec(node=name)
+        NODE_DURATION.observe(duration, node=name)
+        if failed:
+            NODE_ERRORS.inc(node=name)
+        record_span(name, time.time() - duration, duration, failed)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, config=None):
+            if _suppressed.get():
+                return await (fn(state, config) if pass_config else fn(state))
+            NODE_CALLS.inc(node=name)
+            NODE_IN_FLIGHT.inc(node=name)
+            start, failed = time.perf_counter(), True
+            try:
+                result = await (fn(state, config) if pass_config else fn(state))
+                failed = False
+                return result
+            finally:
+                _done(start, failed)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, config=None):
+        if _suppressed.get():
+            return fn(state, config) if pass_config else fn(state)
+        NODE_CALLS.inc(node=name)
+        NODE_IN_FLIGHT.inc(node=name)
+        start, failed = time.perf_counter(), True
+        try:
+            result = fn(state, config) if pass_config else fn(state)
+            failed = False
+            return result
+        finally:
+            _done(start, failed)
+    return wrapper
+
+
+def record_upstream(upstream: str, duration: float, failed: bool) -> None:
+    if _suppressed.get():
+        return
+    UPSTREAM_DURATION.observe(duration, upstream=upstream)
+    if failed:
+        UPSTREAM_ERRORS.inc(upstream=upstream)
+    record_span(f"http:{upstream}", time.time() - duration, duration, failed)
+
+
+def stats_gauges(prefix: str, label: str, rows: dict[str, dict], keys: tuple[str, ...]) -> list[str]:
+    """Render numeric fields of stats() snapshots as gauges labelled by their owner."""
+    lines = []
+    for key in keys:
+        name = f"{prefix}_{key}"
+        lines.append(f"# TYPE {name} gauge")
+        lines += [f'{name}{{{label}="{_escape_label(owner)}"}} {values[key]}'
+                  for owner, values in rows.items() if key in values]
+    return lines
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,35 +1,113 @@
 """Classifier node — Categorizes income sources."""
 
 import re
+from collections import Counter
+from dataclasses import replace
+
 from state import TaxPilotState, IncomeItem
+from incremental import NodeSpec
+from tools.extraction import extract
 
+# Wording that introduces another document rather than restating one
+_NEW_DOCUMENT = re.compile(r"\b(?:another|second|third|also|additional|one more)\b", re.IGNORECASE)
 
-def classifier_node(state: TaxPilotState) -> TaxPilotState:
-    """Categorize and organize income items."""
+
+def w2_item(wages: float, federal_withheld: float | None = None, state_withheld: float | None = None,
+            employer_name: str = "Employer (from W-2)") -> IncomeItem:
+    """W-2 income item, estimating withholding the filer didn't report."""
+    return IncomeItem(
+        source="W-2 Employment",
+        type="w2",
+        employer_name=employer_name,
+        amount=wages,
+        federal_withheld=wages * 0.167 if federal_withheld is None else federal_withheld,  # ~16.7% average withholding
+        state_withheld=wages * 0.05 if state_withheld is None else state_withheld,         # ~5% state estimate
+    )
+
+
+def updated_income(state: TaxPilotState) -> list[IncomeItem] | None:
+    """income_items with the message's new income added, or None if it adds nothing.
+
+    An amount already recorded with the same type and source is that document
+    mentioned again ("$50,000 wages" on two turns), not a second one; each
+    recorded item absorbs at most one mention. Only a message that introduces
+    a new document ("another W-2", "a second job", "I also got") records an
+    equal amount again. Reported withholding goes on the first
+    new W-2, or corrects the latest recorded one when the message has no wages.
+    """
     message = state.get("user_message", "")
+    found = extract(message)
     income_items = list(state.get("income_items", []))
+    # Items recorded before this turn that the message may be mentioning again
+    recorded = Counter() if _NEW_DOCUMENT.search(message) else Counter(
+        (item.type, item.source, item.amount) for item in income_items)
+    withholding = found.federal_withheld is not None or found.state_withheld is not None
+    changed = False
 
-    # Try to extract dollar amounts from the message
-    amounts = re.findall(r'\$?([\d,]+(?:\.\d{2})?)', message)
-    amounts = [float(a.replace(',', '')) for a in amounts if float(a.replace(',', '')) > 100]
-
-    if amounts:
-        # Assume largest amount is wages
-        wages = max(amounts)
-        item = IncomeItem(
-            source="W-2 Employment",
-            type="w2",
-            employer_name="Employer (from W-2)",
-            amount=wages,
-            federal_withheld=wages * 0.167,  # ~16.7% average withholding
-            state_withheld=wages * 0.05,     # ~5% state estimate
-        )
+    for income in found.income:
+        key = (income.type, income.source, income.amount)
+        if recorded[key]:
+            recorded[key] -= 1
+            continue
+        if income.type == "w2" and withholding:
+            item = w2_item(income.amount, found.federal_withheld, found.state_withheld)
+            withholding = False
+        elif income.type == "w2":
+            item = w2_item(income.amount)
+        else:
+            item = IncomeItem(source=income.source, type=income.type, amount=income.amount)
         income_items.append(item)
+        changed = True
+
+    w2s = [i for i, item in enumerate(income_items) if item.type == "w2"]
+    if withholding and w2s:
+        latest = income_items[w2s[-1]]
+        corrected = replace(
+            latest,
+            federal_withheld=latest.federal_withheld if found.federal_withheld is None else found.federal_withheld,
+            state_withheld=latest.state_withheld if found.state_withheld is None else found.state_withheld,
+        )
+        if corrected != latest:
+            income_items[w2s[-1]] = corrected
+            changed = True
+
+    return income_items if changed else None
+
+
+SPEC = NodeSpec(
+    # The message matters only through the income it adds
+    reads=("income_items",),
+    writes=("income_items", "total_income", "total_withheld", "current_node", "response"),
+    derive=lambda state: {"income": updated_income(state)},
+)
+
+
+def classifier_node(state: TaxPilotState) -> dict:
+    """Categorize and organize income items."""
+    income_items = state.get("income_items", [])
+    update = {}
+
+    added = updated_income(state)
+    if added is not None:
+        income_items = update["income_items"] = added
 
     total_income = sum(item.amount for item in income_items)
     total_withheld = sum(item.federal_withheld for item in income_items)
 
+    response = f"I've recorded your income of ${total_income:,.2f}. Let me analyze potential deductions for you..."
+
+    update.update({
+        "total_income": total_income,
+        "total_withheld": total_withheld,
+        "current_node": "classifier",
+        "response": response,
+    })
+    return update
+
+
+def render_cards(state: TaxPilotState) -> list[dict]:
     cards = []
+    income_items = state.get("income_items", [])
     if income_items:
         latest = income_items[-1]
         cards.append({
@@ -48,15 +126,4 @@ def classifier_node(state: TaxPilotState) -> TaxPilotState:
         "title": "Tax Return Progress",
         "data": {"step": 3, "total": 5, "label": "Deductions & Credits"},
     })
-
-    response = f"I've recorded your income of ${total_income:,.2f}. Let me analyze potential deductions for you..."
-
-    return {
-        **state,
-        "income_items": income_items,
-        "total_income": total_income,
-        "total_withheld": total_withheld,
-        "current_node": "classifier",
-        "response": response,
-        "cards": cards,
-    }
+    return cards
@@ -1,70 +1,52 @@
-"""Deduction node — RAG-powered deduction finder using DO Knowledge Base."""
+"""Deduction node — RAG-powered deduction finder over the tax knowledge base."""
 
-import os
-import httpx
 from state import TaxPilotState, DeductionItem
+from incremental import NodeSpec
+from nodes import retrieval
+from tools.tax_calculator import get_standard_deduction
 
-STANDARD_DEDUCTIONS = {
-    "single": 15000,
-    "married_filing_jointly": 30000,
-    "married_filing_separately": 15000,
-    "head_of_household": 22500,
-    "qualifying_widow": 30000,
-}
-
-KB_URL = os.environ.get("DO_KB_URL", "")
-KB_API_KEY = os.environ.get("DO_KB_API_KEY", "")
-
-
-def query_knowledge_base(query: str) -> str:
-    """Query DO Knowledge Base for relevant tax info."""
-    if not KB_URL:
-        return "Standard deduction is recommended for most filers. Check IRS Pub 501."
-    try:
-        response = httpx.post(
-            f"{KB_URL}/query",
-            headers={"Authorization": f"Bearer {KB_API_KEY}"},
-            json={"query": query, "top_k": 3},
-            timeout=10,
-        )
-        response.raise_for_status()
-        results = response.json().get("results", [])
-        return "\n".join(r.get("text", "") for r in results)
-    except Exception:
-        return ""
-
-
-def deduction_node(state: TaxPilotState) -> TaxPilotState:
+
+SPEC = NodeSpec(
+    reads=("filing_status", "total_income", "dependents"),
+    writes=("deductions", "standard_deduction", "itemized_total", "use_standard", "current_node", "response"),
+    derive=lambda state: {"categories": retrieval.deduction_categories(state)},
+)
+
+
+def _heading(info: str) -> str | None:
+    """The KB section title a lookup's passages start with."""
+    heading = info.split("\n", 1)[0].strip()
+    return heading if heading and not retrieval.failed(heading) else None
+
+
+def deduction_node(state: TaxPilotState) -> dict:
     """Find applicable deductions using RAG."""
     filing_status = state.get("filing_status", "single")
-    total_income = state.get("total_income", 0)
-
-    standard_deduction = STANDARD_DEDUCTIONS.get(filing_status, 15000)
+    standard_deduction = get_standard_deduction(filing_status or "single")
 
-    # Query KB for deduction opportunities
-    rag_context = query_knowledge_base(
-        f"Tax deductions for {filing_status} filer with income ${total_income:,.0f}"
-    )
+    # KB lookups, prefetched by the retrieval branch when the graph fans out
+    results = retrieval.resolve(state)
 
-    # Common deductions to check
+    # Common deductions to check: amounts are unknown until the filer reports them
     deductions: list[DeductionItem] = []
+    for category in retrieval.deduction_categories(state):
+        heading = _heading(results[f"deduction:{category}"])
+        if heading:
+            deductions.append(DeductionItem(
+                category=category,
+                description=heading,
+                amount=0,
+                confidence=0,
+                is_itemized=category in retrieval.ITEMIZED_CATEGORIES,
+                ai_suggested=True,
+            ))
+    credits = [heading for key, info in results.items() if key.startswith("credit:") and (heading := _heading(info))]
 
     # Always suggest standard deduction as baseline
     itemized_total = sum(d.amount for d in deductions)
 
     use_standard = standard_deduction >= itemized_total
 
-    cards = [{
-        "type": "deduction_card",
-        "title": "Deduction Analysis",
-        "data": {
-            "standard_deduction": standard_deduction,
-            "itemized_total": itemized_total,
-            "recommendation": "standard" if use_standard else "itemized",
-            "savings": standard_deduction - itemized_total if use_standard else 0,
-        },
-    }]
-
     effective_deduction = standard_deduction if use_standard else itemized_total
     deduction_type = "Standard" if use_standard else "Itemized"
 
@@ -74,14 +56,34 @@ def deduction_node(state: TaxPilotState) -> TaxPilotState:
     )
     if use_standard:
         response += f"The standard deduction (${standard_deduction:,.0f}) exceeds your itemized deductions (${itemized_total:,.0f}), so the standard deduction saves you more."
+    if credits:
+        response += "\n\nYou may also qualify for: " + ", ".join(credits) + "."
 
     return {
-        **state,
         "deductions": deductions,
         "standard_deduction": standard_deduction,
         "itemized_total": itemized_total,
         "use_standard": use_standard,
         "current_node": "deduction",
         "response": response,
-        "cards": cards,
     }
+
+
+def render_cards(state: TaxPilotState) -> list[dict]:
+    standard_deduction = state.get("standard_deduction", 0)
+    itemized_total = state.get("itemized_total", 0)
+    use_standard = state.get("use_standard", True)
+    credits = retrieval.eligible_credits(
+        state.get("filing_status"), state.get("total_income", 0), state.get("dependents", 0))
+    return [{
+        "type": "deduction_card",
+        "title": "Deduction Analysis",
+        "data": {
+            "standard_deduction": standard_deduction,
+            "itemized_total": itemized_total,
+            "recommendation": "standard" if use_standard else "itemized",
+            "savings": standard_deduction - itemized_total if use_standard else 0,
+            "to_check": [d.category for d in state.get("deductions", [])],
+            "credits_to_check": credits,
+        },
+    }]
@@ -1,12 +1,20 @@
 """Form builder node — Calculates Form 1040 fields."""
 
 from state import TaxPilotState
-from tools.tax_calculator import calculate_federal_tax
+from incremental import NodeSpec
+from tools.tax_calculator import get_schedule
 
 
-def form_builder_node(state: TaxPilotState) -> TaxPilotState:
+SPEC = NodeSpec(
+    reads=("filing_status", "total_income", "standard_deduction", "itemized_total", "use_standard",
+           "total_withheld", "credits"),
+    writes=("taxable_income", "federal_tax", "estimated_refund", "current_node", "response"),
+)
+
+
+def form_builder_node(state: TaxPilotState) -> dict:
     """Build Form 1040 data from collected information."""
-    filing_status = state.get("filing_status", "single")
+    filing_status = state.get("filing_status") or "single"
     total_income = state.get("total_income", 0)
     standard_deduction = state.get("standard_deduction", 15000)
     itemized_total = state.get("itemized_total", 0)
@@ -17,23 +25,10 @@ def form_builder_node(state: TaxPilotState) -> TaxPilotState:
     # Calculate
     deductions = standard_deduction if use_standard else itemized_total
     taxable_income = max(0, total_income - deductions)
-    federal_tax = calculate_federal_tax(taxable_income, filing_status)
+    federal_tax = get_schedule(filing_status).tax(taxable_income)
     tax_after_credits = max(0, federal_tax - credits)
     estimated_refund = total_withheld - tax_after_credits
 
-    cards = [{
-        "type": "refund_card",
-        "title": "Estimated Refund",
-        "data": {
-            "gross_income": total_income,
-            "deductions": deductions,
-            "taxable_income": taxable_income,
-            "federal_tax": federal_tax,
-            "withheld": total_withheld,
-            "refund": estimated_refund,
-        },
-    }]
-
     if estimated_refund >= 0:
         response = (
             f"Here's your estimated 2025 tax return:\n\n"
@@ -55,11 +50,25 @@ def form_builder_node(state: TaxPilotState) -> TaxPilotState:
         )
 
     return {
-        **state,
         "taxable_income": taxable_income,
         "federal_tax": federal_tax,
         "estimated_refund": estimated_refund,
         "current_node": "form_builder",
         "response": response,
-        "cards": cards,
     }
+
+
+def render_cards(state: TaxPilotState) -> list[dict]:
+    use_standard = state.get("use_standard", True)
+    return [{
+        "type": "refund_card",
+        "title": "Estimated Refund",
+        "data": {
+            "gross_income": state.get("total_income", 0),
+            "deductions": state.get("standard_deduction", 15000) if use_standard else state.get("itemized_total", 0),
+            "taxable_income": state.get("taxable_income", 0),
+            "federal_tax": state.get("federal_tax", 0),
+            "withheld": state.get("total_withheld", 0),
+            "refund": state.get("estimated_refund", 0),
+        },
+    }]
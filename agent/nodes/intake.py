@@ -1,100 +1,174 @@
 """Intake node — Collects personal information through conversation."""
 
-import os
-import httpx
+import time
+import logging
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+
+import metrics
+import fast_path
+from completion_cache import get_completion_cache
 from state import TaxPilotState
 from prompts import INTAKE_PROMPT
+from tools.extraction import extract
+from dispatcher import complete, acomplete, stream_complete, astream_complete
 
-INFERENCE_URL = os.environ.get(
-    "GRADIENT_INFERENCE_URL",
-    "https://inference.do-ai.run/v1/chat/completions"
-)
-MODEL = os.environ.get("GRADIENT_MODEL", "meta-llama/Llama-3.3-70B-Instruct")
-API_KEY = os.environ.get("GRADIENT_API_KEY", "")
+logger = logging.getLogger(__name__)
 
 
-def intake_node(state: TaxPilotState) -> TaxPilotState:
-    """Collect user info through conversational interview."""
-    message = state.get("user_message", "")
-    lower = message.lower()
-
-    # Extract filing status from message
-    filing_status = state.get("filing_status")
-    if not filing_status:
-        if "single" in lower:
-            filing_status = "single"
-        elif "married" in lower and "joint" in lower:
-            filing_status = "married_filing_jointly"
-        elif "married" in lower and "separate" in lower:
-            filing_status = "married_filing_separately"
-        elif "head" in lower and "household" in lower:
-            filing_status = "head_of_household"
-        elif "widow" in lower or "qualifying" in lower:
-            filing_status = "qualifying_widow"
-
-    # Extract name
-    name = state.get("name")
-    if not name and ("my name is" in lower or "i'm " in lower or "i am " in lower):
-        # Simple extraction
-        for prefix in ["my name is ", "i'm ", "i am "]:
-            if prefix in lower:
-                idx = lower.index(prefix) + len(prefix)
-                rest = message[idx:].strip()
-                name = rest.split(",")[0].split(".")[0].split(" and")[0].strip()
-                break
-
-    # Build prompt
-    system_prompt = INTAKE_PROMPT.format(
-        name=name or "Not provided",
-        filing_status=filing_status or "Not provided",
-        state=state.get("state") or "Not provided",
-        dependents=state.get("dependents", 0),
-        income_count=len(state.get("income_items", [])),
-    )
+def _extract(state: TaxPilotState) -> dict:
+    """Personal fields from the message, keeping known values.
 
-    # Call inference
-    try:
-        response = httpx.post(
-            INFERENCE_URL,
-            headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
-            json={
-                "model": MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message},
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500,
-            },
-            timeout=30,
-        )
-        response.raise_for_status()
-        reply = response.json()["choices"][0]["message"]["content"]
-    except Exception:
-        # Fallback response
-        if not filing_status:
-            reply = "Thanks! What is your filing status? (Single, Married Filing Jointly, Married Filing Separately, Head of Household, or Qualifying Widow/Widower)"
-        elif not name:
-            reply = f"Filing status set to {filing_status.replace('_', ' ').title()}. What's your name?"
-        else:
-            reply = f"Great, {name}! Now let's gather your income. Do you have a W-2 from an employer?"
+    A dependents count in the message replaces the recorded one, since it is
+    usually a correction.
+    """
+    found = extract(state.get("user_message", ""))
+    return {
+        "name": state.get("name") or found.name,
+        "filing_status": state.get("filing_status") or found.filing_status,
+        "state": state.get("state") or found.state,
+        "dependents": state.get("dependents", 0) if found.dependents is None else found.dependents,
+    }
+
+
+def _prompt_fields(state: TaxPilotState, personal: dict) -> dict:
+    """INTAKE_PROMPT fields; also the completion cache key."""
+    return {
+        "name": personal["name"] or "Not provided",
+        "filing_status": personal["filing_status"] or "Not provided",
+        "state": personal["state"] or "Not provided",
+        "dependents": personal["dependents"],
+        "income_count": len(state.get("income_items", [])),
+    }
+
+
+def _stream_tokens(config: RunnableConfig | None) -> bool:
+    """Whether the caller asked for LLM tokens as custom stream events."""
+    return bool((config or {}).get("configurable", {}).get("stream_tokens"))
+
+
+def _tenant(config: RunnableConfig | None) -> str | None:
+    """The tenant the turn's inference is rate-limited under (dispatcher.py)."""
+    return (config or {}).get("configurable", {}).get("tenant")
+
+
+def _fast_path_mode(config: RunnableConfig | None) -> str:
+    """INTAKE_FAST_PATH, unless the turn overrides it (main.py's warm-up turn never calls the model)."""
+    return (config or {}).get("configurable", {}).get("fast_path", fast_path.FAST_PATH_MODE)
+
+
+def _fallback_reply(personal: dict, error: Exception) -> str:
+    logger.warning("Intake inference failed, using fallback reply: %r", error)
+    metrics.FALLBACKS.inc(node="intake")
+    return fast_path.next_question(personal["filing_status"], personal["name"])
+
+
+def _stream_fallback(sent: list[str], reply: str) -> None:
+    """Stream the fallback reply, telling the client first to discard any tokens already sent."""
+    write = get_stream_writer()
+    if sent:
+        write({"discard": True})
+    write({"token": reply})
 
+
+def _shortcut(state: TaxPilotState, personal: dict, fields: dict,
+              config: RunnableConfig | None) -> tuple[fast_path.Decision, str | None]:
+    """Reply without a model call: a fast-path template or a cached completion."""
+    decision = fast_path.decide(state, personal["filing_status"], personal["name"], _fast_path_mode(config))
+    if decision.use_llm:
+        reply = get_completion_cache().lookup(fields, state.get("user_message", ""))
+    else:
+        fast_path.record(decision)
+        reply = decision.reply
+    if reply is not None and _stream_tokens(config):
+        get_stream_writer()({"token": reply})
+    return decision, reply
+
+
+def render_cards(state: TaxPilotState) -> list[dict]:
     # Determine progress step
     step = 1
-    if filing_status:
+    if state.get("filing_status"):
         step = 2
 
-    cards = [{
+    return [{
         "type": "progress_card",
         "title": "Tax Return Progress",
         "data": {"step": step, "total": 5, "label": "Personal Information" if step == 1 else "Income Information"},
     }]
 
+
+def _result(personal: dict, reply: str) -> dict:
     return {
-        **state,
-        "name": name,
-        "filing_status": filing_status,
+        **personal,
         "current_node": "intake",
         "response": reply,
-        "cards": cards,
     }
+
+
+def intake_node(state: TaxPilotState, config: RunnableConfig | None = None) -> dict:
+    """Collect user info through conversational interview."""
+    personal = _extract(state)
+    fields = _prompt_fields(state, personal)
+    decision, reply = _shortcut(state, personal, fields, config)
+    if reply is not None:
+        return _result(personal, reply)
+
+    system_prompt = INTAKE_PROMPT.format(**fields)
+    message = state.get("user_message", "")
+
+    # Call inference
+    start = time.perf_counter()
+    tokens = []
+    try:
+        if _stream_tokens(config):
+            write = get_stream_writer()
+            for token in stream_complete(system_prompt, message, _tenant(config)):
+                tokens.append(token)
+                write({"token": token})
+            reply = "".join(tokens)
+        else:
+            reply = complete(system_prompt, message, _tenant(config))
+        fast_path.record(decision, time.perf_counter() - start)
+        get_completion_cache().store(fields, message, reply)
+    except Exception as e:
+        fast_path.record(decision)
+        reply = _fallback_reply(personal, e)
+        if _stream_tokens(config):
+            _stream_fallback(tokens, reply)
+
+    return _result(personal, reply)
+
+
+async def aintake_node(state: TaxPilotState, config: RunnableConfig | None = None) -> dict:
+    """Async intake_node: awaits inference instead of blocking a worker thread."""
+    personal = _extract(state)
+    fields = _prompt_fields(state, personal)
+    decision, reply = _shortcut(state, personal, fields, config)
+    if reply is not None:
+        return _result(personal, reply)
+
+    system_prompt = INTAKE_PROMPT.format(**fields)
+    message = state.get("user_message", "")
+
+    start = time.perf_counter()
+    tokens = []
+    try:
+        if _stream_tokens(config):
+            write = get_stream_writer()
+            async for token in astream_complete(system_prompt, message, _tenant(config)):
+                tokens.append(token)
+                write({"token": token})
+            reply = "".join(tokens)
+        else:
+            reply = await acomplete(system_prompt, message, _tenant(config))
+        fast_path.record(decision, time.perf_counter() - start)
+        get_completion_cache().store(fields, message, reply)
+    except Exception as e:
+        fast_path.record(decision)
+        reply = _fallback_reply(personal, e)
+        if _stream_tokens(config):
+            _stream_fallback(tokens, reply)
+
+    return _result(personal, reply)
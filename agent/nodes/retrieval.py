@@ -0,0 +1,182 @@
+"""Retrieval node — Prefetches knowledge-base passages alongside the classifier.
+
+The deduction node's lookups depend only on filing status, income and
+dependents, and those are known as soon as intake hands off: the classifier
+is a pure function of the message and the recorded income, so
+``updated_income`` gives the total it is about to record. This node runs in
+parallel with the classifier and fetches every lookup the deduction node will
+make concurrently: the deduction KB query, info on each deduction category and
+on each credit the filer may qualify for. It writes them to the transient
+``prefetch`` field, keyed by lookup, and the graph joins both branches at
+deduction. There, lookups missing from ``prefetch`` (say the classifier saw
+the income differently) are made on the spot, so the prefetch is only ever a
+head start.
+
+A turn then waits for the slower of classification and retrieval rather than
+the sum of the lookups. AGENT_FAN_OUT=false restores the sequential pipeline,
+with the deduction node making its lookups one after another. The default,
+``auto``, fans out only when DO_KB_URL is set.
+"""
+
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import metrics
+from state import TaxPilotState
+from incremental import NodeSpec
+from nodes.classifier import updated_income
+from cache import TTLCache
+from tools.knowledge_base import KB_URL, kb_cache, search_knowledge_base, get_deduction_info, get_credit_info, income_band
+
+# "auto": fan out only when lookups can go to the remote KB; answered from the
+# in-process index alone they are CPU-bound, so the parallel branch is pure overhead
+_FAN_OUT = os.environ.get("AGENT_FAN_OUT", "auto").lower()
+FAN_OUT = bool(KB_URL) if _FAN_OUT == "auto" else _FAN_OUT in ("1", "true", "yes")
+PREFETCH_WORKERS = int(os.environ.get("AGENT_PREFETCH_WORKERS", 16))
+
+# Itemized (Schedule A), then above-the-line deductions the deduction node checks
+ITEMIZED_CATEGORIES = (
+    "medical and dental expenses",
+    "state and local taxes",
+    "home mortgage interest",
+    "charitable contributions",
+)
+DEDUCTION_CATEGORIES = ITEMIZED_CATEGORIES + (
+    "student loan interest",
+    "health savings account",
+    "ira contributions",
+)
+# Only checked for filers with contract or business income
+SELF_EMPLOYMENT_CATEGORIES = ("self-employment tax", "home office")
+
+# 2025 AGI ceilings for the Earned Income Tax Credit by qualifying children
+# (0, 1, 2, 3+) and for the Saver's Credit; married filing jointly, then everyone else
+_EITC_LIMITS = {
+    "married_filing_jointly": (26_214, 57_554, 64_430, 68_675),
+    None: (19_104, 50_434, 57_310, 61_555),
+}
+_SAVERS_LIMITS = {"married_filing_jointly": 79_000, "head_of_household": 59_250, None: 39_500}
+
+PREFETCH = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_prefetch_total", "Deduction lookups by whether the retrieval branch had prefetched them",
+    ("result",)))
+
+# Results of whole lookup plans, so a filer whose lookups are all cached in
+# the KB costs one cache hit instead of one per lookup
+_plan_cache = TTLCache(maxsize=256, ttl=kb_cache.ttl)
+_FAILED = "KB query failed"
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+    return _executor
+
+
+def deduction_query(filing_status: str | None, total_income: float) -> str:
+    return f"Tax deductions for {filing_status} filer with income {income_band(total_income, filing_status)}"
+
+
+def eligible_credits(filing_status: str | None, total_income: float, dependents: int) -> list[str]:
+    """Credits worth checking for this filer, from income and dependents alone."""
+    credits = []
+    if dependents > 0:
+        credits += ["child tax credit", "child and dependent care credit"]
+    if filing_status != "married_filing_separately":
+        limits = _EITC_LIMITS.get(filing_status, _EITC_LIMITS[None])
+        if 0 < total_income <= limits[min(dependents, 3)]:
+            credits.append("earned income tax credit")
+    if 0 < total_income <= _SAVERS_LIMITS.get(filing_status, _SAVERS_LIMITS[None]):
+        credits.append("saver's credit")
+    return credits
+
+
+def deduction_categories(state: TaxPilotState) -> tuple[str, ...]:
+    income_types = {item.type for item in state.get("income_items", [])}
+    if income_types & {"1099", "self_employment"}:
+        return DEDUCTION_CATEGORIES + SELF_EMPLOYMENT_CATEGORIES
+    return DEDUCTION_CATEGORIES
+
+
+def lookups(state: TaxPilotState) -> dict[str, Callable[[], str]]:
+    """The deduction node's KB lookups for this state, keyed as in ``prefetch``."""
+    filing_status = state.get("filing_status", "single")
+    total_income = state.get("total_income", 0)
+    query = deduction_query(filing_status, total_income)
+    plan = {f"kb:{query}": lambda: _passages(query)}
+    for category in deduction_categories(state):
+        plan[f"deduction:{category}"] = lambda category=category: get_deduction_info(category)
+    for credit in eligible_credits(filing_status, total_income, state.get("dependents", 0)):
+        plan[f"credit:{credit}"] = lambda credit=credit: get_credit_info(credit)
+    return plan
+
+
+def _passages(query: str) -> str:
+    results = search_knowledge_base(query, top_k=3)
+    if not results:
+        return "Standard deduction is recommended for most filers. Check IRS Pub 501."
+    return "\n".join(r.get("text", "") for r in results)
+
+
+def failed(result: str) -> bool:
+    """Whether a lookup's result is the KB's failure placeholder."""
+    return result.startswith(_FAILED)
+
+
+def fetch(plan: dict[str, Callable[[], str]]) -> dict[str, str]:
+    """Run the lookups concurrently; each keeps the caller's trace context."""
+    key = tuple(plan)
+    results = _plan_cache.get(key)
+    if results is not None:
+        return results
+    if not FAN_OUT or len(plan) <= 1:
+        results = {key: lookup() for key, lookup in plan.items()}
+    else:
+        executor = _get_executor()
+        futures = {key: executor.submit(contextvars.copy_context().run, lookup) for key, lookup in plan.items()}
+        results = {key: future.result() for key, future in futures.items()}
+    if not any(failed(result) for result in results.values()):
+        _plan_cache.set(key, results)
+    return results
+
+
+def resolve(state: TaxPilotState) -> dict[str, str]:
+    """Every deduction lookup's result: from ``prefetch`` where the retrieval branch made it, else fetched now."""
+    plan = lookups(state)
+    prefetch = state.get("prefetch") or {}
+    hits = {key: prefetch[key] for key in plan if key in prefetch}
+    if metrics.recording():
+        PREFETCH.inc(len(hits), result="hit")
+        PREFETCH.inc(len(plan) - len(hits), result="miss")
+    return {**hits, **fetch({key: lookup for key, lookup in plan.items() if key not in hits})}
+
+
+def classified(state: TaxPilotState) -> TaxPilotState:
+    """The state with the income the classifier is recording this turn."""
+    income_items = updated_income(state)
+    if income_items is None:
+        return state
+    return {**state, "income_items": income_items, "total_income": sum(item.amount for item in income_items)}
+
+
+def _lookup_inputs(state: TaxPilotState) -> dict:
+    state = classified(state)
+    return {"total_income": state.get("total_income", 0), "categories": deduction_categories(state)}
+
+
+SPEC = NodeSpec(
+    # Skipped when the deduction node's inputs won't change either, so it will be skipped too
+    reads=("filing_status", "dependents"),
+    writes=("prefetch",),
+    derive=_lookup_inputs,
+)
+
+
+def retrieval_node(state: TaxPilotState) -> dict:
+    """Prefetch the deduction node's lookups for the income the classifier is recording."""
+    return {"prefetch": fetch(lookups(classified(state)))}
@@ -1,9 +1,20 @@
 """Review node — Confidence scoring and HITL flagging."""
 
 from state import TaxPilotState, ReviewFlag
+from nodes.form_builder import render_cards as form_builder_cards
+from incremental import NodeSpec
 
+# tools.scenarios (and numpy with it) is imported on first use, once a return
+# reaches review, so intake-only processes never load it
 
-def review_node(state: TaxPilotState) -> TaxPilotState:
+SPEC = NodeSpec(
+    reads=("filing_status", "total_income", "estimated_refund", "total_withheld", "dependents", "response",
+           "itemized_total", "use_standard", "credits"),
+    writes=("confidence_score", "review_flags", "needs_review", "current_node", "response", "completed"),
+)
+
+
+def review_node(state: TaxPilotState) -> dict:
     """Analyze return for accuracy and flag items for human review."""
     filing_status = state.get("filing_status", "single")
     total_income = state.get("total_income", 0)
@@ -16,13 +27,20 @@ def review_node(state: TaxPilotState) -> TaxPilotState:
     # Check: filing status optimization
     dependents = state.get("dependents", 0)
     if filing_status == "single" and dependents > 0:
-        review_flags.append(ReviewFlag(
-            field_name="Filing Status Optimization",
-            field_value=filing_status,
-            reason="Filer has dependents but filed as Single. May qualify for Head of Household, saving ~$1,200+.",
-            confidence=0.68,
-        ))
-        confidence_score -= 0.1
+        from tools.scenarios import Scenario, evaluate_scenarios
+
+        savings = evaluate_scenarios(state, [Scenario(filing_status="head_of_household")])[0].savings
+        if savings > 0:
+            review_flags.append(ReviewFlag(
+                field_name="Filing Status Optimization",
+                field_value=filing_status,
+                reason=(
+                    "Filer has dependents but filed as Single. "
+                    f"May qualify for Head of Household, saving ~${savings:,.0f}."
+                ),
+                confidence=0.68,
+            ))
+            confidence_score -= 0.1
 
     # Check: withholding ratio
     if total_income > 0:
@@ -55,19 +73,6 @@ def review_node(state: TaxPilotState) -> TaxPilotState:
     needs_review = len(review_flags) > 0
     confidence_score = max(0, min(1, confidence_score))
 
-    cards = []
-    if review_flags:
-        for flag in review_flags:
-            cards.append({
-                "type": "review_card",
-                "title": "Flagged for Review",
-                "data": {
-                    "field": flag.field_name,
-                    "reason": flag.reason,
-                    "confidence": flag.confidence,
-                },
-            })
-
     pct = round(confidence_score * 100)
     response = state.get("response", "")
     if needs_review:
@@ -79,12 +84,41 @@ def review_node(state: TaxPilotState) -> TaxPilotState:
         response += f"\n\nThis return has a **high confidence score ({pct}%)**. No items flagged for review."
 
     return {
-        **state,
         "confidence_score": confidence_score,
         "review_flags": review_flags,
         "needs_review": needs_review,
         "current_node": "review",
         "response": response,
-        "cards": state.get("cards", []) + cards,
         "completed": True,
     }
+
+
+def render_cards(state: TaxPilotState) -> list[dict]:
+    """The form builder's refund card, one card per review flag, then any filing alternatives."""
+    cards = form_builder_cards(state)
+    for flag in state.get("review_flags", []):
+        cards.append({
+            "type": "review_card",
+            "title": "Flagged for Review",
+            "data": {
+                "field": flag.field_name,
+                "reason": flag.reason,
+                "confidence": flag.confidence,
+            },
+        })
+
+    from tools.scenarios import filing_alternatives
+
+    alternatives = filing_alternatives(state)
+    if len(alternatives) > 1:
+        cards.append({
+            "type": "scenario_card",
+            "title": "What-If Comparison",
+            "data": {
+                "scenarios": [
+                    {"label": r.label, "refund": r.estimated_refund, "savings": r.savings}
+                    for r in alternatives
+                ],
+            },
+        })
+    return cards
@@ -0,0 +1,617 @@
+"""Write-behind persistence of filing state to the relational tables.
+
+PERSIST_BACKEND selects where sessions are written:
+
+- ``off`` (default): nothing is written
+- ``sqlite``: stand-in tables mirroring sql/schema.sql in a local file (PERSIST_PATH)
+- ``postgres``: tax_sessions, income_items, deductions, review_items and
+  chat_messages in sql/schema.sql (DATABASE_URL). Needs psycopg.
+
+Nodes never wait on the database. After each node, ``persist_node`` records
+the node's update in an in-memory buffer keyed by session, and each turn's
+user and assistant messages are recorded once the response is built. Changes
+to a session coalesce there: its updates merge, and each ledger table keeps
+the latest list. The writer thread works out the tax_sessions values from
+the merged updates when it takes the buffer, so nodes never copy the state. A single writer thread takes the whole
+buffer every PERSIST_FLUSH_INTERVAL seconds, or as soon as PERSIST_BATCH_ROWS
+rows are waiting, and writes it in one transaction: one multi-row statement
+per table on SQLite, COPY into Postgres.
+
+Ordering per session: one writer applies batches in the order they were
+taken, a session's ledger rows are replaced as a whole, and its chat messages
+are appended in the order they were recorded, stamped with the time they
+were. tax_sessions rows carry the ``updated_at`` of the change they hold and
+are only overwritten by a newer one, ledger rows included, so workers
+flushing the same session out of order can't roll it back.
+
+With Postgres, only sessions the web app has created in tax_sessions are
+written (rows there need a user); other session ids are skipped. Review
+items a reviewer has resolved are kept, and a flag on the same field isn't
+raised again.
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import sqlite3
+import inspect
+import logging
+import functools
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from collections import ChainMap
+from contextlib import contextmanager
+from typing import Callable, Mapping
+
+import metrics
+from state import TaxPilotState
+
+logger = logging.getLogger(__name__)
+
+PERSIST_BACKEND = os.environ.get("PERSIST_BACKEND", "off").lower()
+PERSIST_FLUSH_INTERVAL = float(os.environ.get("PERSIST_FLUSH_INTERVAL", 0.2))
+PERSIST_BATCH_ROWS = int(os.environ.get("PERSIST_BATCH_ROWS", 5000))
+# Seconds to wait before retrying a batch the database rejected, doubled up to the cap
+PERSIST_RETRY_MAX = float(os.environ.get("PERSIST_RETRY_MAX", 30))
+
+# tax_sessions.status for the node that last ran; review depends on needs_review
+_STATUS = {
+    "intake": "intake",
+    "classifier": "classifying",
+    "deduction": "deductions",
+    "form_builder": "form_building",
+}
+SESSION_COLUMNS = (
+    "id", "filing_status", "status", "confidence_score", "total_income", "total_deductions",
+    "total_credits", "estimated_tax", "estimated_refund", "updated_at",
+)
+# State list field -> table and the item attributes written to its columns
+LEDGER_TABLES = {
+    "income_items": ("income_items", (
+        "source", "type", "employer_name", "amount", "federal_withheld", "state_withheld")),
+    "deductions": ("deductions", (
+        "category", "description", "amount", "confidence", "irs_reference", "is_itemized", "ai_suggested")),
+    "review_flags": ("review_items", ("field_name", "field_value", "reason", "confidence")),
+}
+MESSAGE_COLUMNS = ("session_id", "role", "content", "cards", "created_at")
+
+PERSIST_ROWS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_persist_rows_total", "Rows written by the write-behind persister", ("table",)))
+PERSIST_FLUSHES = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_persist_flushes_total", "Write-behind batches by outcome", ("result",)))
+PERSIST_FLUSH_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    "taxpilot_persist_flush_duration_seconds", "Time to write one write-behind batch"))
+PERSIST_SKIPPED = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_persist_skipped_sessions_total", "Sessions left unwritten because tax_sessions has no row for them"))
+
+
+def status(state: TaxPilotState) -> str:
+    node = state.get("current_node", "intake")
+    if node == "review":
+        return "awaiting_review" if state.get("needs_review") else "completed"
+    return _STATUS.get(node, "intake")
+
+
+def session_values(state: Mapping) -> tuple:
+    """The tax_sessions columns after ``id`` and before ``updated_at``."""
+    deductions = state.get("standard_deduction", 0) if state.get("use_standard", True) else state.get("itemized_total", 0)
+    return (
+        state.get("filing_status"),
+        status(state),
+        state.get("confidence_score", 0),
+        state.get("total_income", 0),
+        deductions,
+        state.get("credits", 0),
+        state.get("federal_tax", 0),
+        state.get("estimated_refund", 0),
+    )
+
+
+@dataclass(slots=True)
+class SessionChanges:
+    """One session's unwritten changes, coalesced."""
+
+    values: tuple | None = None
+    updated_at: float = 0
+    # State list field -> the latest list, which replaces the session's rows
+    ledgers: dict[str, list] = field(default_factory=dict)
+    # (role, content, cards, created_at) in the order they were recorded
+    messages: list[tuple] = field(default_factory=list)
+    # Node updates merged since the last flush, and the state the latest one was
+    # made from; settle() turns them into values
+    update: dict = field(default_factory=dict)
+    state: Mapping | None = None
+
+    def rows(self) -> int:
+        has_values = self.values is not None or self.state is not None
+        return has_values + sum(map(len, self.ledgers.values())) + len(self.messages)
+
+    def absorb(self, newer: "SessionChanges") -> None:
+        if newer.values is not None:
+            self.values, self.updated_at = newer.values, newer.updated_at
+        if newer.state is not None:
+            self.update.update(newer.update)
+            self.state, self.updated_at = newer.state, newer.updated_at
+        self.ledgers.update(newer.ledgers)
+        self.messages += newer.messages
+
+    def settle(self) -> None:
+        if self.state is not None:
+            self.values = session_values(ChainMap(self.update, self.state))
+
+
+class PersistenceBackend(ABC):
+    """Writes a batch of coalesced changes in one transaction.
+
+    Subclasses provide the connection and how each statement is run; the
+    row layout and the order tables are written in are shared.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def transaction(self):
+        """Context manager yielding a cursor, committed on exit."""
+
+    def timestamp(self, t: float):
+        return t
+
+    @abstractmethod
+    def upsert_sessions(self, cur, session_ids: list[str], rows: list[tuple]) -> tuple[set[str], set[str]]:
+        """Apply session rows; the batch's ids that can be written to and the ids whose row took this change."""
+
+    @abstractmethod
+    def delete(self, cur, table: str, session_ids: list[str], pending_only: bool = False) -> None: ...
+
+    @abstractmethod
+    def resolved_reviews(self, cur, session_ids: list[str]) -> set[tuple[str, str]]: ...
+
+    @abstractmethod
+    def insert(self, cur, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None: ...
+
+    def close(self) -> None:
+        pass
+
+    def write(self, batch: dict[str, SessionChanges]) -> dict[str, int]:
+        """Write the batch; rows written per table."""
+        written = {}
+        session_rows = [
+            (session_id, *changes.values, self.timestamp(changes.updated_at))
+            for session_id, changes in batch.items() if changes.values is not None
+        ]
+        with self.transaction() as cur:
+            known, current = self.upsert_sessions(cur, list(batch), session_rows)
+            written["tax_sessions"] = len(current)
+            PERSIST_SKIPPED.inc(len(batch.keys() - known))
+
+            for state_field, (table, columns) in LEDGER_TABLES.items():
+                session_ids = [session_id for session_id in batch
+                               if session_id in current and state_field in batch[session_id].ledgers]
+                if not session_ids:
+                    continue
+                resolved = self.resolved_reviews(cur, session_ids) if table == "review_items" else set()
+                self.delete(cur, table, session_ids, pending_only=table == "review_items")
+                rows = [
+                    (session_id, *(getattr(item, column) for column in columns))
+                    for session_id in session_ids
+                    for item in batch[session_id].ledgers[state_field]
+                    if not resolved or (session_id, item.field_name) not in resolved
+                ]
+                self.insert(cur, table, ("session_id", *columns), rows)
+                written[table] = len(rows)
+
+            messages = [
+                (session_id, role, content, cards, self.timestamp(created_at))
+                for session_id, changes in batch.items() if session_id in known
+                for role, content, cards, created_at in changes.messages
+            ]
+            self.insert(cur, "chat_messages", MESSAGE_COLUMNS, messages)
+            written["chat_messages"] = len(messages)
+        return written
+
+
+def _chunks(rows: list[tuple], size: int):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+class SQLitePersistence(PersistenceBackend):
+    """Stand-in for the Postgres tables in a local SQLite file, for development and benchmarks.
+
+    Session ids are free-form text and tax_sessions rows are created on
+    first write, since there is no users table to point them at.
+    """
+
+    name = "sqlite"
+    # Rows per multi-row INSERT; well under SQLite's bound-parameter limit
+    CHUNK_ROWS = 500
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS tax_sessions ("
+        " id TEXT PRIMARY KEY, filing_status TEXT, status TEXT NOT NULL, confidence_score REAL,"
+        " total_income REAL, total_deductions REAL, total_credits REAL, estimated_tax REAL,"
+        " estimated_refund REAL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS income_items ("
+        " id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, source TEXT NOT NULL, type TEXT NOT NULL,"
+        " employer_name TEXT, amount REAL NOT NULL, federal_withheld REAL, state_withheld REAL)",
+        "CREATE TABLE IF NOT EXISTS deductions ("
+        " id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, category TEXT NOT NULL, description TEXT NOT NULL,"
+        " amount REAL NOT NULL, confidence REAL, irs_reference TEXT, is_itemized INTEGER, ai_suggested INTEGER)",
+        "CREATE TABLE IF NOT EXISTS review_items ("
+        " id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, field_name TEXT NOT NULL, field_value TEXT,"
+        " reason TEXT NOT NULL, confidence REAL, status TEXT NOT NULL DEFAULT 'pending')",
+        "CREATE TABLE IF NOT EXISTS chat_messages ("
+        " id INTEGER PRIMARY KEY, session_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,"
+        " cards TEXT, created_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_income_items_session ON income_items(session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_deductions_session ON deductions(session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_review_items_session ON review_items(session_id)",
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id)",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        # Only the writer thread writes; check_same_thread is off so it can be opened elsewhere
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            self.conn.execute(statement)
+
+    @contextmanager
+    def transaction(self):
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            yield cur
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+        cur.execute("COMMIT")
+
+    def upsert_sessions(self, cur, session_ids, rows):
+        current = set()
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in SESSION_COLUMNS[1:])
+        for chunk in _chunks(rows, self.CHUNK_ROWS):
+            values = ", ".join(["(" + ", ".join("?" * len(SESSION_COLUMNS)) + ")"] * len(chunk))
+            cur.execute(
+                f"INSERT INTO tax_sessions ({', '.join(SESSION_COLUMNS)}) VALUES {values}"
+                f" ON CONFLICT(id) DO UPDATE SET {assignments}"
+                " WHERE excluded.updated_at >= tax_sessions.updated_at RETURNING id",
+                [value for row in chunk for value in row],
+            )
+            current.update(session_id for session_id, in cur.fetchall())
+        # No foreign keys here, so every session's messages can be written
+        return set(session_ids), current
+
+    def delete(self, cur, table, session_ids, pending_only=False):
+        for chunk in _chunks(session_ids, self.CHUNK_ROWS):
+            cur.execute(
+                f"DELETE FROM {table} WHERE session_id IN ({', '.join('?' * len(chunk))})"
+                + (" AND status = 'pending'" if pending_only else ""),
+                chunk,
+            )
+
+    def resolved_reviews(self, cur, session_ids):
+        resolved = set()
+        for chunk in _chunks(session_ids, self.CHUNK_ROWS):
+            resolved.update(cur.execute(
+                f"SELECT session_id, field_name FROM review_items"
+                f" WHERE session_id IN ({', '.join('?' * len(chunk))}) AND status != 'pending'",
+                chunk,
+            ).fetchall())
+        return resolved
+
+    def insert(self, cur, table, columns, rows):
+        row = "(" + ", ".join("?" * len(columns)) + ")"
+        for chunk in _chunks(rows, self.CHUNK_ROWS):
+            cur.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row] * len(chunk))}",
+                [value for row in chunk for value in row],
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# tax_sessions.id as the web app passes it (the form id::text gives back); any
+# other session id can't have a row there
+_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class PostgresPersistence(PersistenceBackend):
+    """Batches into the sql/schema.sql tables: one UPDATE for sessions, COPY for rows. Needs psycopg.
+
+    The writer thread is the only user, so it keeps one connection open and
+    reconnects if the server drops it.
+    """
+
+    name = "postgres"
+
+    # Placeholders for one tax_sessions row; casts so NULLs in VALUES have a type
+    _SESSION_ROW = "(%s::uuid, %s::varchar, %s::varchar, %s::numeric, %s::numeric, %s::numeric," \
+                   " %s::numeric, %s::numeric, %s::numeric, %s::timestamptz)"
+
+    def __init__(self, dsn: str):
+        try:
+            import psycopg
+        except ImportError as e:
+            raise RuntimeError("PERSIST_BACKEND=postgres requires the psycopg package") from e
+        self._psycopg = psycopg
+        self.dsn = dsn
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._psycopg.connect(self.dsn)
+        return self._conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        with conn.transaction(), conn.cursor() as cur:
+            yield cur
+
+    def timestamp(self, t: float):
+        return datetime.fromtimestamp(t, timezone.utc)
+
+    def upsert_sessions(self, cur, session_ids, rows):
+        ids = [session_id for session_id in session_ids if _UUID.fullmatch(session_id)]
+        if not ids:
+            return set(), set()
+        cur.execute("SELECT id::text FROM tax_sessions WHERE id = ANY(%s::uuid[])", (ids,))
+        known = {session_id for session_id, in cur.fetchall()}
+        rows = [row for row in rows if row[0] in known]
+        if not rows:
+            return known, set()
+        assignments = ", ".join(f"{column} = v.{column}" for column in SESSION_COLUMNS[1:])
+        cur.execute(
+            f"UPDATE tax_sessions AS t SET {assignments}"
+            f" FROM (VALUES {', '.join([self._SESSION_ROW] * len(rows))}) AS v({', '.join(SESSION_COLUMNS)})"
+            " WHERE t.id = v.id AND t.updated_at <= v.updated_at RETURNING t.id::text",
+            [value for row in rows for value in row],
+        )
+        return known, {session_id for session_id, in cur.fetchall()}
+
+    def delete(self, cur, table, session_ids, pending_only=False):
+        cur.execute(
+            f"DELETE FROM {table} WHERE session_id = ANY(%s::uuid[])"
+            + (" AND status = 'pending'" if pending_only else ""),
+            (session_ids,),
+        )
+
+    def resolved_reviews(self, cur, session_ids):
+        cur.execute(
+            "SELECT session_id::text, field_name FROM review_items"
+            " WHERE session_id = ANY(%s::uuid[]) AND status <> 'pending'",
+            (session_ids,),
+        )
+        return set(cur.fetchall())
+
+    def insert(self, cur, table, columns, rows):
+        if not rows:
+            return
+        with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+class WriteBehind:
+    """The per-process buffer of unwritten changes and the thread that writes them."""
+
+    def __init__(self, backend: PersistenceBackend, flush_interval: float = PERSIST_FLUSH_INTERVAL,
+                 batch_rows: int = PERSIST_BATCH_ROWS):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self._pending: dict[str, SessionChanges] = {}
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._written = threading.Condition(self._lock)
+        # Changes recorded, and the last of them that is in the database
+        self._recorded = 0
+        self._durable = 0
+        self._closed = False
+        self.rows_written = 0
+        self.batches = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="persist-writer", daemon=True)
+        self._thread.start()
+
+    def _changes(self, session_id: str) -> SessionChanges:
+        changes = self._pending.get(session_id)
+        if changes is None:
+            changes = self._pending[session_id] = SessionChanges()
+        return changes
+
+    def _recorded_rows(self, rows: int) -> None:
+        self._recorded += 1
+        self._pending_rows += rows
+        if self._pending_rows >= self.batch_rows:
+            self._wake.set()
+
+    def record_update(self, session_id: str, update: dict, state: Mapping) -> None:
+        """Record a node's update to a session; ``state`` is the state the node was given.
+
+        The state is kept by reference and only read at flush, for the fields
+        no update since has changed.
+        """
+        ledgers = {key: update[key] for key in LEDGER_TABLES if key in update}
+        now = time.time()
+        with self._lock:
+            changes = self._changes(session_id)
+            changes.update.update(update)
+            changes.state, changes.updated_at = state, now
+            changes.ledgers.update(ledgers)
+            self._recorded_rows(1 + sum(map(len, ledgers.values())))
+
+    def record_messages(self, session_id: str, messages: list[tuple[str, str, list | None]]) -> None:
+        """Record (role, content, cards) chat messages in order."""
+        # A microsecond apart, so created_at alone orders a turn's messages
+        now = time.time()
+        rows = [
+            (role, content, json.dumps(cards) if cards else None, now + i * 1e-6)
+            for i, (role, content, cards) in enumerate(messages)
+        ]
+        with self._lock:
+            self._changes(session_id).messages += rows
+            self._recorded_rows(len(rows))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything recorded so far is written; False on timeout."""
+        with self._lock:
+            target = self._recorded
+            self._wake.set()
+            return self._written.wait_for(lambda: self._durable >= target or self._closed, timeout)
+
+    def _take(self) -> tuple[dict[str, SessionChanges], int]:
+        with self._lock:
+            batch, self._pending, self._pending_rows = self._pending, {}, 0
+            return batch, self._recorded
+
+    def _restore(self, batch: dict[str, SessionChanges]) -> None:
+        """Put a failed batch back ahead of what was recorded since."""
+        with self._lock:
+            for session_id, newer in self._pending.items():
+                if session_id in batch:
+                    batch[session_id].absorb(newer)
+                else:
+                    batch[session_id] = newer
+            self._pending = batch
+            self._pending_rows = sum(changes.rows() for changes in batch.values())
+
+    def _write(self) -> bool:
+        batch, recorded = self._take()
+        if batch:
+            start = time.perf_counter()
+            for changes in batch.values():
+                changes.settle()
+            try:
+                written = self.backend.write(batch)
+            except Exception:
+                logger.exception("Write-behind flush of %d sessions failed; will retry", len(batch))
+                PERSIST_FLUSHES.inc(result="error")
+                self.errors += 1
+                self._restore(batch)
+                return False
+            PERSIST_FLUSH_DURATION.observe(time.perf_counter() - start)
+            PERSIST_FLUSHES.inc(result="ok")
+            for table, rows in written.items():
+                PERSIST_ROWS.inc(rows, table=table)
+            self.rows_written += sum(written.values())
+            self.batches += 1
+        with self._lock:
+            self._durable = recorded
+            self._written.notify_all()
+        return True
+
+    def _run(self) -> None:
+        delay = self.flush_interval
+        while not self._closed:
+            self._wake.wait(delay)
+            self._wake.clear()
+            delay = self.flush_interval if self._write() else min(PERSIST_RETRY_MAX, max(delay, 0.5) * 2)
+
+    def close(self, timeout: float = 10) -> None:
+        """Write what is left and stop the writer."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._written.notify_all()
+        self._wake.set()
+        self._thread.join(timeout)
+        self.backend.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "pending_sessions": len(self._pending),
+                "pending_rows": self._pending_rows,
+                "rows_written": self.rows_written,
+                "batches": self.batches,
+                "errors": self.errors,
+            }
+
+
+def create_backend(backend: str = PERSIST_BACKEND) -> PersistenceBackend | None:
+    """Build the backend selected by PERSIST_BACKEND, or None when persistence is off."""
+    if backend in ("", "off", "none"):
+        return None
+    if backend == "sqlite":
+        return SQLitePersistence(os.environ.get("PERSIST_PATH", "taxpilot.db"))
+    if backend == "postgres":
+        return PostgresPersistence(os.environ["DATABASE_URL"])
+    raise ValueError(f"Unknown PERSIST_BACKEND: {backend}")
+
+
+_writer: WriteBehind | None = None
+
+
+def start(backend: PersistenceBackend | None = None) -> WriteBehind | None:
+    """Start the process's writer for ``backend`` (default: PERSIST_BACKEND); written out at exit."""
+    global _writer
+    backend = backend or create_backend()
+    if backend is None:
+        return None
+    if _writer is not None:
+        _writer.close()
+    _writer = WriteBehind(backend)
+    atexit.register(_writer.close)
+    return _writer
+
+
+def writer() -> WriteBehind | None:
+    return _writer
+
+
+metrics.REGISTRY.add_collector(lambda: metrics.stats_gauges(
+    "taxpilot_persist", "backend", {_writer.backend.name: _writer.stats()},
+    ("pending_sessions", "pending_rows", "rows_written"),
+) if _writer is not None else [])
+
+
+def record_node(state: TaxPilotState, update: dict | None) -> None:
+    """Queue the changes one node made; a no-op while persistence is off."""
+    if _writer is None or not update:
+        return
+    _writer.record_update(state["session_id"], update, state)
+
+
+def record_turn(session_id: str, message: str, response: dict) -> None:
+    """Queue a turn's user message and the assistant's reply with its cards."""
+    if _writer is None:
+        return
+    _writer.record_messages(session_id, [
+        ("user", message, None),
+        ("assistant", response.get("message", ""), response.get("cards")),
+    ])
+
+
+def persist_node(fn: Callable) -> Callable:
+    """Wrap a node (sync or async) so its update is queued for write-behind."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, config=None):
+            update = await fn(state, config)
+            record_node(state, update)
+            return update
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, config=None):
+        update = fn(state, config)
+        record_node(state, update)
+        return update
+    return wrapper
@@ -0,0 +1,469 @@
+"""Circuit breakers, adaptive timeouts, hedging and retries for upstream calls.
+
+Every request to an upstream (``inference``, ``kb``) goes through that
+upstream's ``Resilience``:
+
+- Circuit breaker: once at least ``failure_threshold`` of the last ``window``
+  requests (and at least ``min_calls``) have failed, the breaker opens and
+  calls raise CircuitOpen at once, so callers go straight to their fallback
+  instead of waiting out a timeout. After ``open_seconds`` one probe request
+  is let through; its success closes the breaker, its failure reopens it.
+- Adaptive timeout: each attempt gets ``timeout_factor`` times the p99 of
+  recent successful latencies, clamped to [timeout_min, timeout_max]
+  (timeout_max is the upstream's HTTP timeout). A timed-out attempt counts as
+  a sample of its timeout, so the p99 climbs when the upstream slows down
+  rather than every call timing out.
+- Hedging (off by default): an attempt still running after the
+  ``hedge_quantile`` latency gets a duplicate, and the first reply wins.
+- Retries: transport errors, timeouts, 429 and 5xx responses are retried up
+  to ``retries`` times with full-jitter exponential backoff. Retries and hedges
+  draw on a budget that grows by ``retry_budget`` per call (plus
+  ``retry_min_per_s``), so an outage can't multiply the load on the upstream.
+
+Only those failures count against the breaker; a 4xx means the request was
+bad, not the upstream. Each setting can be overridden per upstream as
+``RESILIENCE_<UPSTREAM>_<SETTING>``, e.g. RESILIENCE_KB_RETRIES=0 or
+RESILIENCE_INFERENCE_HEDGE=true. Streamed completions get the breaker only:
+tokens already sent can't be retried or hedged.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, replace
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+import httpx
+
+import metrics
+from http_clients import UPSTREAMS
+
+T = TypeVar("T")
+
+HEDGE_WORKERS = int(os.environ.get("RESILIENCE_HEDGE_WORKERS", 64))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.REGISTRY.register(metrics.Gauge(
+    "taxpilot_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ("upstream",)))
+BREAKER_TRANSITIONS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_circuit_transitions_total", "Circuit breaker state changes, by the state entered",
+    ("upstream", "state")))
+BREAKER_REJECTED = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_circuit_rejected_total", "Upstream calls failed fast by an open circuit breaker", ("upstream",)))
+TIMEOUTS = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_upstream_timeouts_total", "Upstream attempts cut off by their timeout", ("upstream",)))
+RETRIES = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_upstream_retries_total", "Upstream retries, or retries refused by the retry budget",
+    ("upstream", "result")))
+HEDGES = metrics.REGISTRY.register(metrics.Counter(
+    "taxpilot_upstream_hedges_total", "Hedged upstream calls, by the attempt that answered first",
+    ("upstream", "winner")))
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, upstream: str):
+        super().__init__(f"Circuit breaker for {upstream} is open")
+        self.upstream = upstream
+
+
+def is_failure(error: BaseException) -> bool:
+    """Whether an error says the upstream is unhealthy (and is worth retrying)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, httpx.TransportError)
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    timeout_min: float
+    timeout_max: float
+    retries: int
+    breaker: bool = True
+    failure_threshold: float = 0.5
+    min_calls: int = 10
+    window: int = 20
+    open_seconds: float = 5.0
+    adaptive_timeout: bool = True
+    timeout_factor: float = 3.0
+    retry_budget: float = 0.1
+    retry_min_per_s: float = 1.0
+    backoff: float = 0.05
+    backoff_max: float = 1.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "Policy":
+        """The policy with RESILIENCE_<NAME>_<FIELD> overrides applied."""
+        policy = cls(name=name, **defaults)
+        prefix = f"RESILIENCE_{name.upper()}_"
+        overrides = {}
+        for f in fields(cls):
+            raw = os.environ.get(prefix + f.name.upper())
+            if raw is None or f.name == "name":
+                continue
+            default = getattr(policy, f.name)
+            if isinstance(default, bool):
+                overrides[f.name] = raw.lower() in ("1", "true", "yes")
+            else:
+                overrides[f.name] = type(default)(raw)
+        return replace(policy, **overrides)
+
+
+class CircuitBreaker:
+    """Failure-rate breaker over the last ``window`` requests."""
+
+    def __init__(self, name: str, failure_threshold: float, min_calls: int, window: int,
+                 open_seconds: float, enabled: bool = True, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.enabled = enabled
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        BREAKER_STATE.set(0, upstream=name)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _enter(self, state: str) -> None:
+        # Caller holds the lock
+        self._state = state
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self.opened += 1
+        self._outcomes.clear()
+        self._failures = 0
+        self._probing = False
+        BREAKER_STATE.set(_STATE_VALUES[state], upstream=self.name)
+        BREAKER_TRANSITIONS.inc(upstream=self.name, state=state)
+
+    def check(self) -> None:
+        """Raise CircuitOpen while the breaker is open and not yet due for a probe."""
+        if self._state == OPEN and self._clock() - self._opened_at < self.open_seconds:
+            BREAKER_REJECTED.inc(upstream=self.name)
+            raise CircuitOpen(self.name)
+
+    def allow(self) -> None:
+        """Admit one request or raise CircuitOpen; every admitted request must be recorded."""
+        if not self.enabled or self._state == CLOSED:
+            return
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+                self._enter(HALF_OPEN)
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            if self._state == CLOSED:
+                return
+        BREAKER_REJECTED.inc(upstream=self.name)
+        raise CircuitOpen(self.name)
+
+    def record(self, ok: bool | None) -> None:
+        """Outcome of an admitted request; None when it was abandoned without one."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if ok is None:
+                    self._probing = False
+                else:
+                    self._enter(CLOSED if ok else OPEN)
+                return
+            if self._state == OPEN or ok is None:
+                return
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= not self._outcomes[0]
+            self._outcomes.append(ok)
+            self._failures += not ok
+            if len(self._outcomes) >= self.min_calls and self._failures >= self.failure_threshold * len(self._outcomes):
+                self._enter(OPEN)
+
+
+class LatencyWindow:
+    """Recent latencies; quantiles are re-sorted every few samples, not per call."""
+
+    def __init__(self, size: int = 256, min_samples: int = 20, resort_every: int = 16):
+        self.min_samples = min_samples
+        self.resort_every = resort_every
+        self._samples: deque[float] = deque(maxlen=size)
+        self._sorted: list[float] = []
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._stale += 1
+
+    def quantile(self, q: float) -> float | None:
+        """None until there are min_samples samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._stale >= self.resort_every or not self._sorted:
+                self._sorted = sorted(self._samples)
+                self._stale = 0
+            ordered = self._sorted
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RetryBudget:
+    """Tokens for retries and hedges: ``ratio`` per call plus ``min_per_s``, capped."""
+
+    def __init__(self, ratio: float, min_per_s: float, cap: float = 10.0):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.cap = max(cap, 1.0)
+        self.tokens = self.cap
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.cap, self.tokens + (now - self.updated) * self.min_per_s)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+    return _executor
+
+
+class Resilience:
+    """One upstream's breaker, latency window and retry budget.
+
+    ``call`` and ``acall`` take a function of the attempt's timeout in seconds,
+    which makes the request and raises on failure.
+    """
+
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self.name = policy.name
+        self.breaker = CircuitBreaker(policy.name, policy.failure_threshold, policy.min_calls, policy.window,
+                                      policy.open_seconds, enabled=policy.breaker)
+        self.latency = LatencyWindow()
+        self.budget = RetryBudget(policy.retry_budget, policy.retry_min_per_s)
+
+    def check(self) -> None:
+        self.breaker.check()
+
+    def timeout(self) -> float:
+        p = self.policy
+        p99 = self.latency.quantile(0.99) if p.adaptive_timeout else None
+        if p99 is None:
+            return p.timeout_max
+        return min(p.timeout_max, max(p.timeout_min, p99 * p.timeout_factor))
+
+    def _hedge_delay(self) -> float | None:
+        if not self.policy.hedge or self.breaker.state != CLOSED:
+            return None
+        return self.latency.quantile(self.policy.hedge_quantile)
+
+    def _backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.policy.backoff_max, self.policy.backoff * 2 ** retry))
+
+    def _retry(self, error: Exception, retry: int) -> bool:
+        """Whether to retry after ``error``; ``retry`` counts retries already made."""
+        if isinstance(error, CircuitOpen) or not is_failure(error) or retry >= self.policy.retries:
+            return False
+        if not self.budget.withdraw():
+            RETRIES.inc(upstream=self.name, result="budget_exhausted")
+            return False
+        RETRIES.inc(upstream=self.name, result="retried")
+        return True
+
+    def _finish(self, start: float, timeout: float, error: BaseException | None) -> None:
+        if error is None:
+            self.latency.record(time.perf_counter() - start)
+            self.breaker.record(True)
+        elif isinstance(error, Exception):
+            if isinstance(error, httpx.TimeoutException):
+                TIMEOUTS.inc(upstream=self.name)
+                self.latency.record(timeout)
+            self.breaker.record(not is_failure(error))
+        else:
+            self.breaker.record(None)
+
+    # Sync
+
+    def _attempt(self, attempt: Callable[[float], T]) -> T:
+        self.breaker.allow()
+        timeout = self.timeout()
+        start = time.perf_counter()
+        try:
+            result = attempt(timeout)
+        except BaseException as e:
+            self._finish(start, timeout, e)
+            raise
+        self._finish(start, timeout, None)
+        return result
+
+    def _hedged(self, attempt: Callable[[float], T], delay: float) -> T:
+        # The losing request can't be interrupted; it finishes on its worker thread
+        executor = _get_executor()
+        primary = executor.submit(contextvars.copy_context().run, self._attempt, attempt)
+        done, _ = wait_futures([primary], timeout=delay)
+        if done or not self.budget.withdraw():
+            return primary.result()
+        hedge = executor.submit(contextvars.copy_context().run, self._attempt, attempt)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait_futures(pending, return_when=FIRST_COMPLETED)
+            answered = [future for future in done if future.exception() is None]
+            if answered or not pending:
+                winner = (answered or list(done))[0]
+                HEDGES.inc(upstream=self.name, winner="hedge" if winner is hedge else "primary")
+                return winner.result()
+
+    def call(self, attempt: Callable[[float], T]) -> T:
+        self.budget.deposit()
+        retry = 0
+        while True:
+            delay = self._hedge_delay()
+            try:
+                return self._attempt(attempt) if delay is None else self._hedged(attempt, delay)
+            except Exception as e:
+                if not self._retry(e, retry):
+                    raise
+            time.sleep(self._backoff(retry))
+            retry += 1
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Breaker only, for streamed responses."""
+        self.breaker.allow()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self._finish(start, self.policy.timeout_max, e)
+            raise
+        self._finish(start, self.policy.timeout_max, None)
+
+    # Async
+
+    async def _aattempt(self, attempt: Callable[[float], Awaitable[T]]) -> T:
+        self.breaker.allow()
+        timeout = self.timeout()
+        start = time.perf_counter()
+        try:
+            result = await attempt(timeout)
+        except BaseException as e:
+            self._finish(start, timeout, e)
+            raise
+        self._finish(start, timeout, None)
+        return result
+
+    async def _ahedged(self, attempt: Callable[[float], Awaitable[T]], delay: float) -> T:
+        primary = asyncio.ensure_future(self._aattempt(attempt))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done or not self.budget.withdraw():
+                return await primary
+            hedge = asyncio.ensure_future(self._aattempt(attempt))
+            pending = {primary, hedge}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                answered = [task for task in done if task.exception() is None]
+                if answered or not pending:
+                    winner = (answered or list(done))[0]
+                    HEDGES.inc(upstream=self.name, winner="hedge" if winner is hedge else "primary")
+                    return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, attempt: Callable[[float], Awaitable[T]]) -> T:
+        self.budget.deposit()
+        retry = 0
+        while True:
+            delay = self._hedge_delay()
+            try:
+                return await (self._aattempt(attempt) if delay is None else self._ahedged(attempt, delay))
+            except Exception as e:
+                if not self._retry(e, retry):
+                    raise
+            await asyncio.sleep(self._backoff(retry))
+            retry += 1
+
+    def stats(self) -> dict:
+        p99 = self.latency.quantile(0.99)
+        return {
+            "timeout_seconds": self.timeout(),
+            "p99_seconds": p99 or 0.0,
+            "opened": self.breaker.opened,
+            "retry_tokens": self.budget.tokens,
+        }
+
+
+DEFAULTS: dict[str, dict] = {
+    "inference": {"timeout_min": 2.0, "timeout_max": UPSTREAMS["inference"].timeout, "retries": 1},
+    "kb": {"timeout_min": 0.5, "timeout_max": UPSTREAMS["kb"].timeout, "retries": 2},
+}
+
+_upstreams: dict[str, Resilience] = {}
+_lock = threading.Lock()
+
+
+def get(name: str) -> Resilience:
+    """The upstream's Resilience, configured from DEFAULTS and the environment on first use."""
+    resilience = _upstreams.get(name)
+    if resilience is None:
+        with _lock:
+            if name not in _upstreams:
+                _upstreams[name] = Resilience(Policy.from_env(name, **DEFAULTS[name]))
+            resilience = _upstreams[name]
+    return resilience
+
+
+def configure(name: str, **overrides) -> Resilience:
+    """Replace the upstream's Resilience with a fresh one using these policy overrides."""
+    resilience = Resilience(replace(Policy.from_env(name, **DEFAULTS[name]), **overrides))
+    with _lock:
+        _upstreams[name] = resilience
+    return resilience
+
+
+metrics.REGISTRY.add_collector(lambda: metrics.stats_gauges(
+    "taxpilot_resilience", "upstream", {name: r.stats() for name, r in list(_upstreams.items())},
+    ("timeout_seconds", "p99_seconds", "retry_tokens"),
+))
@@ -0,0 +1,253 @@
+"""JSON for responses, binary snapshots of session state, and scatter-gather socket writes.
+
+``dumps`` encodes response bodies, cards and SSE payloads straight to UTF-8
+bytes. orjson is used when installed. Otherwise one shared stdlib encoder is
+used, with compact separators and no circular-reference check. Ledger items
+(state.py's slotted dataclasses) and pydantic models are encoded as objects,
+and numpy scalars as numbers.
+
+``encode_snapshot`` stores a TaxPilotState in a versioned binary format:
+
+    b"TP" | schema version (1 byte) | codec (1 byte) | body
+
+The body is the state's fields, except the per-turn TRANSIENT_FIELDS, in the
+version's order (SNAPSHOT_SCHEMAS),
+after a bitmask of which are present. Each ledger item is an array of its
+field values, with trailing fields left at their default dropped. Field
+names are written once per schema rather than once per item and session.
+The body is msgpack (ormsgpack or msgpack) when either is installed, else
+JSON. It is zlib-compressed when longer than SNAPSHOT_COMPRESS_MIN bytes,
+since responses repeat across node_memo. A new state field means a new
+schema version; snapshots of older versions still decode.
+
+``send_buffers`` writes a response's head and body with one sendmsg instead
+of concatenating them first, once the body is large enough (SENDMSG_MIN_BYTES)
+for the copy to cost more than the scatter-gather.
+"""
+
+import os
+import json
+import zlib
+import socket
+import importlib.util
+from dataclasses import MISSING, fields, is_dataclass
+from typing import Any, Sequence
+
+from state import TaxPilotState, IncomeItem, DeductionItem, ReviewFlag, TRANSIENT_FIELDS, item_dict
+
+SNAPSHOT_COMPRESS_MIN = int(os.environ.get("SNAPSHOT_COMPRESS_MIN", 256))
+SNAPSHOT_ZLIB_LEVEL = int(os.environ.get("SNAPSHOT_ZLIB_LEVEL", 6))
+# Below this, joining a response's buffers costs less than sendmsg's scatter-gather setup
+SENDMSG_MIN_BYTES = int(os.environ.get("SENDMSG_MIN_BYTES", 32 * 1024))
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+MSGPACK_MODULE = next((name for name in ("ormsgpack", "msgpack") if importlib.util.find_spec(name)), None)
+
+MAGIC = b"TP"
+SNAPSHOT_VERSION = 1
+
+# Codec byte: body encoding, plus COMPRESSED when zlib-compressed
+CODEC_JSON = 1
+CODEC_MSGPACK = 2
+COMPRESSED = 0x80
+
+# Per schema version: state fields in body order, and the item class and
+# field order of each ledger field
+SNAPSHOT_SCHEMAS: dict[int, tuple[tuple[str, ...], dict[str, tuple[type, tuple[str, ...]]]]] = {
+    1: (
+        (
+            "session_id", "user_message", "name", "filing_status", "state", "dependents",
+            "income_items", "total_income", "deductions", "standard_deduction", "itemized_total",
+            "use_standard", "taxable_income", "federal_tax", "credits", "total_withheld",
+            "estimated_refund", "confidence_score", "review_flags", "needs_review",
+            "current_node", "response", "completed", "node_memo",
+        ),
+        {
+            "income_items": (IncomeItem, ("source", "type", "amount", "employer_name", "federal_withheld",
+                                          "state_withheld")),
+            "deductions": (DeductionItem, ("category", "description", "amount", "confidence", "irs_reference",
+                                           "is_itemized", "ai_suggested")),
+            "review_flags": (ReviewFlag, ("field_name", "field_value", "reason", "confidence")),
+        },
+    ),
+}
+
+
+# JSON
+
+def _default(obj: Any) -> Any:
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return item_dict(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "item"):
+        return obj.item()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> bytes:
+        """UTF-8 JSON of ``obj``."""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, check_circular=False, default=_default)
+
+    def dumps(obj: Any) -> bytes:
+        """UTF-8 JSON of ``obj``."""
+        return _encoder.encode(obj).encode()
+
+    loads = json.loads
+
+
+# Snapshots
+
+if MSGPACK_MODULE == "ormsgpack":
+    import ormsgpack
+
+    _pack, _unpack = ormsgpack.packb, ormsgpack.unpackb
+elif MSGPACK_MODULE == "msgpack":
+    import msgpack
+
+    _pack = lambda body: msgpack.packb(body, use_bin_type=True)
+    _unpack = lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+class _Ledger:
+    """How one schema version lays out a ledger field's items."""
+
+    __slots__ = ("cls", "names", "required", "defaults", "positional", "known")
+
+    def __init__(self, cls: type, names: tuple[str, ...]):
+        declared = {f.name: f for f in fields(cls)}
+        self.cls = cls
+        self.names = names
+        # Fields from ``required`` on have defaults and are dropped from the end of a row while at them
+        self.required = len(names)
+        while self.required and _has_default(declared.get(names[self.required - 1])):
+            self.required -= 1
+        self.defaults = tuple(declared[name].default for name in names[self.required:])
+        # Rows of older versions are passed by keyword if the class's fields have moved since
+        self.positional = names == tuple(declared)[:len(names)]
+        self.known = frozenset(declared)
+
+    def row(self, item) -> list:
+        row = [getattr(item, name) for name in self.names]
+        while len(row) > self.required and row[-1] == self.defaults[len(row) - 1 - self.required]:
+            row.pop()
+        return row
+
+    def item(self, row: list):
+        if self.positional:
+            return self.cls(*row)
+        return self.cls(**{name: value for name, value in zip(self.names, row) if name in self.known})
+
+
+def _has_default(f) -> bool:
+    return f is not None and f.default is not MISSING
+
+
+_LAYOUTS = {
+    version: (names, {name: _Ledger(cls, item_names) for name, (cls, item_names) in ledgers.items()})
+    for version, (names, ledgers) in SNAPSHOT_SCHEMAS.items()
+}
+
+
+def _schema(version: int) -> tuple[tuple[str, ...], dict[str, _Ledger]]:
+    layout = _LAYOUTS.get(version)
+    if layout is None:
+        raise ValueError(f"Unknown snapshot schema version: {version}")
+    return layout
+
+
+_unsaved = set(TaxPilotState.__annotations__) - TRANSIENT_FIELDS - set(SNAPSHOT_SCHEMAS[SNAPSHOT_VERSION][0])
+if _unsaved:
+    raise RuntimeError(f"State fields missing from snapshot schema {SNAPSHOT_VERSION}: {sorted(_unsaved)}; "
+                       "add them in a new schema version")
+
+
+def encode_snapshot(state: TaxPilotState, version: int = SNAPSHOT_VERSION) -> bytes:
+    """The state's durable fields as a versioned binary snapshot."""
+    names, ledgers = _schema(version)
+    present = 0
+    values = [0]
+    for i, name in enumerate(names):
+        if name not in state:
+            continue
+        present |= 1 << i
+        value = state[name]
+        ledger = ledgers.get(name)
+        if ledger is not None:
+            value = [ledger.row(item) for item in value]
+        values.append(value)
+    values[0] = present
+
+    if MSGPACK_MODULE:
+        codec, body = CODEC_MSGPACK, _pack(values)
+    else:
+        codec, body = CODEC_JSON, dumps(values)
+    if len(body) > SNAPSHOT_COMPRESS_MIN:
+        codec, body = codec | COMPRESSED, zlib.compress(body, SNAPSHOT_ZLIB_LEVEL)
+    return MAGIC + bytes((version, codec)) + body
+
+
+def decode_snapshot(blob: bytes) -> TaxPilotState:
+    """Inverse of encode_snapshot, for any schema version still in SNAPSHOT_SCHEMAS."""
+    if blob[:2] != MAGIC:
+        raise ValueError("Not a state snapshot")
+    version, codec = blob[2], blob[3]
+    names, ledgers = _schema(version)
+    body = memoryview(blob)[4:]
+    if codec & COMPRESSED:
+        body = zlib.decompress(body)
+    codec &= ~COMPRESSED
+    if codec == CODEC_MSGPACK:
+        if not MSGPACK_MODULE:
+            raise RuntimeError("Decoding this snapshot requires ormsgpack or msgpack")
+        values = _unpack(bytes(body))
+    elif codec == CODEC_JSON:
+        values = loads(bytes(body))
+    else:
+        raise ValueError(f"Unknown snapshot codec: {codec}")
+
+    present, values = values[0], iter(values[1:])
+    state = {}
+    for i, name in enumerate(names):
+        if not present >> i & 1:
+            continue
+        value = next(values)
+        ledger = ledgers.get(name)
+        if ledger is not None:
+            value = [ledger.item(row) for row in value]
+        state[name] = value
+    return state
+
+
+# Sockets
+
+def send_buffers(sock: socket.socket, buffers: Sequence[bytes]) -> None:
+    """Send the buffers in order: large ones with sendmsg, resuming partial sends
+    through memoryviews rather than copies; small ones joined into one send."""
+    total = sum(map(len, buffers))
+    if total < SENDMSG_MIN_BYTES:
+        sock.sendall(b"".join(buffers))
+        return
+    sent = sock.sendmsg(buffers)
+    if sent == total:
+        return
+    views = [memoryview(buffer) for buffer in buffers]
+    while views:
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+        if views:
+            sent = sock.sendmsg(views)
@@ -0,0 +1,261 @@
+"""Pluggable session store for agent conversation state.
+
+SESSION_STORE selects the backend:
+
+- ``memory`` (default): in-process LRU with idle-TTL eviction and a memory cap
+- ``sqlite``: a local SQLite file in WAL mode (SESSION_STORE_PATH)
+- ``postgres``: the ``agent_sessions`` table in sql/schema.sql (DATABASE_URL)
+
+States are stored as binary snapshots (serialization.py), so every backend
+reports its footprint in serialized bytes.
+"""
+
+import os
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from state import TaxPilotState
+from serialization import encode_snapshot, decode_snapshot
+
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 7 * 24 * 3600))
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", 100_000))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", 256 * 1024 * 1024))
+
+
+def encode_state(state: TaxPilotState) -> bytes:
+    return encode_snapshot(state)
+
+
+def decode_state(blob: bytes) -> TaxPilotState:
+    return decode_snapshot(blob)
+
+
+class SessionStore(ABC):
+    """Interface shared by all backends."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> TaxPilotState | None: ...
+
+    @abstractmethod
+    def put(self, session_id: str, state: TaxPilotState) -> None: ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None: ...
+
+    @abstractmethod
+    def stats(self) -> dict: ...
+
+
+class MemorySessionStore(SessionStore):
+    """LRU of encoded states with idle-TTL, entry-count and byte caps."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.evictions = {"lru": 0, "ttl": 0, "memory": 0}
+
+    def _remove(self, session_id: str) -> None:
+        _, blob = self._data.pop(session_id)
+        self._bytes -= len(blob)
+
+    def _expire(self, now: float) -> None:
+        # Oldest entries first; stop at the first one still live
+        while self._data:
+            session_id, (touched, _) = next(iter(self._data.items()))
+            if now - touched < self.ttl:
+                break
+            self._remove(session_id)
+            self.evictions["ttl"] += 1
+
+    def get(self, session_id: str) -> TaxPilotState | None:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            self._data[session_id] = (now, entry[1])
+            self._data.move_to_end(session_id)
+            blob = entry[1]
+        return decode_state(blob)
+
+    def put(self, session_id: str, state: TaxPilotState) -> None:
+        blob = encode_state(state)
+        with self._lock:
+            if session_id in self._data:
+                self._remove(session_id)
+            self._data[session_id] = (time.monotonic(), blob)
+            self._bytes += len(blob)
+            self.puts += 1
+            while len(self._data) > self.max_entries:
+                self._remove(next(iter(self._data)))
+                self.evictions["lru"] += 1
+            while self._bytes > self.max_bytes and len(self._data) > 1:
+                self._remove(next(iter(self._data)))
+                self.evictions["memory"] += 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._data:
+                self._remove(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            evicted = sum(self.evictions.values())
+            return {
+                "backend": "memory",
+                "sessions": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self.evictions),
+                "eviction_rate": evicted / self.puts if self.puts else 0.0,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a local SQLite database (WAL), shareable between processes."""
+
+    # Purge idle sessions on every Nth put
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL):
+        import sqlite3
+
+        self._sqlite3 = sqlite3
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._puts = 0
+        self.evictions = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS agent_sessions ("
+                " session_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_sessions_updated ON agent_sessions(updated_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> TaxPilotState | None:
+        row = self._conn().execute(
+            "SELECT state FROM agent_sessions WHERE session_id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl),
+        ).fetchone()
+        return decode_state(row[0]) if row else None
+
+    def put(self, session_id: str, state: TaxPilotState) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO agent_sessions (session_id, state, updated_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (session_id, encode_state(state), time.time()),
+        )
+        self._puts += 1
+        if self._puts % self.PURGE_EVERY == 0:
+            cursor = conn.execute("DELETE FROM agent_sessions WHERE updated_at <= ?", (time.time() - self.ttl,))
+            self.evictions += cursor.rowcount
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM agent_sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        count, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM agent_sessions"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": count,
+            "bytes": size,
+            "evictions": {"ttl": self.evictions},
+            "eviction_rate": self.evictions / self._puts if self._puts else 0.0,
+        }
+
+
+class PostgresSessionStore(SessionStore):
+    """Sessions in the agent_sessions table next to tax_sessions. Needs psycopg."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, dsn: str, ttl: float = SESSION_TTL):
+        try:
+            import psycopg
+        except ImportError as e:
+            raise RuntimeError("SESSION_STORE=postgres requires the psycopg package") from e
+        self._psycopg = psycopg
+        self.dsn = dsn
+        self.ttl = ttl
+        self._local = threading.local()
+        self._puts = 0
+        self.evictions = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self._psycopg.connect(self.dsn, autocommit=True)
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> TaxPilotState | None:
+        row = self._conn().execute(
+            "SELECT state FROM agent_sessions WHERE session_id = %s"
+            " AND updated_at > NOW() - make_interval(secs => %s)",
+            (session_id, self.ttl),
+        ).fetchone()
+        return decode_state(bytes(row[0])) if row else None
+
+    def put(self, session_id: str, state: TaxPilotState) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO agent_sessions (session_id, state, updated_at) VALUES (%s, %s, NOW())"
+            " ON CONFLICT (session_id) DO UPDATE SET state = EXCLUDED.state, updated_at = NOW()",
+            (session_id, encode_state(state)),
+        )
+        self._puts += 1
+        if self._puts % self.PURGE_EVERY == 0:
+            cursor = conn.execute(
+                "DELETE FROM agent_sessions WHERE updated_at <= NOW() - make_interval(secs => %s)",
+                (self.ttl,),
+            )
+            self.evictions += cursor.rowcount
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM agent_sessions WHERE session_id = %s", (session_id,))
+
+    def stats(self) -> dict:
+        count, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(octet_length(state)), 0) FROM agent_sessions"
+        ).fetchone()
+        return {
+            "backend": "postgres",
+            "sessions": count,
+            "bytes": int(size),
+            "evictions": {"ttl": self.evictions},
+            "eviction_rate": self.evictions / self._puts if self._puts else 0.0,
+        }
+
+
+def create_session_store() -> SessionStore:
+    """Build the backend selected by SESSION_STORE."""
+    backend = os.environ.get("SESSION_STORE", "memory")
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.environ.get("SESSION_STORE_PATH", "sessions.db"))
+    if backend == "postgres":
+        return PostgresSessionStore(os.environ["DATABASE_URL"])
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
@@ -0,0 +1,89 @@
+"""Cold start: warm-up before the port is bound, and readiness.
+
+After a scale-to-zero cold start, the first request would otherwise pay for
+everything the process loads on first use:
+
+- httpcore and a TLS context for the inference client (~100 ms)
+- the compiled graph's first run, with langgraph's own deferred imports
+- the tax tables and the KB index
+
+main.py runs ``warm_up`` over those phases before it binds its port
+(AGENT_WARMUP, on by default), so the first request is served at steady-state
+latency. With AGENT_WARMUP=false each is loaded by the first request that
+needs it. Modules only a few turns need stay out of both: numpy, for review's
+what-if pricing, is imported by the first return that reaches review.
+
+/health is liveness: the process is up. /ready is readiness: warm-up has
+finished and the server is not draining, and it answers 503 otherwise, so a
+platform routing on it sends no turn to a worker that is starting or
+shutting down.
+
+Each phase's duration is on /metrics as taxpilot_startup_seconds{phase}.
+``import`` covers interpreter start-up and imports, up to warm-up.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable
+
+import metrics
+
+WARMUP = os.environ.get("AGENT_WARMUP", "true").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = metrics.REGISTRY.register(metrics.Gauge(
+    "taxpilot_startup_seconds", "Start-up time by phase", ("phase",)))
+READY = metrics.REGISTRY.register(metrics.Gauge(
+    "taxpilot_ready", "1 once warm-up has finished, 0 while starting or draining"))
+
+_ready = threading.Event()
+
+
+def process_age() -> float | None:
+    """Seconds since this process started, from /proc; None where that is unavailable."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesized command name; starttime is the 22nd field
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+def warm_up(phases: dict[str, Callable[[], object]]) -> dict[str, float]:
+    """Run each phase in order and record its duration; seconds by phase.
+
+    A failing phase is logged and skipped: whatever it would have loaded is
+    loaded by the first request instead.
+    """
+    age = process_age()
+    durations = {} if age is None else {"import": age}
+    for phase, fn in phases.items():
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            logger.exception("Warm-up phase %s failed", phase)
+        durations[phase] = time.perf_counter() - start
+    for phase, seconds in durations.items():
+        STARTUP_SECONDS.set(seconds, phase=phase)
+    logger.info("Start-up: %s", ", ".join(f"{phase} {1000 * s:.0f} ms" for phase, s in durations.items()))
+    return durations
+
+
+def set_ready(ready: bool) -> None:
+    """Mark the process ready for turns (after warm-up) or not (draining)."""
+    if ready:
+        _ready.set()
+    else:
+        _ready.clear()
+    READY.set(1 if ready else 0)
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
@@ -1,19 +1,42 @@
-"""LangGraph state definition for TaxPilot agent."""
+"""LangGraph state definition for TaxPilot agent.
 
-from typing import TypedDict, Optional, Literal
-from pydantic import BaseModel
+Ledger items are slotted dataclasses rather than pydantic models: sessions
+hold many of them, and nodes return only the fields they change, so the
+state dict itself is never copied between nodes. They still check what
+pydantic used to: amounts are coerced to float and income types must be one
+of IncomeType, so records from batch files fail on construction rather than
+mid-computation. Cards are not stored;
+cards.render_cards derives them from the state when a response is built.
+"""
 
+import operator
+from dataclasses import dataclass, fields
+from typing import Annotated, TypedDict, Optional, Literal, get_args
 
-class IncomeItem(BaseModel):
+IncomeType = Literal["w2", "1099", "self_employment", "investment", "rental", "other"]
+INCOME_TYPES: frozenset[str] = frozenset(get_args(IncomeType))
+
+
+# Keyword-only, like the pydantic model it replaced, so amount can follow employer_name
+@dataclass(slots=True, kw_only=True)
+class IncomeItem:
     source: str
-    type: Literal["w2", "1099", "self_employment", "investment", "rental", "other"]
+    type: IncomeType
     employer_name: Optional[str] = None
     amount: float
     federal_withheld: float = 0
     state_withheld: float = 0
 
+    def __post_init__(self):
+        if self.type not in INCOME_TYPES:
+            raise ValueError(f"Unknown income type: {self.type!r}")
+        self.amount = float(self.amount)
+        self.federal_withheld = float(self.federal_withheld)
+        self.state_withheld = float(self.state_withheld)
+
 
-class DeductionItem(BaseModel):
+@dataclass(slots=True)
+class DeductionItem:
     category: str
     description: str
     amount: float
@@ -22,14 +45,37 @@ class DeductionItem(BaseModel):
     is_itemized: bool = False
     ai_suggested: bool = False
 
+    def __post_init__(self):
+        self.amount = float(self.amount)
+        self.confidence = float(self.confidence)
 
-class ReviewFlag(BaseModel):
+
+@dataclass(slots=True)
+class ReviewFlag:
     field_name: str
     field_value: str
     reason: str
     confidence: float
 
 
+# Per-turn fields, reset when the next turn starts and never stored
+TRANSIENT_FIELDS = frozenset({"node_trace", "prefetch"})
+
+
+def merge_dicts(current: dict, update: dict) -> dict:
+    """Reducer for dict fields that several nodes add keys to."""
+    return {**current, **update}
+
+
+def item_dict(item, exclude_defaults: bool = False) -> dict:
+    """Plain dict of a ledger item, optionally without fields left at their default."""
+    return {
+        f.name: getattr(item, f.name)
+        for f in fields(item)
+        if not exclude_defaults or getattr(item, f.name) != f.default
+    }
+
+
 class TaxPilotState(TypedDict):
     """State shared across all LangGraph nodes."""
 
@@ -68,5 +114,44 @@ class TaxPilotState(TypedDict):
     # Flow control
     current_node: str
     response: str
-    cards: list[dict]
     completed: bool
+
+    # Incremental recomputation (incremental.py): per-node input fingerprint
+    # and replayed outputs, and which nodes ran or were skipped this turn
+    node_memo: Annotated[dict[str, dict], merge_dicts]
+    node_trace: Annotated[list[dict], operator.add]
+
+    # This turn's KB lookups made ahead of the deduction node (nodes/retrieval.py)
+    prefetch: dict[str, str]
+
+
+def new_session_state(session_id: str, message: str) -> TaxPilotState:
+    """Initial state for a session's first turn."""
+    return {
+        "session_id": session_id,
+        "user_message": message,
+        "name": None,
+        "filing_status": None,
+        "state": None,
+        "dependents": 0,
+        "income_items": [],
+        "total_income": 0,
+        "deductions": [],
+        "standard_deduction": 0,
+        "itemized_total": 0,
+        "use_standard": True,
+        "taxable_income": 0,
+        "federal_tax": 0,
+        "credits": 0,
+        "total_withheld": 0,
+        "estimated_refund": 0,
+        "confidence_score": 0,
+        "review_flags": [],
+        "needs_review": False,
+        "current_node": "intake",
+        "response": "",
+        "completed": False,
+        "node_memo": {},
+        "node_trace": [],
+        "prefetch": {},
+    }
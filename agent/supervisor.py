@@ -0,0 +1,236 @@
+"""Multi-process agent server: a supervisor running N workers on one port.
+
+AGENT_WORKERS > 1 makes ``python main.py`` start a supervisor instead of a
+server. The supervisor runs that many worker processes, each a normal
+threaded or async agent server (AGENT_SERVER_MODE).
+
+By default the supervisor binds the port once and every worker accepts from
+that shared socket. The socket outlives any worker, so reloads drop no
+connections. With AGENT_REUSE_PORT=true, each worker instead binds its own
+SO_REUSEPORT socket and the kernel hashes connections across them. That
+spreads load more evenly, but connections still queued on a draining
+worker's socket are reset when it closes, which the threaded server is
+prone to under load.
+
+Signals to the supervisor:
+
+- SIGHUP: graceful reload. A new generation of workers starts from a fresh
+  interpreter, so it picks up new code and config. Once all of them are
+  listening, the old workers drain. If the new generation fails to start,
+  it is killed and the old one keeps serving.
+- SIGTERM / SIGINT: every worker drains, and the supervisor exits.
+
+A draining worker stops accepting, finishes in-flight turns for up to
+AGENT_DRAIN_TIMEOUT seconds and exits. Workers that die are restarted, with
+backoff if they keep crashing on start-up.
+
+Any worker may serve any turn, so sessions must live in a shared backend.
+SESSION_STORE defaults to sqlite in this mode, and memory is refused. Each
+worker keeps its own /metrics.
+"""
+
+import os
+import sys
+import time
+import select
+import signal
+import socket
+import logging
+import subprocess
+from dataclasses import dataclass, field
+
+WORKERS = int(os.environ.get("AGENT_WORKERS", 1))
+REUSE_PORT = (os.environ.get("AGENT_REUSE_PORT", "false").lower() in ("1", "true", "yes")
+              and hasattr(socket, "SO_REUSEPORT"))
+DRAIN_TIMEOUT = float(os.environ.get("AGENT_DRAIN_TIMEOUT", 30))
+START_TIMEOUT = float(os.environ.get("AGENT_WORKER_START_TIMEOUT", 60))
+
+# Set by the supervisor in each worker's environment
+WORKER_ID_ENV = "AGENT_WORKER_ID"
+LISTEN_FD_ENV = "AGENT_LISTEN_FD"
+READY_FD_ENV = "AGENT_READY_FD"
+
+# Restart backoff for workers that die soon after starting
+_CRASH_WINDOW = 5.0
+_MAX_BACKOFF = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def listen_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def is_worker() -> bool:
+    return WORKER_ID_ENV in os.environ
+
+
+def worker_socket(host: str, port: int) -> socket.socket | None:
+    """This worker's listening socket, or None outside the supervisor."""
+    if not is_worker():
+        return None
+    fd = os.environ.get(LISTEN_FD_ENV)
+    if fd:
+        return socket.socket(fileno=int(fd))
+    return listen_socket(host, port, reuse_port=True)
+
+
+def notify_ready() -> None:
+    """Tell the supervisor this worker is listening."""
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd:
+        os.write(int(fd), b"1")
+        os.close(int(fd))
+
+
+@dataclass
+class Worker:
+    id: str
+    slot: int
+    proc: subprocess.Popen
+    ready_fd: int | None
+    started: float = field(default_factory=time.monotonic)
+
+
+class Supervisor:
+    def __init__(self, command: list[str], host: str, port: int, workers: int = WORKERS,
+                 reuse_port: bool = REUSE_PORT, drain_timeout: float = DRAIN_TIMEOUT):
+        self.command = command
+        self.host = host
+        self.port = port
+        self.size = workers
+        self.reuse_port = reuse_port
+        self.drain_timeout = drain_timeout
+        self.generation = 0
+        self.workers: list[Worker] = []
+        self.shared_socket: socket.socket | None = None
+        self._crashes: dict[int, tuple[int, float]] = {}  # slot -> (consecutive crashes, restart at)
+        self._signal: int | None = None
+
+    def spawn(self, slot: int) -> Worker:
+        ready_read, ready_write = os.pipe()
+        env = {**os.environ, WORKER_ID_ENV: f"{self.generation}.{slot}", READY_FD_ENV: str(ready_write)}
+        env.setdefault("SESSION_STORE", "sqlite")
+        pass_fds = [ready_write]
+        if self.shared_socket is not None:
+            env[LISTEN_FD_ENV] = str(self.shared_socket.fileno())
+            pass_fds.append(self.shared_socket.fileno())
+        proc = subprocess.Popen(self.command, env=env, pass_fds=pass_fds)
+        os.close(ready_write)
+        return Worker(env[WORKER_ID_ENV], slot, proc, ready_read)
+
+    def wait_ready(self, workers: list[Worker], timeout: float = START_TIMEOUT) -> bool:
+        """Wait until every worker has signalled it is listening."""
+        deadline = time.monotonic() + timeout
+        pending = {w.ready_fd: w for w in workers if w.ready_fd is not None}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select(list(pending), [], [], min(remaining, 0.5))
+            for fd in readable:
+                worker = pending.pop(fd)
+                ok = os.read(fd, 1) == b"1"
+                os.close(fd)
+                worker.ready_fd = None
+                if not ok:  # EOF: the worker exited before listening
+                    return False
+        return True
+
+    def start_generation(self) -> list[Worker]:
+        self.generation += 1
+        return [self.spawn(slot) for slot in range(self.size)]
+
+    def drain(self, workers: list[Worker]) -> None:
+        """SIGTERM the workers, then SIGKILL any still running after the drain timeout."""
+        for worker in workers:
+            if worker.proc.poll() is None:
+                worker.proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout
+        for worker in workers:
+            try:
+                worker.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning("Worker %s did not drain in %.0fs, killing it", worker.id, self.drain_timeout)
+                worker.proc.kill()
+                worker.proc.wait()
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+
+    def reload(self) -> None:
+        logger.info("Reloading: starting worker generation %d", self.generation + 1)
+        new = self.start_generation()
+        if not self.wait_ready(new):
+            logger.error("Worker generation %d failed to start, keeping generation %d",
+                         self.generation, self.generation - 1)
+            for worker in new:
+                worker.proc.kill()
+            self.drain(new)
+            return
+        old, self.workers = self.workers, new
+        self._crashes.clear()
+        self.drain(old)
+        logger.info("Reload complete: generation %d serving", self.generation)
+
+    def reap(self) -> None:
+        """Restart workers that exited on their own, backing off on crash loops."""
+        now = time.monotonic()
+        for i, worker in enumerate(self.workers):
+            if worker.proc.poll() is None:
+                continue
+            crashes, restart_at = self._crashes.get(worker.slot, (0, 0.0))
+            if restart_at == 0.0:
+                crashes = crashes + 1 if now - worker.started < _CRASH_WINDOW else 1
+                delay = min(_MAX_BACKOFF, 0.5 * 2 ** (crashes - 1)) if crashes > 1 else 0.0
+                logger.warning("Worker %s exited with %s; restarting in %.1fs", worker.id, worker.proc.returncode, delay)
+                restart_at = now + delay
+                self._crashes[worker.slot] = (crashes, restart_at)
+            if now >= restart_at:
+                if worker.ready_fd is not None:
+                    os.close(worker.ready_fd)
+                self.workers[i] = self.spawn(worker.slot)
+                self._crashes[worker.slot] = (crashes, 0.0)
+
+    def _on_signal(self, signum, frame) -> None:
+        self._signal = signum
+
+    def run(self) -> None:
+        if os.environ.get("SESSION_STORE") == "memory":
+            raise ValueError("AGENT_WORKERS > 1 needs a shared SESSION_STORE (sqlite or postgres), not memory")
+        if not self.reuse_port:
+            self.shared_socket = listen_socket(self.host, self.port)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._on_signal)
+
+        self.workers = self.start_generation()
+        if not self.wait_ready(self.workers):
+            self.drain(self.workers)
+            raise RuntimeError("Agent workers failed to start")
+        print(f"TaxPilot agent supervisor: {self.size} workers on port {self.port} "
+              f"({'SO_REUSEPORT' if self.reuse_port else 'shared socket'})", flush=True)
+
+        while True:
+            signum, self._signal = self._signal, None
+            if signum == signal.SIGHUP:
+                self.reload()
+            elif signum in (signal.SIGTERM, signal.SIGINT):
+                logger.info("Draining %d workers", len(self.workers))
+                self.drain(self.workers)
+                return
+            self.reap()
+            try:
+                time.sleep(0.2)
+            except InterruptedError:
+                pass
+
+
+def run(port: int, host: str = "0.0.0.0") -> None:
+    """Supervise WORKERS copies of this program (python main.py) on port."""
+    Supervisor([sys.executable, *sys.argv], host, port).run()
@@ -0,0 +1,6 @@
+"""The agent's modules import each other as top-level modules (``import state``), as main.py runs them."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+import threading
+from http.server import HTTPServer
+
+import httpx
+import pytest
+
+import main
+import serialization
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(("127.0.0.1", 0), main.AgentHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_small_and_large_bodies_are_sent_whole(server, monkeypatch):
+    response = httpx.get(f"{server}/health")
+    assert response.status_code == 200 and response.json() == {"status": "ok", "agent": "taxpilot"}
+    assert response.headers["content-type"] == "application/json" and "date" in response.headers
+
+    # Past the threshold the head and body go out through sendmsg
+    monkeypatch.setattr(serialization, "SENDMSG_MIN_BYTES", 64)
+    response = httpx.get(f"{server}/metrics")
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == len(response.content) > 64
+    assert response.text.startswith("# HELP")
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from aserver import _BadRequest, _read_request
+
+
+def read(raw: bytes):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await _read_request(reader)
+    return asyncio.run(run())
+
+
+def test_request_body_is_read_by_content_length():
+    request = read(b"POST /chat HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}")
+    assert request == ("POST", "/chat", {"content-length": "2", ":version": "HTTP/1.1"}, b"{}")
+
+
+@pytest.mark.parametrize("length", [b"abc", b"1.5", b"-1"])
+def test_malformed_content_length_is_a_bad_request(length):
+    with pytest.raises(_BadRequest, match="Malformed Content-Length"):
+        read(b"POST /chat HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
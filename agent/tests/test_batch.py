@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from batch import Checkpoint, read_records, run_batch
+
+FILERS = [
+    {"filer_id": f"f{i}", "name": f"Filer {i}", "filing_status": status, "state": "CA", "dependents": i % 3,
+     "wages": 30_000 + 7_500 * i}
+    for i, status in enumerate(["single", "married_filing_jointly", "head_of_household"] * 4)
+]
+
+
+@pytest.fixture
+def filers(tmp_path):
+    path = tmp_path / "filers.jsonl"
+    path.write_text("".join(json.dumps(filer) + "\n" for filer in FILERS))
+    return str(path)
+
+
+def rows(path: str) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def run(filers: str, output: str, **kwargs) -> dict:
+    return run_batch(filers, output, workers=1, chunk_size=5, progress=False, **kwargs)
+
+
+def test_rows_are_written_in_input_order(filers, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    summary = run(filers, output)
+    assert summary["rows"] == summary["processed"] == len(FILERS) and summary["errors"] == 0
+    assert [row["filer_id"] for row in rows(output)] == [filer["filer_id"] for filer in FILERS]
+    assert Checkpoint(f"{output}.checkpoint").load()["complete"]
+
+
+def test_resume_continues_from_the_checkpoint(filers, tmp_path):
+    expected = str(tmp_path / "expected.jsonl")
+    run(filers, expected)
+
+    # A run that crashed after two chunks, midway through writing the third
+    output = tmp_path / "out.jsonl"
+    lines = open(expected, "rb").readlines()
+    output.write_bytes(b"".join(lines[:10]) + lines[10][:20])
+    Checkpoint(f"{output}.checkpoint").save(10, len(b"".join(lines[:10])))
+
+    summary = run(filers, str(output), resume=True)
+    assert summary["resumed_from"] == 10 and summary["processed"] == len(FILERS) - 10
+    assert rows(str(output)) == rows(expected)
+
+
+def test_resume_of_a_finished_run_does_nothing(filers, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    run(filers, output)
+    before = open(output, "rb").read()
+    assert run(filers, output, resume=True)["processed"] == 0
+    assert open(output, "rb").read() == before
+
+
+def test_without_resume_the_output_starts_over(filers, tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"filer_id": "stale"}\n')
+    Checkpoint(f"{output}.checkpoint").save(1, output.stat().st_size)
+    run(filers, str(output))
+    assert [row["filer_id"] for row in rows(str(output))][0] == "f0"
+    assert len(rows(str(output))) == len(FILERS)
+
+
+def test_bad_records_become_error_rows(tmp_path):
+    path = tmp_path / "filers.csv"
+    path.write_text("filer_id,filing_status,wages\na,single,50000\nb,married,60000\n")
+    output = str(tmp_path / "out.jsonl")
+    assert run(str(path), output)["errors"] == 1
+    assert [row["error"] is None for row in rows(output)] == [True, False]
+    assert len(list(read_records(str(path)))) == 2
+
+
+def test_checkpoint_leaves_no_temp_files(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "out.jsonl.checkpoint"))
+    for rows_done in range(5):
+        checkpoint.save(rows_done, rows_done * 100)
+    assert checkpoint.load() == {"rows": 4, "position": 400, "complete": False}
+    assert [p.name for p in tmp_path.iterdir()] == ["out.jsonl.checkpoint"]
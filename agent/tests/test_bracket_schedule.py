@@ -0,0 +1,56 @@
+import pytest
+
+from tools.tax_tables import BracketSchedule, get_table
+
+BRACKETS = [(0, 0.10), (11925, 0.12), (48475, 0.22), (103350, 0.24), (197300, 0.32), (250525, 0.35), (626350, 0.37)]
+
+
+def progressive_tax(income: float) -> float:
+    """The bracket-by-bracket sum BracketSchedule replaces."""
+    tax = 0.0
+    for i, (low, rate) in enumerate(BRACKETS):
+        high = BRACKETS[i + 1][0] if i + 1 < len(BRACKETS) else float("inf")
+        if income <= low:
+            break
+        tax += (min(income, high) - low) * rate
+    return round(tax, 2)
+
+
+@pytest.fixture(scope="module")
+def schedule():
+    return BracketSchedule.compile(2025, "single", BRACKETS)
+
+
+def test_base_tax_accumulates_each_full_bracket(schedule):
+    assert schedule.lows == tuple(low for low, _ in BRACKETS)
+    assert schedule.base_tax[:3] == (0.0, 1192.5, 1192.5 + 36550 * 0.12)
+
+
+@pytest.mark.parametrize("income", [
+    0.01, 5_000, 11925, 11925.01, 48474.99, 48475, 100_000, 197300, 250525.5, 626350, 626350.01, 2_000_000,
+])
+def test_matches_the_progressive_sum(schedule, income):
+    assert schedule.tax(income) == progressive_tax(income)
+
+
+def test_income_on_an_edge_is_taxed_in_the_lower_bracket(schedule):
+    assert schedule.evaluate(11925).marginal_rate == 0.10
+    assert schedule.evaluate(11925.01).marginal_rate == 0.12
+    assert schedule.bracket_bounds(11925) == (0, 11925)
+    assert schedule.bracket_bounds(1_000_000) == (626350, float("inf"))
+
+
+@pytest.mark.parametrize("income", [0, -500])
+def test_no_tax_without_income(schedule, income):
+    assert schedule.evaluate(income) == (0.0, 0.10, 0.0)
+
+
+def test_effective_rate_is_tax_over_income(schedule):
+    result = schedule.evaluate(80_000)
+    assert result.effective_rate == result.tax / 80_000
+
+
+def test_federal_schedules_are_compiled_once():
+    table = get_table(2025)
+    assert table.schedule("single") is get_table(2025).schedule("single")
+    assert table.schedule("single").tax(80_000) == progressive_tax(80_000)
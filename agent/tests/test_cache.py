@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tools.knowledge_base as knowledge_base
+from cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_their_ttl():
+    clock = Clock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    clock.now = 5
+    assert cache.get("b") is None and cache.get("a") == 1
+    clock.now = 60
+    assert cache.get("a", "gone") == "gone"
+    assert cache.stats()["expirations"] == 2 and len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache()
+    calls = 0
+    release = threading.Event()
+
+    def compute():
+        nonlocal calls
+        calls += 1
+        release.wait(1)
+        return "value"
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cache.get_or_compute, "key", compute) for _ in range(8)]
+        while cache.stats()["coalesced"] < 7:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result() for f in futures] == ["value"] * 8
+    assert calls == 1
+    assert cache.get_or_compute("key", compute) == "value" and calls == 1
+
+
+def test_errors_are_shared_with_waiters_but_not_cached():
+    cache = TTLCache()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(1)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(cache.get_or_compute, "key", failing)
+        started.wait(1)
+        follower = pool.submit(cache.get_or_compute, "key", failing)
+        while cache.stats()["coalesced"] < 1:
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+    assert cache.get_or_compute("key", lambda: "recovered") == "recovered"
+
+
+def test_kb_queries_are_cached_by_normalized_text(monkeypatch):
+    searches = []
+    monkeypatch.setattr(knowledge_base, "_search", lambda query, top_k: searches.append(query) or [])
+    knowledge_base.kb_cache.clear()
+    knowledge_base.search_knowledge_base("Home  Mortgage interest ")
+    knowledge_base.search_knowledge_base("home mortgage interest")
+    assert searches == ["home mortgage interest"]
+    knowledge_base.kb_cache.clear()
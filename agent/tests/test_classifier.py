@@ -0,0 +1,42 @@
+from nodes.classifier import updated_income, w2_item
+
+
+def amounts(items):
+    return [(item.type, item.amount) for item in items]
+
+
+def test_equal_w2s_in_one_message_are_both_recorded():
+    items = updated_income({"user_message": "I have two W-2s: $50,000 and $50,000", "income_items": []})
+    assert amounts(items) == [("w2", 50000.0), ("w2", 50000.0)]
+
+
+def test_restated_w2_is_not_recorded_twice():
+    state = {"user_message": "As I said, my W-2 was $50,000", "income_items": [w2_item(50000.0)]}
+    assert updated_income(state) is None
+
+
+def test_restatement_absorbs_one_mention_per_recorded_item():
+    state = {"user_message": "Again, I have two W-2s: $50,000 and $50,000", "income_items": [w2_item(50000.0)]}
+    assert amounts(updated_income(state)) == [("w2", 50000.0), ("w2", 50000.0)]
+
+
+def test_second_w2_with_equal_wages_in_a_later_turn_is_recorded():
+    state = {"user_message": "I have another W-2 for $50,000 from my second job", "income_items": [w2_item(50000.0)]}
+    assert amounts(updated_income(state)) == [("w2", 50000.0), ("w2", 50000.0)]
+
+
+def test_same_wages_sent_on_two_turns_are_recorded_once():
+    state = {"user_message": "$50,000 wages", "income_items": []}
+    state["income_items"] = updated_income(state)
+    assert updated_income(state) is None
+    assert amounts(state["income_items"]) == [("w2", 50000.0)]
+
+
+def test_also_introduces_a_new_document():
+    state = {"user_message": "I also got $50,000 in wages", "income_items": [w2_item(50000.0)]}
+    assert amounts(updated_income(state)) == [("w2", 50000.0), ("w2", 50000.0)]
+
+
+def test_equal_amount_of_another_type_is_recorded():
+    state = {"user_message": "I made $50,000 freelancing", "income_items": [w2_item(50000.0)]}
+    assert amounts(updated_income(state)) == [("w2", 50000.0), ("1099", 50000.0)]
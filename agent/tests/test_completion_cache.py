@@ -0,0 +1,77 @@
+import json
+import time
+
+import completion_cache
+from completion_cache import CompletionCache
+
+FIELDS = {"name": "Sam", "filing_status": "single", "state": "CA", "dependents": 0, "income_count": 1}
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = CompletionCache()
+    cache.store(FIELDS, "Hi, I'm SAM!", "Hello Sam")
+    assert cache.lookup({**FIELDS, "name": " sam "}, "hi i'm sam") == "Hello Sam"
+    assert cache.lookup({**FIELDS, "dependents": 1}, "hi i'm sam") is None
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_near_hits_need_the_jaccard_threshold():
+    cache = CompletionCache(similarity=0.6)
+    cache.store(FIELDS, "i want to file my taxes", "Let's start")
+    # 6 of 7 distinct words shared
+    assert cache.lookup(FIELDS, "i want to file my taxes now") == "Let's start"
+    # 3 of 10
+    assert cache.lookup(FIELDS, "i need to file a return now") is None
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_near_hits_need_the_same_numbers():
+    cache = CompletionCache(similarity=0.5)
+    cache.store(FIELDS, "my w-2 wages were $50,000 this year", "Got it")
+    assert cache.lookup(FIELDS, "my w-2 wages were $60,000 this year") is None
+    assert cache.lookup(FIELDS, "my w-2 wages were $50,000 last year") == "Got it"
+
+
+def test_similarity_zero_only_hits_exact_messages():
+    cache = CompletionCache(similarity=0)
+    cache.store(FIELDS, "i want to file my taxes", "Let's start")
+    assert cache.lookup(FIELDS, "i want to file my taxes now") is None
+
+
+def test_empty_replies_are_not_stored():
+    cache = CompletionCache()
+    cache.store(FIELDS, "hello", "")
+    assert cache.stats()["size"] == 0
+
+
+def test_saved_entries_reload_until_they_expire(tmp_path):
+    path = str(tmp_path / "cache" / "intake.json")
+    cache = CompletionCache(path=path)
+    cache.store(FIELDS, "hello", "Hi there")
+    cache.store(FIELDS, "short lived", "Soon gone", ttl=0.001)
+    time.sleep(0.01)
+    cache.save()
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == ["intake.json"]
+
+    reloaded = CompletionCache(path=path)
+    assert reloaded.load() == 1
+    assert reloaded.lookup(FIELDS, "Hello") == "Hi there"
+    assert reloaded.lookup(FIELDS, "short lived") is None
+
+
+def test_unreadable_or_other_version_files_load_nothing(tmp_path):
+    path = tmp_path / "intake.json"
+    path.write_text("{not json")
+    assert CompletionCache(path=str(path)).load() == 0
+    path.write_text(json.dumps({"version": 99, "entries": [[list(range(5)), "hello", "Hi", 1e12]]}))
+    assert CompletionCache(path=str(path)).load() == 0
+
+
+def test_store_saves_every_n_new_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(completion_cache, "INTAKE_CACHE_SAVE_EVERY", 2)
+    path = tmp_path / "intake.json"
+    cache = CompletionCache(path=str(path))
+    cache.store(FIELDS, "one", "1")
+    assert not path.exists()
+    cache.store(FIELDS, "two", "2")
+    assert CompletionCache(path=str(path)).load() == 2
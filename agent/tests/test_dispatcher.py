@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+import inference
+from dispatcher import Dispatcher
+
+
+def batching_dispatcher() -> Dispatcher:
+    return Dispatcher(batch_url="http://127.0.0.1:9/v1/chat/completions/batch", batch_window_ms=10_000, batch_size=4)
+
+
+def test_cancelled_batch_leader_fails_its_followers_and_closes_the_batch():
+    async def run():
+        dispatcher = batching_dispatcher()
+        leader = asyncio.create_task(dispatcher._asend(inference._payload("system", "first")))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(dispatcher._asend(inference._payload("system", "second")))
+        await asyncio.sleep(0)
+        assert len(dispatcher._batch.items) == 2
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(RuntimeError, match="abandoned"):
+            await asyncio.wait_for(follower, 1)
+        assert dispatcher._batch is None
+
+    asyncio.run(run())
+
+
+def test_cancelled_coalesced_caller_leaves_the_reply_to_the_others(monkeypatch):
+    async def asend(payload):
+        await asyncio.sleep(0.05)
+        return "reply"
+
+    monkeypatch.setattr(inference, "asend", asend)
+
+    async def run():
+        dispatcher = Dispatcher(batch_url="")
+        calls = [asyncio.create_task(dispatcher.acomplete("system", "same question")) for _ in range(3)]
+        await asyncio.sleep(0)
+        calls[1].cancel()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        assert results[0] == results[2] == "reply"
+        assert isinstance(results[1], asyncio.CancelledError)
+
+    asyncio.run(run())
+
+
+def test_cancelled_coalescing_leader_fails_the_others_with_an_ordinary_error(monkeypatch):
+    async def asend(payload):
+        await asyncio.sleep(10)
+        return "reply"
+
+    monkeypatch.setattr(inference, "asend", asend)
+
+    async def run():
+        dispatcher = Dispatcher(batch_url="")
+        leader = asyncio.create_task(dispatcher.acomplete("system", "same question"))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(dispatcher.acomplete("system", "same question")) for _ in range(2)]
+        # Until the leader is waiting on upstream
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        for follower in followers:
+            with pytest.raises(RuntimeError, match="cancelled before it replied"):
+                await asyncio.wait_for(follower, 1)
+        assert dispatcher._in_flight == {}
+
+    asyncio.run(run())
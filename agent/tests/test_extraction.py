@@ -0,0 +1,23 @@
+import pytest
+
+from benchmarks.bench_extraction import accuracy, engine_extract, load_fixtures
+from tools.extraction import extract
+
+
+def test_labelled_fixtures_are_all_extracted():
+    scores, misses = accuracy(engine_extract, load_fixtures())
+    assert misses == []
+
+
+@pytest.mark.parametrize("message, name", [
+    ("my name is john smith", "john smith"),
+    ("Hi, my name is jordan and I am single", "jordan"),
+    ("my name is john smith, and I'm single", "john smith"),
+    ("my name is sam married filing jointly", "sam"),
+    ("my name is john from texas", "john"),
+    ("name: priya patel. I live in Ohio", "priya patel"),
+    ("I'm Ann Lee from TX", "Ann Lee"),
+    ("I'm moving to Ohio", None),
+])
+def test_names(message, name):
+    assert extract(message).name == name
@@ -0,0 +1,63 @@
+import pytest
+
+import fast_path
+from fast_path import Decision, decide, record
+
+
+def turn(message: str, **state) -> dict:
+    return {"user_message": message, **state}
+
+
+@pytest.mark.parametrize("mode", ["conservative", "aggressive"])
+def test_questions_always_go_to_the_model(mode):
+    assert decide(turn("What deductions can I take?"), None, None, mode) == Decision(True, "free_form")
+    assert decide(turn("Single, and is that good for me?"), "single", None, mode).use_llm
+
+
+def test_off_calls_the_model_every_turn():
+    assert decide(turn("I'm single"), "single", None, "off") == Decision(True, "disabled")
+
+
+@pytest.mark.parametrize("mode", ["conservative", "aggressive"])
+def test_handoff_to_the_classifier_is_templated(mode):
+    decision = decide(turn("I earned $85,000 from my W-2"), "single", "Sam", mode)
+    assert decision.rule == "handoff" and not decision.use_llm
+    assert decide(turn("hello"), "single", "Sam", mode).rule != "handoff"
+    assert decide(turn("hello", total_income=85_000.0), "single", "Sam", mode).rule == "handoff"
+
+
+def test_conservative_templates_short_messages_that_filled_a_field():
+    decision = decide(turn("I'm single"), "single", None, "conservative")
+    assert decision == Decision(False, "extracted", "Filing status set to Single. What's your name?")
+
+
+def test_conservative_asks_the_model_when_nothing_new_was_captured():
+    state = turn("hello there", filing_status="single")
+    assert decide(state, "single", None, "conservative") == Decision(True, "no_new_fields")
+
+
+def test_conservative_asks_the_model_about_long_messages():
+    message = "I'm single now but my divorce was only finalized late in the year after a long separation"
+    assert decide(turn(message), "single", None, "conservative") == Decision(True, "no_new_fields")
+
+
+def test_aggressive_templates_every_statement():
+    state = turn("hello there", filing_status="single")
+    decision = decide(state, "single", None, "aggressive")
+    assert decision.rule == "templated" and decision.reply.endswith("What's your name?")
+
+
+def test_template_greets_a_newly_given_name():
+    reply = decide(turn("I'm Sam"), None, "Sam", "conservative").reply
+    assert reply.startswith("Nice to meet you, Sam!")
+
+
+def test_record_counts_skips_and_prices_them_at_the_model_average(monkeypatch):
+    monkeypatch.setattr(fast_path, "llm_latency", fast_path._LatencyEstimate())
+    calls, saved = fast_path.LLM_CALLS.value(), fast_path.LATENCY_SAVED.value()
+    skips = fast_path.LLM_SKIPS.value(rule="extracted")
+    record(Decision(True, "free_form"), 2.0)
+    record(Decision(False, "extracted", "reply"))
+    assert fast_path.LLM_CALLS.value() == calls + 1
+    assert fast_path.LLM_SKIPS.value(rule="extracted") == skips + 1
+    assert fast_path.LATENCY_SAVED.value() == saved + 2.0
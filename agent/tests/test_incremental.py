@@ -0,0 +1,88 @@
+import asyncio
+
+import incremental
+from incremental import NodeSpec, incremental_node
+from nodes import classifier
+from nodes.classifier import classifier_node, w2_item
+
+SPEC = NodeSpec(reads=("total_income",), writes=("federal_tax", "current_node", "response"))
+
+
+class Node:
+    """A node counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, state):
+        self.calls += 1
+        return {"federal_tax": state["total_income"] / 10, "current_node": "tax",
+                "response": f"call {self.calls}"}
+
+
+def turn(state: dict, update: dict) -> dict:
+    """Apply a node update the way the graph's reducers would."""
+    state = {**state, **update}
+    state["node_memo"] = {**state.get("node_memo", {}), **update.get("node_memo", {})}
+    return state
+
+
+def test_skip_replays_the_memoized_update():
+    node = Node()
+    wrapped = incremental_node("tax", node, SPEC, enabled=True)
+    first = wrapped({"total_income": 1000, "node_memo": {}})
+    assert first["node_trace"] == [{"node": "tax", "ran": True}]
+
+    state = turn({"total_income": 1000}, first)
+    state["response"] = "another node's reply"
+    skipped = wrapped(state)
+    assert node.calls == 1
+    assert skipped == {"current_node": "tax", "response": "call 1", "node_trace": [{"node": "tax", "ran": False}]}
+    assert incremental.NODE_SKIPS.value(node="tax") >= 1
+
+
+def test_changed_input_reruns_the_node():
+    node = Node()
+    wrapped = incremental_node("tax_changed", node, SPEC, enabled=True)
+    state = turn({"total_income": 1000}, wrapped({"total_income": 1000}))
+    update = wrapped({**state, "total_income": 2000})
+    assert node.calls == 2
+    assert update["federal_tax"] == 200 and update["node_trace"][0]["ran"]
+
+
+def test_disabled_or_unspecified_nodes_always_run():
+    for spec, enabled in ((SPEC, False), (None, True)):
+        node = Node()
+        wrapped = incremental_node("tax_untracked", node, spec, enabled=enabled)
+        update = wrapped({"total_income": 1000})
+        assert "node_memo" not in update
+        wrapped(turn({"total_income": 1000}, update))
+        assert node.calls == 2
+
+
+def test_async_nodes_are_skipped_too():
+    node = Node()
+
+    async def anode(state):
+        return node(state)
+
+    wrapped = incremental_node("tax_async", anode, SPEC, enabled=True)
+    state = turn({"total_income": 1000}, asyncio.run(wrapped({"total_income": 1000})))
+    assert asyncio.run(wrapped(state))["response"] == "call 1"
+    assert node.calls == 1
+
+
+def test_classifier_skips_a_message_that_adds_no_income():
+    wrapped = incremental_node("classifier", classifier_node, classifier.SPEC, enabled=True)
+    state = {"user_message": "My W-2 wages were $50,000", "income_items": [], "node_memo": {}}
+    state = turn(state, wrapped(state))
+    assert len(state["income_items"]) == 1
+
+    # The first turn without new income runs; another like it is skipped
+    state = turn(state, wrapped({**state, "user_message": "What else do you need?"}))
+    state = turn(state, wrapped({**state, "user_message": "Anything else?"}))
+    assert state["node_trace"] == [{"node": "classifier", "ran": False}]
+    assert state["income_items"] == [w2_item(50000.0)]
+
+    state = turn(state, wrapped({**state, "user_message": "I also have a 1099 for $2,000"}))
+    assert state["node_trace"][0]["ran"] and len(state["income_items"]) == 2
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tools.kb_index as kb_index
+from tools.kb_index import KBIndex, chunk_markdown, tokenize
+
+DOCS = [
+    {"text": "Mortgage interest deduction for a home loan", "metadata": {"id": "mortgage"}},
+    {"text": "Student loan interest deduction up to 2,500 dollars", "metadata": {"id": "student"}},
+    {"text": "Charitable donations to qualified organizations", "metadata": {"id": "charity"}},
+    {"text": "Mortgage points and mortgage insurance premiums on a mortgage", "metadata": {"id": "points"}},
+    {"text": "Child tax credit for each qualifying child, and the credit phase-out for higher incomes, "
+             "with a long explanation of dependents, residency tests and support tests", "metadata": {"id": "child"}},
+]
+
+
+def ids(results: list[dict]) -> list[str]:
+    return [r["metadata"]["id"] for r in results]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return KBIndex.build(DOCS)
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The Child-Tax credit, for 2025!") == ["child", "tax", "credit", "2025"]
+
+
+def test_rarer_terms_outweigh_common_ones(index):
+    # "student" is in one chunk; "interest" and "deduction" are in two
+    assert ids(index.search("student interest deduction"))[0] == "student"
+
+
+def test_term_frequency_raises_the_score(index):
+    assert ids(index.search("mortgage", top_k=2)) == ["points", "mortgage"]
+
+
+def test_scores_are_descending_and_top_k_is_respected(index):
+    results = index.search("loan interest deduction mortgage", top_k=3)
+    assert len(results) == 3
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_no_shared_terms_means_no_results(index):
+    assert index.search("cryptocurrency") == []
+    assert index.search("the and of") == []
+
+
+def test_save_and_memory_mapped_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "kb.idx")
+    KBIndex.build(DOCS, fingerprint="abc").save(path)
+    loaded = KBIndex.load(path)
+    assert loaded.fingerprint == "abc"
+    assert isinstance(loaded.doc_ids, memoryview)
+    for query in ("mortgage", "student interest deduction", "child credit phase-out", "nothing matches"):
+        assert loaded.search(query, top_k=5) == index.search(query, top_k=5)
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "kb.idx"
+    path.write_bytes(b"not an index at all")
+    with pytest.raises(ValueError, match="Not a knowledge base index"):
+        KBIndex.load(str(path))
+
+
+def test_chunks_carry_their_heading_trail(tmp_path):
+    path = tmp_path / "guide.md"
+    path.write_text("# Deductions\n\n## Mortgage\nInterest on a home loan.\n\n## Empty\n\n# Credits\nChild credit.\n")
+    chunks = chunk_markdown(path)
+    assert [c["metadata"]["path"] for c in chunks] == ["Deductions > Mortgage", "Credits"]
+    assert chunks[0]["text"] == "Mortgage\nInterest on a home loan."
+
+
+def test_saved_index_is_rebuilt_when_the_sources_change(tmp_path, monkeypatch):
+    kb_dir = tmp_path / "kb"
+    kb_dir.mkdir()
+    (kb_dir / "a.md").write_text("# Mortgage\nMortgage interest.\n")
+    monkeypatch.setattr(kb_index, "KB_DIR", kb_dir)
+    monkeypatch.setattr(kb_index, "KB_INDEX_PATH", str(tmp_path / "kb.idx"))
+    from_directory = KBIndex.from_directory
+    monkeypatch.setattr(KBIndex, "from_directory", lambda: from_directory(kb_dir))
+
+    assert len(kb_index._load_or_build().docs) == 1
+    assert isinstance(kb_index._load_or_build().doc_ids, memoryview)
+
+    (kb_dir / "b.md").write_text("# Charity\nDonations.\n")
+    rebuilt = kb_index._load_or_build()
+    assert len(rebuilt.docs) == 2 and not isinstance(rebuilt.doc_ids, memoryview)
+
+
+def test_concurrent_saves_do_not_share_a_temp_file(index, tmp_path):
+    path = str(tmp_path / "kb.idx")
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: index.save(path), range(32)))
+    assert KBIndex.load(path).search("mortgage") == index.search("mortgage")
+    assert [p.name for p in tmp_path.iterdir()] == ["kb.idx"]
+
+
+def test_coverage_is_the_share_of_query_terms_matched(index):
+    assert index.search("student loan interest")[0]["coverage"] == 1.0
+    assert index.search("student cryptocurrency")[0]["coverage"] == 0.5
@@ -0,0 +1,63 @@
+import pytest
+
+import tools.knowledge_base as knowledge_base
+from tools.knowledge_base import answers, kb_cache, search_knowledge_base
+
+REMOTE = [{"text": "Remote passage", "score": 0.9, "metadata": {"source": "do-kb"}}]
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    """A configured remote KB; the list records the queries sent to it."""
+    queries = []
+
+    def search(query, top_k=3):
+        queries.append(query)
+        return REMOTE
+
+    monkeypatch.setattr(knowledge_base, "KB_URL", "http://kb.invalid")
+    monkeypatch.setattr(knowledge_base, "search_remote_knowledge_base", search)
+    kb_cache.clear()
+    yield queries
+    kb_cache.clear()
+
+
+def test_strong_local_hit_is_answered_locally(remote):
+    results = search_knowledge_base("IRS deduction home mortgage interest eligibility requirements limits")
+    assert remote == []
+    assert answers(results) and "mortgage" in results[0]["text"].lower()
+
+
+def test_weak_local_hit_falls_back_to_the_remote_kb(remote):
+    query = "what is the capital of france"
+    assert not answers(knowledge_base.get_index().search(query))
+    assert search_knowledge_base(query) == REMOTE
+    assert remote == [query]
+
+
+def test_no_local_hit_falls_back_to_the_remote_kb(remote):
+    assert search_knowledge_base("cryptocurrency staking rewards") == REMOTE
+
+
+def test_low_coverage_falls_back_even_with_a_high_score(remote, monkeypatch):
+    monkeypatch.setattr(knowledge_base, "KB_MIN_COVERAGE", 0.9)
+    search_knowledge_base("IRS deduction home mortgage interest eligibility requirements limits")
+    assert len(remote) == 1
+
+
+def test_failed_remote_lookup_returns_the_weak_local_hits_uncached(remote, monkeypatch):
+    def unavailable(query, top_k=3):
+        raise ConnectionError("kb down")
+
+    monkeypatch.setattr(knowledge_base, "search_remote_knowledge_base", unavailable)
+    results = search_knowledge_base("how is bitcoin mining income taxed")
+    assert results and not answers(results)
+    assert len(kb_cache) == 0
+    assert search_knowledge_base("cryptocurrency staking")[0]["text"].startswith("KB query failed")
+
+
+def test_without_a_remote_kb_weak_hits_are_returned(monkeypatch):
+    monkeypatch.setattr(knowledge_base, "KB_URL", "")
+    kb_cache.clear()
+    assert search_knowledge_base("what is the capital of france")
+    kb_cache.clear()
@@ -0,0 +1,20 @@
+import metrics
+
+AWKWARD = 'C:\\tenants\\"acme"\nltd'
+ESCAPED = 'C:\\\\tenants\\\\\\"acme\\"\\nltd'
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_escaped_total", "Escaping", ("tenant",))
+    counter.inc(tenant=AWKWARD)
+    assert counter.render()[-1] == f'test_escaped_total{{tenant="{ESCAPED}"}} 1'
+    assert counter.value(tenant=AWKWARD) == 1
+
+
+def test_histogram_and_stats_gauge_labels_are_escaped():
+    histogram = metrics.Histogram("test_escaped_seconds", "Escaping", ("tenant",), buckets=(1,))
+    histogram.observe(0.5, tenant=AWKWARD)
+    assert f'test_escaped_seconds_bucket{{tenant="{ESCAPED}",le="1"}} 1' in histogram.render()
+
+    lines = metrics.stats_gauges("test_stats", "owner", {AWKWARD: {"size": 3}}, ("size",))
+    assert lines == ["# TYPE test_stats_size gauge", f'test_stats_size{{owner="{ESCAPED}"}} 3']
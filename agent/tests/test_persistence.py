@@ -0,0 +1,141 @@
+import sqlite3
+import time
+
+import pytest
+
+import persistence
+from persistence import PersistenceBackend, SQLitePersistence, WriteBehind, record_node
+from state import IncomeItem, new_session_state
+
+
+def test_backend_missing_a_method_cannot_be_created():
+    class Partial(PersistenceBackend):
+        def insert(self, cur, table, columns, rows):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def test_sqlite_backend_implements_the_interface(tmp_path):
+    backend = SQLitePersistence(str(tmp_path / "taxpilot.db"))
+    try:
+        assert backend.write({}) is not None
+    finally:
+        backend.close()
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    writer = WriteBehind(SQLitePersistence(str(tmp_path / "taxpilot.db")), flush_interval=0.01)
+    monkeypatch.setattr(persistence, "_writer", writer)
+    yield writer
+    writer.close()
+
+
+def session_row(writer: WriteBehind, session_id: str) -> dict:
+    cur = writer.backend.conn.execute("SELECT * FROM tax_sessions WHERE id = ?", (session_id,))
+    return dict(zip([column[0] for column in cur.description], cur.fetchone()))
+
+
+def test_node_updates_merge_over_the_state_they_were_made_from(writer):
+    state = new_session_state("s1", "hi")
+    state["filing_status"] = "single"
+    record_node(state, {"total_income": 85000.0, "current_node": "classifier"})
+    # The next node's state already holds the first update
+    state = {**state, "total_income": 85000.0, "current_node": "classifier"}
+    record_node(state, {"itemized_total": 20000.0, "use_standard": False, "current_node": "deduction"})
+    assert writer.flush(5)
+
+    row = session_row(writer, "s1")
+    assert (row["filing_status"], row["status"], row["total_income"], row["total_deductions"]) == (
+        "single", "deductions", 85000.0, 20000.0)
+
+
+def rows(writer: WriteBehind, sql: str) -> list[tuple]:
+    return writer.backend.conn.execute(sql).fetchall()
+
+
+def test_flush_coalesces_a_sessions_changes(writer):
+    state = new_session_state("s1", "hi")
+    record_node(state, {"income_items": [IncomeItem(source="W-2", type="w2", amount=1000)]})
+    record_node(state, {"income_items": [IncomeItem(source="W-2", type="w2", amount=1000),
+                                         IncomeItem(source="1099", type="1099", amount=500)]})
+    persistence.record_turn("s1", "hi", {"message": "hello", "cards": [{"type": "progress_card"}]})
+    assert writer.flush(5)
+
+    assert rows(writer, "SELECT type, amount FROM income_items ORDER BY id") == [("w2", 1000.0), ("1099", 500.0)]
+    assert rows(writer, "SELECT role, content, cards FROM chat_messages ORDER BY created_at") == [
+        ("user", "hi", None), ("assistant", "hello", '[{"type": "progress_card"}]')]
+    assert writer.stats()["pending_rows"] == 0
+
+
+def test_batch_rows_wakes_the_writer_early(tmp_path):
+    writer = WriteBehind(SQLitePersistence(str(tmp_path / "taxpilot.db")), flush_interval=60, batch_rows=3)
+    try:
+        writer.record_messages("s1", [("user", "a", None), ("assistant", "b", None)])
+        time.sleep(0.1)
+        assert writer.batches == 0
+        writer.record_messages("s1", [("user", "c", None)])
+        deadline = time.monotonic() + 5
+        while writer.batches == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.rows_written == 3
+    finally:
+        writer.close()
+
+
+class Flaky(SQLitePersistence):
+    """Rejects the first ``failures`` batches."""
+
+    def __init__(self, path: str, failures: int):
+        super().__init__(path)
+        self.failures = failures
+
+    def write(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().write(batch)
+
+
+def test_failed_batch_is_retried_with_newer_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "PERSIST_RETRY_MAX", 0.05)
+    writer = WriteBehind(Flaky(str(tmp_path / "taxpilot.db"), failures=1), flush_interval=0.01)
+    try:
+        state = new_session_state("s1", "hi")
+        writer.record_update("s1", {"total_income": 1000.0}, state)
+        writer.record_messages("s1", [("user", "first", None)])
+        deadline = time.monotonic() + 5
+        while not writer.errors and time.monotonic() < deadline:
+            time.sleep(0.005)
+        writer.record_update("s1", {"current_node": "classifier"}, state)
+        writer.record_messages("s1", [("user", "second", None)])
+        assert writer.flush(5)
+    finally:
+        writer.close()
+
+    backend = SQLitePersistence(str(tmp_path / "taxpilot.db"))
+    assert backend.conn.execute("SELECT total_income, status FROM tax_sessions").fetchall() == [
+        (1000.0, "classifying")]
+    assert backend.conn.execute("SELECT content FROM chat_messages ORDER BY created_at").fetchall() == [
+        ("first",), ("second",)]
+    assert writer.errors == 1
+    backend.close()
+
+
+def test_an_older_change_does_not_overwrite_a_newer_one(tmp_path):
+    backend = SQLitePersistence(str(tmp_path / "taxpilot.db"))
+    newer = persistence.SessionChanges(values=persistence.session_values({"total_income": 2}), updated_at=2.0)
+    older = persistence.SessionChanges(values=persistence.session_values({"total_income": 1}), updated_at=1.0)
+    assert backend.write({"s1": newer})["tax_sessions"] == 1
+    assert backend.write({"s1": older})["tax_sessions"] == 0
+    assert backend.conn.execute("SELECT total_income FROM tax_sessions").fetchall() == [(2.0,)]
+    backend.close()
+
+
+def test_close_writes_what_is_left(tmp_path):
+    writer = WriteBehind(SQLitePersistence(str(tmp_path / "taxpilot.db")), flush_interval=60)
+    writer.record_messages("s1", [("user", "bye", None)])
+    writer.close()
+    assert writer.rows_written == 1
@@ -0,0 +1,131 @@
+"""Chaos tests: Resilience against stub processes that fail, recover or slow down."""
+
+import time
+
+import httpx
+import pytest
+
+import resilience
+from benchmarks.stub_server import StubProcess
+from resilience import CLOSED, OPEN, CircuitOpen, Policy, Resilience
+
+
+@pytest.fixture(scope="module")
+def healthy():
+    with StubProcess() as stub:
+        yield stub
+
+
+@pytest.fixture(scope="module")
+def outage():
+    with StubProcess(error_rate=1.0) as stub:
+        yield stub
+
+
+@pytest.fixture(scope="module")
+def client():
+    with httpx.Client() as client:
+        yield client
+
+
+class Upstream:
+    """An attempt function posting to whichever stub ``url`` points at, counting requests."""
+
+    def __init__(self, client: httpx.Client, url: str):
+        self.client = client
+        self.url = url
+        self.requests = 0
+
+    def __call__(self, timeout: float) -> dict:
+        self.requests += 1
+        body = {"messages": [{"role": "user", "content": "What is my W-2 refund?"}]}
+        response = self.client.post(f"{self.url}/v1/chat/completions", json=body, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+def policy(name: str, **overrides) -> Policy:
+    settings = {"timeout_min": 0.5, "timeout_max": 5.0, "retries": 0, "min_calls": 5, "window": 10,
+                "open_seconds": 60.0, "backoff": 0.0}
+    return Policy(name=name, **{**settings, **overrides})
+
+
+def test_breaker_opens_after_failures_and_fails_fast(client, outage):
+    r = Resilience(policy("chaos_open"))
+    upstream = Upstream(client, outage.url)
+    for _ in range(5):
+        with pytest.raises(httpx.HTTPStatusError):
+            r.call(upstream)
+    assert r.breaker.state == OPEN and r.breaker.opened == 1
+
+    start = time.perf_counter()
+    for _ in range(20):
+        with pytest.raises(CircuitOpen):
+            r.call(upstream)
+    assert upstream.requests == 5
+    assert time.perf_counter() - start < 0.1
+    assert resilience.BREAKER_REJECTED.value(upstream="chaos_open") == 20
+
+
+def test_breaker_half_opens_and_closes_after_recovery(client, outage, healthy):
+    r = Resilience(policy("chaos_recover", open_seconds=0.2))
+    upstream = Upstream(client, outage.url)
+    for _ in range(5):
+        with pytest.raises(httpx.HTTPStatusError):
+            r.call(upstream)
+    assert r.breaker.state == OPEN
+
+    # A failed probe reopens the breaker
+    time.sleep(0.25)
+    with pytest.raises(httpx.HTTPStatusError):
+        r.call(upstream)
+    assert r.breaker.state == OPEN and r.breaker.opened == 2
+    with pytest.raises(CircuitOpen):
+        r.call(upstream)
+
+    # Once the upstream recovers, the next probe closes it
+    upstream.url = healthy.url
+    time.sleep(0.25)
+    r.call(upstream)
+    assert r.breaker.state == CLOSED
+    assert upstream.requests == 7
+    r.call(upstream)
+    assert upstream.requests == 8
+
+
+def hedges(name: str) -> float:
+    return sum(resilience.HEDGES.value(upstream=name, winner=winner) for winner in ("primary", "hedge"))
+
+
+def test_hedge_fires_only_past_the_latency_window(client):
+    r = Resilience(policy("chaos_hedge", hedge=True, hedge_quantile=0.99))
+    with StubProcess(latency_ms=100) as usual, StubProcess(latency_ms=5) as fast, \
+            StubProcess(latency_ms=400) as slow:
+        upstream = Upstream(client, usual.url)
+        for _ in range(r.latency.min_samples):
+            r.call(upstream)
+        assert hedges("chaos_hedge") == 0
+
+        # Replies well inside the p99 are never hedged
+        upstream.url, upstream.requests = fast.url, 0
+        for _ in range(10):
+            r.call(upstream)
+        assert hedges("chaos_hedge") == 0 and upstream.requests == 10
+
+        # A reply still outstanding past the p99 gets one duplicate request
+        upstream.url, upstream.requests = slow.url, 0
+        r.call(upstream)
+        assert hedges("chaos_hedge") == 1 and upstream.requests == 2
+
+
+def test_retries_stop_once_the_budget_is_exhausted(client, outage):
+    r = Resilience(policy("chaos_budget", breaker=False, retries=1, retry_budget=0.0, retry_min_per_s=0.0))
+    upstream = Upstream(client, outage.url)
+    tokens = int(r.budget.tokens)
+    for _ in range(tokens + 5):
+        with pytest.raises(httpx.HTTPStatusError):
+            r.call(upstream)
+    # One retry per call while tokens last, then first attempts only
+    assert upstream.requests == 2 * tokens + 5
+    assert resilience.RETRIES.value(upstream="chaos_budget", result="retried") == tokens
+    assert resilience.RETRIES.value(upstream="chaos_budget", result="budget_exhausted") == 5
@@ -0,0 +1,106 @@
+import os
+import sys
+import subprocess
+import threading
+
+import pytest
+
+from nodes import retrieval
+from nodes.classifier import w2_item
+from state import IncomeItem
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE = {"filing_status": "single", "dependents": 1, "total_income": 35000.0,
+         "income_items": [w2_item(35000.0)], "user_message": "What can I deduct?"}
+
+
+@pytest.fixture(autouse=True)
+def plan_cache():
+    retrieval._plan_cache.clear()
+    yield
+    retrieval._plan_cache.clear()
+
+
+class Lookup:
+    """A lookup counting its calls; with a barrier, calls wait until ``parties`` are running at once."""
+
+    def __init__(self, result="passage", barrier=None):
+        self.result = result
+        self.barrier = barrier
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        return self.result
+
+
+def test_lookups_cover_the_deduction_nodes_queries():
+    plan = retrieval.lookups(STATE)
+    assert next(iter(plan)) == f"kb:{retrieval.deduction_query('single', 35000.0)}"
+    assert {f"deduction:{c}" for c in retrieval.DEDUCTION_CATEGORIES} <= set(plan)
+    assert "deduction:home office" not in plan
+    assert {"credit:child tax credit", "credit:earned income tax credit", "credit:saver's credit"} <= set(plan)
+
+    contractor = {**STATE, "income_items": [IncomeItem(source="1099", type="1099", amount=35000)]}
+    assert "deduction:home office" in retrieval.lookups(contractor)
+
+
+def test_eligible_credits_follow_income_and_dependents():
+    assert retrieval.eligible_credits("single", 150000, 0) == []
+    assert retrieval.eligible_credits("single", 30000, 0) == ["saver's credit"]
+    assert retrieval.eligible_credits("married_filing_separately", 15000, 2) == [
+        "child tax credit", "child and dependent care credit", "saver's credit"]
+    assert "earned income tax credit" in retrieval.eligible_credits("married_filing_jointly", 60000, 2)
+
+
+def test_fan_out_runs_lookups_concurrently(monkeypatch):
+    monkeypatch.setattr(retrieval, "FAN_OUT", True)
+    barrier = threading.Barrier(3)
+    plan = {key: Lookup(key, barrier) for key in ("a", "b", "c")}
+    assert retrieval.fetch(plan) == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_sequential_fetch_and_plan_cache(monkeypatch):
+    monkeypatch.setattr(retrieval, "FAN_OUT", False)
+    plan = {"a": Lookup(), "b": Lookup()}
+    assert retrieval.fetch(plan) == retrieval.fetch(plan) == {"a": "passage", "b": "passage"}
+    assert plan["a"].calls == plan["b"].calls == 1
+
+
+def test_failed_lookups_are_not_cached():
+    plan = {"a": Lookup(), "b": Lookup(retrieval._FAILED + ": timeout")}
+    retrieval.fetch(plan)
+    retrieval.fetch(plan)
+    assert plan["b"].calls == 2
+
+
+def test_resolve_fetches_only_what_was_not_prefetched(monkeypatch):
+    plan = {"kb:q": Lookup("fetched"), "credit:x": Lookup("fetched")}
+    monkeypatch.setattr(retrieval, "lookups", lambda state: plan)
+    hits = retrieval.PREFETCH.value(result="hit")
+    results = retrieval.resolve({"prefetch": {"kb:q": "prefetched", "credit:stale": "unused"}})
+    assert results == {"kb:q": "prefetched", "credit:x": "fetched"}
+    assert plan["kb:q"].calls == 0 and plan["credit:x"].calls == 1
+    assert retrieval.PREFETCH.value(result="hit") == hits + 1
+
+
+def test_prefetch_uses_the_income_the_classifier_is_recording():
+    state = {"filing_status": "single", "dependents": 0, "income_items": [], "total_income": 0,
+             "user_message": "My W-2 wages were $150,000"}
+    assert retrieval.classified(state)["total_income"] == 150000.0
+    plan = retrieval.lookups(retrieval.classified(state))
+    assert f"kb:{retrieval.deduction_query('single', 150000.0)}" in plan
+    assert not any(key.startswith("credit:") for key in plan)
+
+
+@pytest.mark.parametrize("fan_out, nodes", [("false", "classifier"), ("true", "classifier,retrieval")])
+def test_graph_has_the_retrieval_branch_only_when_fanning_out(fan_out, nodes):
+    # The graph is built when main is imported, so each setting needs its own process
+    code = ("import main; print(','.join(n for n in sorted(main.app.get_graph().nodes) "
+            "if n in ('classifier', 'retrieval')))")
+    env = {**os.environ, "AGENT_FAN_OUT": fan_out}
+    out = subprocess.run([sys.executable, "-c", code], cwd=AGENT_DIR, env=env, capture_output=True, text=True,
+                         check=True, timeout=60)
+    assert out.stdout.strip() == nodes
@@ -0,0 +1,62 @@
+import pytest
+
+from nodes.form_builder import form_builder_node
+from tools.scenarios import (
+    Scenario, eligible_filing_statuses, evaluate_scenarios, filing_alternatives, scenario_grid,
+)
+
+RETURN = {"filing_status": "single", "total_income": 85000, "standard_deduction": 15000, "itemized_total": 9000,
+          "use_standard": True, "total_withheld": 11000, "credits": 0, "dependents": 1}
+
+
+def test_matches_form_builder():
+    itemized = {**RETURN, "use_standard": False, "itemized_total": 21000}
+    (result,) = evaluate_scenarios(itemized, [Scenario(use_standard=False)])
+    expected = form_builder_node(itemized)
+    assert result.federal_tax == pytest.approx(expected["federal_tax"], abs=0.005)
+    assert result.estimated_refund == pytest.approx(expected["estimated_refund"], abs=0.005)
+    assert result.savings == 0
+
+
+def test_ranked_by_refund_with_savings_against_the_return_as_filed():
+    results = evaluate_scenarios(RETURN, scenario_grid(extra_credits=(0.0, 500.0, 2000.0)))
+    assert [r.scenario.extra_credits for r in results] == [2000.0, 500.0, 0.0]
+    assert [r.savings for r in results] == [2000.0, 500.0, 0.0]
+    refunds = [r.estimated_refund for r in results]
+    assert refunds == sorted(refunds, reverse=True)
+
+
+def test_ties_keep_the_given_order():
+    # Itemizing less than the standard deduction changes nothing when the larger is taken
+    scenarios = [Scenario(extra_deductions=1000.0), Scenario(), Scenario(extra_deductions=2000.0)]
+    assert [r.scenario for r in evaluate_scenarios(RETURN, scenarios)] == scenarios
+
+
+def test_unset_deduction_choice_takes_the_larger():
+    standard, itemized = evaluate_scenarios(RETURN, [Scenario(), Scenario(extra_deductions=10000.0)])[::-1]
+    assert standard.use_standard and standard.deduction == 15000
+    assert not itemized.use_standard and itemized.deduction == 19000
+    assert itemized.savings > 0
+
+
+def test_filing_alternatives_compares_eligible_statuses():
+    assert eligible_filing_statuses(RETURN) == ("single", "head_of_household")
+    assert eligible_filing_statuses({**RETURN, "dependents": 0}) == ("single",)
+    assert eligible_filing_statuses({"filing_status": "married_filing_separately"}) == (
+        "married_filing_separately", "married_filing_jointly")
+
+    best, filed = filing_alternatives(RETURN)
+    assert best.filing_status == "head_of_household" and best.savings > 0
+    assert filed.filing_status == "single" and filed.savings == 0
+    assert best.label == "Head of household"
+
+
+def test_label_describes_the_changes():
+    scenario = Scenario("married_filing_jointly", False, 2500, 0, -1000)
+    assert scenario.describe("single") == (
+        "Married filing jointly, itemized deductions, +$2,500 deductions, -$1,000 withholding")
+
+
+def test_unknown_filing_status_is_rejected():
+    with pytest.raises(ValueError, match="widowed"):
+        evaluate_scenarios(RETURN, [Scenario(filing_status="widowed")])
@@ -0,0 +1,104 @@
+import socket
+import threading
+import zlib
+
+import numpy as np
+import pytest
+
+import serialization
+from serialization import COMPRESSED, CODEC_JSON, CODEC_MSGPACK, MAGIC, decode_snapshot, encode_snapshot
+from state import DeductionItem, IncomeItem, ReviewFlag, new_session_state
+
+
+def session() -> dict:
+    state = new_session_state("s1", "My W-2 wages were $85,000")
+    state.update({
+        "filing_status": "single",
+        "income_items": [IncomeItem(source="W-2", type="w2", employer_name="Acme", amount=85000,
+                                    federal_withheld=9000)],
+        "deductions": [DeductionItem("charitable contributions", "Gifts to charity", 1200, 0.8, "Pub 526")],
+        "review_flags": [ReviewFlag("total_income", "85000", "Large change", 0.4)],
+        "node_memo": {"classifier": {"fingerprint": "ab12", "outputs": {"current_node": "classifier"}}},
+        "node_trace": [{"node": "intake", "ran": True}],
+        "prefetch": {"kb:q": "passage"},
+    })
+    return state
+
+
+@pytest.mark.parametrize("codec", [CODEC_MSGPACK, CODEC_JSON])
+def test_round_trip_drops_only_transient_fields(monkeypatch, codec):
+    if codec == CODEC_JSON:
+        monkeypatch.setattr(serialization, "MSGPACK_MODULE", None)
+    state = session()
+    blob = encode_snapshot(state)
+    assert blob[3] & ~COMPRESSED == codec
+    expected = {k: v for k, v in state.items() if k not in ("node_trace", "prefetch")}
+    assert decode_snapshot(blob) == expected
+
+
+def test_absent_fields_stay_absent():
+    assert decode_snapshot(encode_snapshot({"session_id": "s", "completed": True})) == {
+        "session_id": "s", "completed": True}
+
+
+def test_trailing_defaults_are_not_stored():
+    ledger = serialization._LAYOUTS[1][1]["income_items"]
+    assert ledger.row(IncomeItem(source="W-2", type="w2", amount=1)) == ["W-2", "w2", 1.0]
+    assert ledger.row(IncomeItem(source="W-2", type="w2", amount=1, state_withheld=2)) == [
+        "W-2", "w2", 1.0, None, 0.0, 2.0]
+
+
+def test_unknown_version_codec_or_magic_is_rejected():
+    blob = encode_snapshot(session())
+    with pytest.raises(ValueError, match="schema version: 9"):
+        decode_snapshot(blob[:2] + bytes((9,)) + blob[3:])
+    with pytest.raises(ValueError, match="codec: 5"):
+        decode_snapshot(blob[:3] + bytes((5,)) + blob[4:])
+    with pytest.raises(ValueError, match="Not a state snapshot"):
+        decode_snapshot(b"XX" + blob[2:])
+    with pytest.raises(ValueError, match="schema version"):
+        encode_snapshot(session(), version=9)
+
+
+def test_bodies_past_the_threshold_are_compressed(monkeypatch):
+    small = {"session_id": "s"}
+    assert not encode_snapshot(small)[3] & COMPRESSED
+
+    blob = encode_snapshot(session())
+    assert blob[:2] == MAGIC and blob[3] & COMPRESSED
+    zlib.decompress(blob[4:])
+
+    monkeypatch.setattr(serialization, "SNAPSHOT_COMPRESS_MIN", 1 << 20)
+    assert not encode_snapshot(session())[3] & COMPRESSED
+
+
+def test_msgpack_snapshot_needs_msgpack_to_decode(monkeypatch):
+    blob = encode_snapshot(session())
+    monkeypatch.setattr(serialization, "MSGPACK_MODULE", None)
+    with pytest.raises(RuntimeError, match="msgpack"):
+        decode_snapshot(blob)
+
+
+def test_dumps_encodes_ledger_items_and_numpy():
+    body = serialization.dumps({"item": ReviewFlag("f", "v", "r", 0.5), "tax": np.float64(1.5), "n": np.int64(2)})
+    assert serialization.loads(body) == {
+        "item": {"field_name": "f", "field_value": "v", "reason": "r", "confidence": 0.5}, "tax": 1.5, "n": 2}
+
+
+@pytest.mark.parametrize("size", [100, 4 << 20])
+def test_send_buffers_delivers_every_byte_in_order(size):
+    head, body = b"HTTP/1.1 200 OK\r\n\r\n", bytes(range(256)) * (size // 256)
+    left, right = socket.socketpair()
+    received = bytearray()
+
+    def read():
+        while chunk := right.recv(1 << 16):
+            received.extend(chunk)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    with left:
+        serialization.send_buffers(left, [head, body])
+    reader.join(timeout=10)
+    right.close()
+    assert bytes(received) == head + body
@@ -0,0 +1,111 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from session_store import (
+    MemorySessionStore, PostgresSessionStore, SQLiteSessionStore, SessionStore, create_session_store,
+)
+from state import TRANSIENT_FIELDS, IncomeItem, new_session_state
+
+
+def test_backend_missing_a_method_cannot_be_created():
+    class Partial(SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def postgres_store(ttl: float) -> PostgresSessionStore:
+    pytest.importorskip("psycopg")
+    dsn = os.environ.get("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    store = PostgresSessionStore(dsn, ttl=ttl)
+    store._conn().execute(
+        "CREATE TABLE IF NOT EXISTS agent_sessions ("
+        " session_id VARCHAR(64) PRIMARY KEY, state BYTEA NOT NULL, updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW())"
+    )
+    return store
+
+
+@pytest.fixture(params=["memory", "sqlite", "postgres"])
+def make_store(request, tmp_path):
+    def make(ttl: float = 3600) -> SessionStore:
+        if request.param == "memory":
+            return MemorySessionStore(ttl=ttl)
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=ttl)
+        return postgres_store(ttl)
+    return make
+
+
+def session(session_id: str) -> dict:
+    state = new_session_state(session_id, "My W-2 wages were $50,000")
+    state["income_items"] = [IncomeItem(source="W-2", type="w2", amount=50000)]
+    # What a store gives back: per-turn fields aren't stored
+    return {key: value for key, value in state.items() if key not in TRANSIENT_FIELDS}
+
+
+def test_round_trip(make_store):
+    store, session_id = make_store(), uuid.uuid4().hex
+    assert store.get(session_id) is None
+    store.put(session_id, session(session_id))
+    assert store.get(session_id) == session(session_id)
+
+    updated = {**session(session_id), "filing_status": "single"}
+    store.put(session_id, updated)
+    assert store.get(session_id)["filing_status"] == "single"
+    assert store.stats()["sessions"] >= 1 and store.stats()["bytes"] > 0
+
+    store.delete(session_id)
+    assert store.get(session_id) is None
+
+
+def test_idle_sessions_expire(make_store):
+    store, session_id = make_store(ttl=0.2), uuid.uuid4().hex
+    store.put(session_id, session(session_id))
+    assert store.get(session_id) is not None
+    time.sleep(0.3)
+    assert store.get(session_id) is None
+
+
+def test_sqlite_sessions_are_shared_between_stores(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path).put("s1", session("s1"))
+    assert SQLiteSessionStore(path).get("s1") == session("s1")
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_entries=2)
+    for session_id in ("a", "b"):
+        store.put(session_id, session(session_id))
+    store.get("a")
+    store.put("c", session("c"))
+    assert store.get("b") is None and store.get("a") and store.get("c")
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_memory_store_keeps_under_its_byte_cap():
+    probe = MemorySessionStore()
+    probe.put("a", session("a"))
+    size = probe.stats()["bytes"]
+
+    store = MemorySessionStore(max_bytes=int(size * 2.5))
+    for session_id in "abcd":
+        store.put(session_id, session(session_id))
+    stats = store.stats()
+    assert stats["sessions"] == 2 and stats["bytes"] <= size * 2.5
+    assert stats["evictions"]["memory"] == 2 and stats["eviction_rate"] == 0.5
+
+
+def test_create_session_store_selects_the_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_STORE", "sqlite")
+    monkeypatch.setenv("SESSION_STORE_PATH", str(tmp_path / "s.db"))
+    assert isinstance(create_session_store(), SQLiteSessionStore)
+    monkeypatch.setenv("SESSION_STORE", "redis")
+    with pytest.raises(ValueError, match="redis"):
+        create_session_store()
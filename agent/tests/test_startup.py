@@ -0,0 +1,30 @@
+import fast_path
+import main
+import metrics
+from nodes import retrieval
+
+
+def turn_metrics() -> list[str]:
+    # Warm-up fills the caches on purpose, so their size and misses do change
+    return [line for line in metrics.render().splitlines() if not line.startswith("taxpilot_cache_")]
+
+
+def test_warm_turn_leaves_turn_metrics_untouched():
+    before = turn_metrics()
+    result = main.warm_turn()
+    assert result["current_node"] == "review"
+    assert turn_metrics() == before
+
+
+def test_warm_turn_counts_once_suppression_ends():
+    skips = fast_path.LLM_SKIPS.total()
+    calls = metrics.NODE_CALLS.value(node="intake")
+    main.warm_turn()
+    with metrics.suppressed():
+        assert not metrics.recording()
+    assert metrics.recording()
+    main.app.invoke(main.new_session_state("counted", main.WARM_UP_MESSAGE),
+                    main.turn_config(None, fast_path="conservative"))
+    assert fast_path.LLM_SKIPS.total() == skips + 1
+    assert metrics.NODE_CALLS.value(node="intake") == calls + 1
+    assert retrieval.PREFETCH.total() > 0
@@ -0,0 +1,64 @@
+import pytest
+
+from batch import filer_state
+from cards import render_cards
+from nodes import classifier
+from nodes.classifier import classifier_node
+from serialization import decode_snapshot, encode_snapshot
+from state import IncomeItem, item_dict, new_session_state
+
+
+def test_batch_income_amounts_are_coerced_to_float():
+    state = filer_state({"filing_status": "single", "income_items": [
+        {"type": "w2", "employer_name": "Acme", "amount": "85000", "federal_withheld": "9000"},
+    ]}, 0)
+    (item,) = state["income_items"]
+    assert item.amount == 85000.0 and isinstance(item.amount, float)
+    assert item.federal_withheld == 9000.0
+
+
+def test_unknown_income_type_is_rejected():
+    with pytest.raises(ValueError, match="income type"):
+        filer_state({"filing_status": "single", "income_items": [{"type": "salary", "amount": 1}]}, 0)
+
+
+def test_snapshot_round_trips_income_items():
+    state = filer_state({"filing_status": "single", "income_items": [
+        {"type": "1099", "amount": 1200, "employer_name": "Client"},
+    ]}, 0)
+    assert decode_snapshot(encode_snapshot(state))["income_items"] == [
+        IncomeItem(source="1099", type="1099", employer_name="Client", amount=1200.0),
+    ]
+
+
+def test_ledger_items_are_slotted():
+    item = IncomeItem(source="W-2", type="w2", amount=1)
+    assert not hasattr(item, "__dict__")
+    with pytest.raises(AttributeError):
+        item.note = "x"
+
+
+def test_item_dict_can_leave_out_defaults():
+    item = IncomeItem(source="W-2", type="w2", amount=1)
+    assert item_dict(item, exclude_defaults=True) == {"source": "W-2", "type": "w2", "amount": 1.0}
+    assert item_dict(item)["federal_withheld"] == 0
+
+
+def test_nodes_return_only_the_fields_they_change():
+    state = new_session_state("s", "hello")
+    update = classifier_node(state)
+    assert "income_items" not in update
+    assert set(update) <= set(classifier.SPEC.writes)
+
+    state["user_message"] = "My W-2 wages were $50,000"
+    assert set(classifier_node(state)) == set(classifier.SPEC.writes)
+
+
+def test_cards_are_rendered_from_state_not_stored():
+    state = new_session_state("s", "My W-2 wages were $50,000")
+    assert "cards" not in state
+    state.update(classifier_node(state))
+    cards = render_cards(state)
+    assert [card["type"] for card in cards] == ["income_card", "progress_card"]
+    assert cards[0]["data"]["wages"] == 50000.0
+    assert render_cards(state, "unknown") == []
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import main
+import nodes.intake as intake
+from aserver import AsyncAgentServer
+
+MESSAGE = "I need help understanding my taxes, what do I do first?"
+
+
+def events(stream: list[bytes]) -> list[str]:
+    return [event.split(b"\n", 1)[0].removeprefix(b"event: ").decode() for event in stream]
+
+
+async def collect(session_id: str) -> list[bytes]:
+    return [event async for event in main.astream_turn(session_id, MESSAGE)]
+
+
+def test_mid_stream_failure_discards_the_partial_reply(monkeypatch):
+    async def failing(*args):
+        yield "Hello"
+        raise RuntimeError("model went away")
+
+    monkeypatch.setattr(intake, "astream_complete", failing)
+    stream = asyncio.run(collect("stream-discard"))
+    assert events(stream) == ["token", "discard", "token", "node", "done"]
+    fallback = main.serialization.loads(stream[2].split(b"data: ", 1)[1])["text"]
+    assert fallback in stream[-1].decode()
+
+
+def test_failure_before_any_token_streams_only_the_fallback(monkeypatch):
+    async def failing(*args):
+        raise RuntimeError("model went away")
+        yield
+
+    monkeypatch.setattr(intake, "astream_complete", failing)
+    assert events(asyncio.run(collect("stream-no-tokens"))) == ["token", "node", "done"]
+
+
+class DisconnectingWriter:
+    """A client that goes away after the response head and first event."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def write(self, data: bytes) -> None:
+        self.writes += 1
+
+    async def drain(self) -> None:
+        if self.writes > 1:
+            raise ConnectionResetError
+
+
+def test_disconnect_releases_the_session_lock(monkeypatch):
+    async def slow(*args):
+        for word in ("One", " two", " three"):
+            yield word
+            await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(intake, "astream_complete", slow)
+
+    async def run():
+        lock = main._session_locks["stream-disconnect"] = asyncio.Lock()
+        server = AsyncAgentServer(main.arun_turn, main.astream_turn)
+        body = main.serialization.dumps({"session_id": "stream-disconnect", "message": MESSAGE})
+        with pytest.raises(ConnectionResetError):
+            await server.stream(DisconnectingWriter(), body)
+        assert not lock.locked()
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+from bisect import bisect_left
+
+import numpy as np
+import pytest
+
+from tools.tax_batch import FILING_STATUS_CODES, calculate_federal_tax_batch, encode_filing_statuses
+from tools.tax_calculator import (
+    calculate_effective_rate, calculate_federal_tax, calculate_marginal_rate, get_schedule,
+)
+from tools.tax_tables import FILING_STATUSES
+
+
+# Single filer incomes whose tax is a half cent, where np.round(tax, 2) and round(tax, 2) disagree
+TIES = [0.15, 0.25, 1.15, 48476.25, 48476.75, 626350.5, 626352.5]
+
+
+def edge_incomes(filing_status: str) -> list[float]:
+    """Every bracket edge, a cent and a half cent either side of it, and half-cent ties."""
+    incomes = [0.0, -100.0, 0.01, 0.05, 1_000_000.0, *TIES]
+    for low in get_schedule(filing_status).lows[1:]:
+        incomes += [low, low - 0.01, low + 0.01, low - 0.005, low + 0.005, low + 0.25, low + 0.75]
+    return incomes
+
+
+def test_ties_are_rounded_like_the_scalar_function():
+    taxes = calculate_federal_tax_batch(TIES, "single")["federal_tax"]
+    assert taxes.tolist() == [calculate_federal_tax(income, "single") for income in TIES]
+    # np.round alone would get these wrong
+    schedule = get_schedule("single")
+    unrounded = []
+    for income in TIES:
+        i = bisect_left(schedule.lows, income) - 1
+        unrounded.append(schedule.base_tax[i] + (income - schedule.lows[i]) * schedule.rates[i])
+    assert np.round(unrounded, 2).tolist() != taxes.tolist()
+
+
+@pytest.mark.parametrize("filing_status", FILING_STATUSES)
+def test_batch_matches_scalar_to_the_cent_on_edges_and_ties(filing_status):
+    incomes = edge_incomes(filing_status)
+    result = calculate_federal_tax_batch(incomes, filing_status)
+    for i, income in enumerate(incomes):
+        assert result["federal_tax"][i] == calculate_federal_tax(income, filing_status), income
+        assert result["marginal_rate"][i] == calculate_marginal_rate(income, filing_status), income
+        assert result["effective_rate"][i] == pytest.approx(calculate_effective_rate(income, filing_status)), income
+
+
+def test_batch_matches_scalar_on_random_mixed_statuses():
+    rng = np.random.default_rng(7)
+    incomes = np.round(rng.uniform(-1_000, 900_000, 5_000), 2)
+    statuses = rng.choice(FILING_STATUSES, incomes.size)
+    taxes = calculate_federal_tax_batch(incomes, statuses)["federal_tax"]
+    expected = [calculate_federal_tax(float(income), str(status)) for income, status in zip(incomes, statuses)]
+    assert taxes.tolist() == expected
+
+
+def test_statuses_may_be_codes_or_a_scalar():
+    incomes = [50_000.0, 150_000.0]
+    by_name = calculate_federal_tax_batch(incomes, "head_of_household")["federal_tax"]
+    by_code = calculate_federal_tax_batch(incomes, [FILING_STATUS_CODES["head_of_household"]] * 2)["federal_tax"]
+    assert by_name.tolist() == by_code.tolist()
+
+
+@pytest.mark.parametrize("statuses", [["single", "married"], [0, len(FILING_STATUSES)]])
+def test_unknown_filing_status_is_rejected(statuses):
+    with pytest.raises(ValueError):
+        encode_filing_statuses(statuses)
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import tools.tax_tables as tax_tables
+from tools.tax_calculator import calculate_state_tax, get_standard_deduction
+from tools.tax_tables import FILING_STATUSES, _load, available, get_table
+
+
+@pytest.fixture
+def tables_dir(tmp_path, monkeypatch):
+    """An empty TAX_TABLES_DIR, with the registry's caches cleared around the test."""
+    monkeypatch.setattr(tax_tables, "TAX_TABLES_DIR", tmp_path)
+    _load.cache_clear()
+    available.cache_clear()
+    yield tmp_path
+    _load.cache_clear()
+    available.cache_clear()
+
+
+def write_table(root, year: int, jurisdiction: str, data: dict) -> None:
+    (root / str(year)).mkdir(exist_ok=True)
+    (root / str(year) / f"{jurisdiction}.json").write_text(json.dumps(data))
+
+
+def test_star_and_status_references_expand_to_every_status(tables_dir):
+    write_table(tables_dir, 2030, "US", {
+        "brackets": {"single": [[0, 0.1], [10000, 0.2]], "married_filing_jointly": [[0, 0.1]],
+                     "qualifying_widow": "married_filing_jointly", "*": "single"},
+        "standard_deduction": {"*": 1000, "married_filing_jointly": 2000},
+    })
+    table = get_table(2030)
+    assert set(table.schedules) == set(FILING_STATUSES)
+    assert table.schedule("qualifying_widow").lows == table.schedule("married_filing_jointly").lows
+    assert table.schedule("head_of_household").lows == (0, 10000)
+    assert table.standard_deduction("married_filing_jointly") == 2000
+    assert table.standard_deduction("head_of_household") == 1000
+
+
+def test_state_without_a_standard_deduction(tables_dir):
+    write_table(tables_dir, 2030, "CO", {"brackets": {"*": [[0, 0.044]]}})
+    assert get_standard_deduction("single", 2030, "co") == 0.0
+    assert calculate_state_tax(50_000, "CO", "single", 2030) == 2200.0
+
+
+def test_missing_year_or_jurisdiction_is_a_value_error(tables_dir):
+    write_table(tables_dir, 2030, "US", {"brackets": {"*": [[0, 0.1]]}})
+    with pytest.raises(ValueError, match="No tax table for CA"):
+        get_table(2030, "CA")
+    with pytest.raises(ValueError, match="tax year 2031"):
+        get_table(2031)
+
+
+def test_table_missing_a_status_is_rejected(tables_dir):
+    write_table(tables_dir, 2030, "US", {"brackets": {"single": [[0, 0.1]]}})
+    with pytest.raises(ValueError, match="no brackets for married_filing_jointly"):
+        get_table(2030)
+
+
+def test_tables_load_lazily_and_once(tables_dir):
+    write_table(tables_dir, 2030, "US", {"brackets": {"*": [[0, 0.1]]}})
+    write_table(tables_dir, 2030, "TX", {"brackets": {"*": [[0, 0]]}})
+    assert available() == {2030: ("TX", "US")}
+    assert _load.cache_info().currsize == 0
+    assert get_table(2030, "tx") is get_table(2030, "TX")
+
+
+def test_shipped_tables_cover_every_status():
+    for year, jurisdictions in available().items():
+        for jurisdiction in jurisdictions:
+            assert set(get_table(year, jurisdiction).schedules) == set(FILING_STATUSES)
@@ -0,0 +1,332 @@
+"""Single-pass extraction of intake and income fields from a user message.
+
+One combined regex, compiled at import, scans the message once. Every match
+is a token: a filing-status phrase, a name introduction, a state of
+residence, a dependents count, an income or withholding keyword, a dollar
+amount or a clause separator. A linear pass over the tokens then resolves
+them:
+
+- filing status: the most specific status mentioned. A bare "married" needs
+  "jointly" or "separately" somewhere in the message.
+- amounts: each one takes the type of the nearest keyword in its clause,
+  preferring specific keywords ("freelance", "W-2", "withheld") over generic
+  ones ("earned", "made"). When the message names no income type at all,
+  the largest untyped amount counts as W-2 wages.
+- amounts of $100 or less, and bare years such as 2024, are ignored.
+
+``extract`` is memoized per message, because intake and the classifier both
+parse each turn's message.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+US_STATES = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR", "California": "CA",
+    "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE", "District of Columbia": "DC", "Florida": "FL",
+    "Georgia": "GA", "Hawaii": "HI", "Idaho": "ID", "Illinois": "IL", "Indiana": "IN", "Iowa": "IA",
+    "Kansas": "KS", "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
+    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN", "Mississippi": "MS", "Missouri": "MO",
+    "Montana": "MT", "Nebraska": "NE", "Nevada": "NV", "New Hampshire": "NH", "New Jersey": "NJ",
+    "New Mexico": "NM", "New York": "NY", "North Carolina": "NC", "North Dakota": "ND", "Ohio": "OH",
+    "Oklahoma": "OK", "Oregon": "OR", "Pennsylvania": "PA", "Rhode Island": "RI", "South Carolina": "SC",
+    "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX", "Utah": "UT", "Vermont": "VT",
+    "Virginia": "VA", "Washington": "WA", "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY",
+}
+_STATE_CODES = set(US_STATES.values())
+_STATE_NAMES = {name.lower(): code for name, code in US_STATES.items()}
+
+# IncomeItem.source for each income type
+INCOME_SOURCES = {
+    "w2": "W-2 Employment",
+    "1099": "1099 Contract Work",
+    "self_employment": "Self-Employment",
+    "investment": "Investment Income",
+    "rental": "Rental Income",
+    "other": "Other Income",
+}
+
+_NUMBER_WORDS = {
+    "no": 0, "zero": 0, "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "mm": 1e6, "million": 1e6}
+
+# Words that follow "I'm" / "I am" without being a name
+_NOT_NAMES = {
+    "single", "married", "filing", "head", "widow", "widower", "qualifying", "self", "a", "an", "the",
+    "not", "also", "just", "still", "here", "so", "very", "currently", "retired", "unemployed",
+}
+
+# Keyword kinds, tried in this order at each position; the w2/generic split
+# lets a specific keyword win over "earned" when both are equally near
+_KEYWORDS = {
+    # Amounts that are payments, not income: they claim the amount so it isn't taken for wages
+    "skip": r"401\s?\(?k\)?|403\s?\(?b\)?|529\s+plan|ira\s+contribution\w*|mortgage(?:\s+interest)?\b"
+            r"|student\s+loan(?:\s+interest)?\b|donat\w*|charit\w*|contribut\w*|medical\b|tuition\b"
+            r"|property\s+tax(?:es)?\b|day\s?care\b|child\s?care\b|deduct\w*",
+    "form_1099": r"1099(?:-?(?:nec|misc|k|int|div|b|r|g))?\b",
+    "w2": r"w-?2s?\b|wages?\b|salary\b|salaries\b|paychecks?\b|bonus(?:es)?\b|employer\b|job\b",
+    "1099": r"freelanc\w*|contract(?:or|ing)\b|consult\w*|side\s+(?:gig|hustle|job)\b|gig\s+work\b",
+    "self_employment": r"self[-\s]?employ\w*|(?:my\s+(?:own\s+)?)business\b|sole\s+proprietor\w*|schedule\s+c\b",
+    "investment": r"interest\b|dividends?\b|capital\s+gains?\b|stocks?\b|brokerage\b|crypto\w*",
+    "rental": r"rental\b|rent(?:ed|ing)?\s+out\b|tenants?\b|landlord\b",
+    "other": r"unemployment\b|pension\b|social\s+security\b|retirement\b|alimony\b|gambling\b|lottery\b",
+    "state_withheld": r"state\s+(?:income\s+)?(?:tax(?:es)?\s+)?withh[eo]ld(?:ing)?\b|state\s+tax(?:es)?\b",
+    "federal_withheld": r"(?:federal\s+(?:income\s+)?(?:tax(?:es)?\s+)?)?withh[eo]ld(?:ing)?\b"
+                        r"|federal\s+tax(?:es)?\b|taken\s+out\b",
+    "generic": r"earn(?:ed|ings?)?\b|made\b|make\b|income\b|paid\b|got\b|received\b",
+}
+_FORM_TYPES = {"nec": "1099", "misc": "1099", "k": "1099", "int": "investment", "div": "investment",
+               "b": "investment", "r": "other", "g": "other", "": "1099"}
+
+_NOT_NAME_ALT = "|".join(sorted(_NOT_NAMES | set(_STATE_NAMES), key=len, reverse=True))
+_STATE_NAME_ALT = "|".join(sorted((re.escape(n) for n in _STATE_NAMES), key=len, reverse=True))
+_STATE_CODE_ALT = "|".join(code.lower() for code in _STATE_CODES)
+
+# Prefixes of every token that starts with a word. Only word starts matching
+# one (as a trie regex) try the token alternatives, so most words cost a
+# single failed check; each new keyword needs its prefix here.
+_TRIGGERS = (
+    "and", "plus", "but", "also",
+    "fil", "joint", "mfj", "separate", "mfs", "married", "head", "hoh", "qualifying", "widow", "surviving", "single",
+    "my ", "name", "i'm", "i’m", "i am", "this is", "call me",
+    "live", "living", "lives", "reside", "resident", "moved", "based", "from", "in ",
+    *{name.split()[0] for name in _STATE_NAMES},
+    "dependent", "no ", "zero", "a ", "an ", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "ira", "mortgage", "student", "donat", "charit", "contribut", "medical", "tuition", "property", "day", "child",
+    "deduct", "w2", "w-2", "wage", "salar", "paycheck", "bonus", "employer", "job", "freelanc", "contract",
+    "consult", "side", "gig", "self", "business", "sole", "schedule", "interest", "dividend", "capital", "stock",
+    "brokerage", "crypto", "rental", "rent", "tenant", "landlord", "unemployment", "pension", "social",
+    "retirement", "alimony", "gambling", "lottery", "state", "federal", "withh", "taken", "earn", "made", "make",
+    "income", "paid", "got", "received",
+)
+
+
+def _trie(words) -> str:
+    """Regex matching any of words, factored into a prefix tree so failing is cheap."""
+    root: dict = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(root)
+
+
+# Scans the lower-cased message: case-insensitive matching is several times
+# slower in re. Names and state codes, where case matters, are checked
+# against the original text afterwards. Every token but a separator starts at
+# a "$", a digit or a trigger word, so one check rejects every other position.
+_TOKEN = re.compile(
+    r"(?P<sep>[.;!?\n,])|(?:(?=\$)|\b(?=\d|" + _trie(_TRIGGERS) + "))(?:" + "|".join([
+        r"(?P<conj>and|plus|but|also)\b",
+        # Filing status
+        r"(?P<joint>(?:fil(?:e|ing)\s+)?joint(?:ly)?|mfj)\b",
+        r"(?P<separate>(?:fil(?:e|ing)\s+)?separate(?:ly)?|mfs)\b",
+        r"(?P<married>married)\b",
+        r"(?P<hoh>head\s+of\s+(?:the\s+)?household|hoh)\b",
+        r"(?P<widow>(?:qualifying\s+)?(?:widow(?:er)?|surviving\s+spouse))\b",
+        r"(?P<single>single)\b",
+        # Name: only the introduction is consumed, so the name's words are still scanned
+        r"(?:my\s+name\s+is|my\s+name's|name\s*:)\s+(?=(?P<name_given>[a-z][a-z'’-]*))",
+        rf"(?:i'm|i’m|i\s+am|this\s+is|call\s+me)\s+(?!(?:{_NOT_NAME_ALT})\b)(?=(?P<name_intro>[a-z][a-z'’-]+))",
+        # State of residence
+        r"(?:live\s+in|living\s+in|lives\s+in|reside\s+in|resident\s+of|moved\s+to|based\s+in|from|in)\s+"
+        rf"(?:the\s+state\s+of\s+)?(?:(?P<state_name>{_STATE_NAME_ALT})|(?P<state_code>{_STATE_CODE_ALT}))\b",
+        rf"(?P<state_resident>{_STATE_NAME_ALT})(?=\s+resident\b)",
+        # Dependents
+        r"dependents?\s*[:=]\s*(?P<dep_number>\d{1,2})\b",
+        r"(?P<dep_count>\d{1,2}|no|zero|a|an|one|two|three|four|five|six|seven|eight|nine|ten)\s+"
+        r"(?:(?:young|little|minor|small|qualifying|dependent)\s+)?"
+        r"(?P<dep_noun>kids?|children|child|dependents?|sons?|daughters?)\b",
+        # Income and withholding keywords
+        *(rf"(?P<kw_{kind}>{pattern})" for kind, pattern in _KEYWORDS.items()),
+        # Dollar amounts: $-prefixed, comma-grouped, or with a k/thousand/million suffix
+        r"(?P<amount>\$\s?\d+(?:,\d{3})*(?:\.\d+)?|\d{1,3}(?:,\d{3})+(?:\.\d+)?"
+        r"|\d+(?:\.\d+)?(?=\s?(?:k|thousand|m|mm|million)\b)|\d{3,}(?:\.\d+)?\b)"
+        r"(?:\s?(?P<multiplier>k|thousand|mm|m|million)\b)?",
+    ]) + ")"
+)
+# Capitalized words continuing a name in the original text; after "my name
+# is", words of any case, since the filer has said a name follows
+_NAME_TAIL = re.compile(r"(?:\s+[A-Z][a-z'’-]+){0,2}")
+_GIVEN_NAME_TAIL = re.compile(r"(?:\s+[A-Za-z][A-Za-z'’-]*\b){0,2}")
+_WORD = re.compile(r"\S+")
+# Lower-case words that end a given name without being a field of their own
+_NAME_STOPS = frozenset({
+    "and", "or", "but", "plus", "i", "i'm", "i’m", "im", "from", "in", "at", "of", "with", "my", "we",
+    "who", "is", "was", "here", "live", "living", "work", "working",
+})
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+@dataclass(frozen=True, slots=True)
+class IncomeAmount:
+    type: str
+    source: str
+    amount: float
+
+
+@dataclass(frozen=True, slots=True)
+class Extraction:
+    filing_status: str | None = None
+    name: str | None = None
+    state: str | None = None
+    dependents: int | None = None
+    income: tuple[IncomeAmount, ...] = ()
+    federal_withheld: float | None = None
+    state_withheld: float | None = None
+    # Every amount over $100, in message order
+    amounts: tuple[float, ...] = ()
+
+
+def _amount(match: re.Match) -> float | None:
+    text = match.group("amount")
+    digits = text.lstrip("$ ").replace(",", "")
+    value = float(digits)
+    multiplier = match.group("multiplier")
+    if multiplier:
+        value *= _MULTIPLIERS[multiplier]
+    elif not text.startswith("$") and "," not in text and "." not in digits and 1900 <= value <= 2100:
+        return None  # a year
+    return value if value > 100 else None
+
+
+def _name(message: str, lower: str, start: int, end: int, given: bool) -> str | None:
+    """The name starting at message[start:end], extended by up to two following words.
+
+    After "I'm" the first word must be capitalized, or "I'm moving" would give
+    a name, and so must the words that continue it. After "my name is" case
+    doesn't matter ("my name is john smith"): the name runs to punctuation, a
+    word like "and", or a word the scanner reads as a field.
+    """
+    if not given and not message[start].isupper():
+        return None
+    tail = (_GIVEN_NAME_TAIL if given else _NAME_TAIL).match(message, end).end()
+    words = [message[start:end]]
+    for match in _WORD.finditer(message, end, tail):
+        word = match.group()
+        if word.islower() and (word in _NAME_STOPS or _TOKEN.match(lower, match.start())):
+            break
+        words.append(word)
+    # Keep the name up to the first word that can't be part of one
+    for i, word in enumerate(words):
+        if word.lower() in _NOT_NAMES or word.lower() in _STATE_NAMES:
+            words = words[:i]
+            break
+    return " ".join(words) or None
+
+
+def _filing_status(found: set[str]) -> str | None:
+    if "joint" in found and ("married" in found or "filing_joint" in found):
+        return "married_filing_jointly"
+    if "separate" in found and ("married" in found or "filing_separate" in found):
+        return "married_filing_separately"
+    for status, key in (("head_of_household", "hoh"), ("qualifying_widow", "widow"), ("single", "single")):
+        if key in found:
+            return status
+    return None
+
+
+@lru_cache(maxsize=4096)
+def extract(message: str) -> Extraction:
+    """Everything the message states about the filer and their income."""
+    statuses: set[str] = set()
+    name = state = None
+    dependents: int | None = None
+    # (clause, sentence, position, kind, detail) for keywords; amounts likewise with their value
+    keywords: list[tuple[int, int, int, str, str]] = []
+    amounts: list[tuple[int, int, int, float]] = []
+    clause = sentence = 0
+
+    lower = message.lower()
+    if len(lower) != len(message):  # a few non-ASCII letters lower-case to two characters
+        lower = message.translate(_ASCII_LOWER)
+
+    for match in _TOKEN.finditer(lower):
+        kind = match.lastgroup
+        if kind == "sep" or kind == "conj":
+            clause += 1
+            if match.group() in ".;!?\n":
+                sentence += 1
+        elif kind in ("joint", "separate"):
+            statuses.add(kind)
+            if match.group().startswith("fil"):
+                statuses.add(f"filing_{kind}")
+        elif kind in ("married", "hoh", "widow", "single"):
+            statuses.add(kind)
+        elif kind in ("name_given", "name_intro"):
+            name = name or _name(message, lower, *match.span(kind), given=kind == "name_given")
+        elif kind == "state_code":
+            # "in OR" is Oregon, "in or" isn't
+            if message[slice(*match.span(kind))].isupper():
+                state = state or match.group(kind).upper()
+        elif kind in ("state_name", "state_resident"):
+            state = state or _STATE_NAMES[" ".join(match.group(kind).split())]
+        elif kind == "dep_number":
+            dependents = int(match.group(kind))
+        elif kind == "dep_noun":
+            count = match.group("dep_count")
+            count = int(count) if count.isdigit() else _NUMBER_WORDS[count]
+            dependents = count if count == 0 else (dependents or 0) + count
+        elif kind == "multiplier" or kind == "amount":
+            value = _amount(match)
+            if value is not None:
+                amounts.append((clause, sentence, match.start(), value))
+        elif kind.startswith("kw_"):
+            keywords.append((clause, sentence, match.start(), kind[3:], match.group()))
+
+    income: list[IncomeAmount | None] = []
+    bare: list[tuple[int, float]] = []
+    federal_withheld = state_withheld = None
+    for amount_clause, amount_sentence, position, value in amounts:
+        best = None
+        for kw_clause, kw_sentence, kw_position, kw_kind, text in keywords:
+            if kw_sentence != amount_sentence:
+                continue
+            # Same clause first, then nearest; generic keywords lose ties to specific ones
+            score = (kw_clause != amount_clause, abs(kw_position - position) + (40 if kw_kind == "generic" else 0))
+            if best is None or score < best[0]:
+                best = (score, kw_kind, text)
+
+        kw_kind = best[1] if best else None
+        if kw_kind == "federal_withheld":
+            federal_withheld = federal_withheld if federal_withheld is not None else value
+        elif kw_kind == "state_withheld":
+            state_withheld = state_withheld if state_withheld is not None else value
+        elif kw_kind == "form_1099":
+            form = best[2].replace("-", "")[4:]
+            income.append(IncomeAmount(_FORM_TYPES[form], f"1099-{form.upper()}" if form else "1099", value))
+        elif kw_kind in INCOME_SOURCES:
+            income.append(IncomeAmount(kw_kind, INCOME_SOURCES[kw_kind], value))
+        elif kw_kind == "generic":
+            income.append(IncomeAmount("w2", INCOME_SOURCES["w2"], value))
+        elif kw_kind is None:
+            bare.append((len(income), value))
+            income.append(None)
+
+    # With no stated income at all, the largest bare amount is taken to be wages
+    if bare and len(bare) == len(income):
+        index, value = max(bare, key=lambda b: b[1])
+        income[index] = IncomeAmount("w2", INCOME_SOURCES["w2"], value)
+
+    return Extraction(
+        filing_status=_filing_status(statuses),
+        name=name,
+        state=state,
+        dependents=dependents,
+        income=tuple(item for item in income if item is not None),
+        federal_withheld=federal_withheld,
+        state_withheld=state_withheld,
+        amounts=tuple(value for *_, value in amounts),
+    )
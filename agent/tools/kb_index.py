@@ -0,0 +1,233 @@
+"""In-process BM25 retrieval over the knowledge-base/*.md files.
+
+The markdown files are chunked by heading and indexed into flat arrays
+(CSR postings: per-term offsets into doc-id and term-frequency arrays). The
+index can be persisted with ``KB_INDEX_PATH``; later starts memory-map it
+instead of re-chunking, and rebuild if the source files changed.
+"""
+
+import os
+import re
+import json
+import math
+import mmap
+import heapq
+import struct
+import hashlib
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+
+KB_DIR = Path(os.environ.get("KB_DIR", Path(__file__).resolve().parents[2] / "knowledge-base"))
+KB_INDEX_PATH = os.environ.get("KB_INDEX_PATH", "")
+
+_MAGIC = b"TPKBIDX1"
+_TOKEN = re.compile(r"[a-z0-9]+")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have if in is it its of on or that the "
+    "this to was were will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_markdown(path: Path) -> list[dict]:
+    """Split a markdown file into one chunk per heading with a non-empty body."""
+    chunks = []
+    trail: list[str] = []
+    body: list[str] = []
+
+    def flush():
+        text = "\n".join(body).strip()
+        if trail and text:
+            chunks.append({
+                "text": f"{trail[-1]}\n{text}",
+                "metadata": {"source": path.name, "heading": trail[-1], "path": " > ".join(trail)},
+            })
+
+    for line in path.read_text(encoding="utf-8").splitlines():
+        match = _HEADING.match(line)
+        if match:
+            flush()
+            level = len(match.group(1))
+            trail = trail[:level - 1] + [match.group(2).strip()]
+            body = []
+        else:
+            body.append(line)
+    flush()
+    return chunks
+
+
+def _fingerprint(files: list[Path]) -> str:
+    digest = hashlib.sha1()
+    for f in files:
+        stat = f.stat()
+        digest.update(f"{f.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+class KBIndex:
+    """Okapi BM25 over heading chunks, stored in compact typed arrays."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, docs: list[dict], vocab: dict[str, int], offsets, doc_ids, tfs,
+                 doc_len, idf, avgdl: float, fingerprint: str = ""):
+        self.docs = docs
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.idf = idf
+        self.avgdl = avgdl
+        self.fingerprint = fingerprint
+        # Per-document BM25 length normalization, precomputed
+        self._norm = [self.K1 * (1 - self.B + self.B * dl / avgdl) for dl in doc_len] if avgdl else []
+
+    @classmethod
+    def build(cls, docs: list[dict], fingerprint: str = "") -> "KBIndex":
+        postings: dict[str, dict[int, int]] = {}
+        doc_len = array("I")
+        for doc_id, doc in enumerate(docs):
+            tokens = tokenize(doc["text"])
+            doc_len.append(len(tokens))
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+
+        vocab = {term: i for i, term in enumerate(sorted(postings))}
+        offsets, doc_ids, tfs, idf = array("I", [0]), array("I"), array("I"), array("d")
+        n = len(docs)
+        for term in vocab:
+            counts = postings[term]
+            for doc_id in sorted(counts):
+                doc_ids.append(doc_id)
+                tfs.append(counts[doc_id])
+            offsets.append(len(doc_ids))
+            df = len(counts)
+            idf.append(math.log(1 + (n - df + 0.5) / (df + 0.5)))
+
+        avgdl = sum(doc_len) / n if n else 0.0
+        return cls(docs, vocab, offsets, doc_ids, tfs, doc_len, idf, avgdl, fingerprint)
+
+    @classmethod
+    def from_directory(cls, kb_dir: Path = KB_DIR) -> "KBIndex":
+        files = sorted(kb_dir.glob("*.md")) if kb_dir.is_dir() else []
+        docs = [chunk for f in files for chunk in chunk_markdown(f)]
+        return cls.build(docs, _fingerprint(files))
+
+    def search(self, query: str, top_k: int = 3) -> list[dict]:
+        """Best chunks by BM25; ``coverage`` is the fraction of the query's terms a chunk contains."""
+        terms = set(tokenize(query))
+        scores: dict[int, float] = {}
+        matched: dict[int, int] = {}
+        for term in terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            idf = self.idf[term_id]
+            for p in range(self.offsets[term_id], self.offsets[term_id + 1]):
+                doc_id = self.doc_ids[p]
+                tf = self.tfs[p]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + self._norm[doc_id])
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [
+            {"text": self.docs[d]["text"], "score": round(s, 4), "metadata": self.docs[d]["metadata"],
+             "coverage": round(matched[d] / len(terms), 4)}
+            for d, s in best
+        ]
+
+    def save(self, path: str) -> None:
+        """Write the index as a JSON header followed by 8-byte-aligned raw arrays."""
+        arrays = {"offsets": self.offsets, "doc_ids": self.doc_ids, "tfs": self.tfs,
+                  "doc_len": self.doc_len, "idf": self.idf}
+        layout, blobs, pos = {}, [], 0
+        for name, arr in arrays.items():
+            data = arr.tobytes()
+            layout[name] = [arr.typecode, pos, len(arr)]
+            pad = -len(data) % 8
+            blobs.append(data + b"\0" * pad)
+            pos += len(data) + pad
+
+        header = json.dumps({
+            "fingerprint": self.fingerprint,
+            "avgdl": self.avgdl,
+            "vocab": sorted(self.vocab, key=self.vocab.get),
+            "docs": self.docs,
+            "arrays": layout,
+        }).encode()
+        header += b" " * (-(len(_MAGIC) + 4 + len(header)) % 8)
+
+        # A temp file of its own: every worker process may be building the index at once
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_MAGIC + struct.pack("<I", len(header)) + header)
+                for blob in blobs:
+                    f.write(blob)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "KBIndex":
+        """Memory-map a saved index; arrays are views over the mapped file."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"Not a knowledge base index: {path}")
+        (header_len,) = struct.unpack_from("<I", mapped, len(_MAGIC))
+        start = len(_MAGIC) + 4
+        header = json.loads(mapped[start:start + header_len])
+        base = start + header_len
+
+        view = memoryview(mapped)
+        arrays = {}
+        for name, (typecode, offset, count) in header["arrays"].items():
+            size = array(typecode).itemsize * count
+            arrays[name] = view[base + offset:base + offset + size].cast(typecode)
+
+        vocab = {term: i for i, term in enumerate(header["vocab"])}
+        return cls(header["docs"], vocab, arrays["offsets"], arrays["doc_ids"], arrays["tfs"],
+                   arrays["doc_len"], arrays["idf"], header["avgdl"], header["fingerprint"])
+
+
+_index: KBIndex | None = None
+_lock = threading.Lock()
+
+
+def _load_or_build() -> KBIndex:
+    if not KB_INDEX_PATH:
+        return KBIndex.from_directory()
+
+    files = sorted(KB_DIR.glob("*.md")) if KB_DIR.is_dir() else []
+    if os.path.exists(KB_INDEX_PATH):
+        try:
+            index = KBIndex.load(KB_INDEX_PATH)
+            if index.fingerprint == _fingerprint(files):
+                return index
+        except (ValueError, OSError, KeyError):
+            pass
+
+    index = KBIndex.from_directory()
+    index.save(KB_INDEX_PATH)
+    return index
+
+
+def get_index() -> KBIndex:
+    """Process-wide index, built (or memory-mapped) on first use."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = _load_or_build()
+    return _index
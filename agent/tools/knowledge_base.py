@@ -1,22 +1,55 @@
-"""DigitalOcean Knowledge Base RAG retrieval tool."""
+"""Knowledge base RAG retrieval tool.
+
+Queries are answered from the in-process index over knowledge-base/*.md
+(tools.kb_index). The DigitalOcean Knowledge Base at DO_KB_URL is an
+optional fallback for queries the local index answers poorly: no hit, a best
+BM25 score under KB_MIN_SCORE, or a best hit holding under KB_MIN_COVERAGE
+of the query's terms. Its requests go through resilience.get("kb"); when the
+remote lookup fails, the weak local hits are returned uncached.
+"""
 
 import os
-import httpx
+import re
+import logging
+
+import metrics
+import resilience
+from cache import TTLCache
+from http_clients import get_client
+from tools.kb_index import get_index
+from tools.tax_calculator import get_schedule
 
 KB_URL = os.environ.get("DO_KB_URL", "")
 KB_API_KEY = os.environ.get("DO_KB_API_KEY", "")
+KB_MIN_SCORE = float(os.environ.get("KB_MIN_SCORE", 6.0))
+KB_MIN_COVERAGE = float(os.environ.get("KB_MIN_COVERAGE", 0.3))
 
+kb_cache = TTLCache(
+    maxsize=int(os.environ.get("KB_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("KB_CACHE_TTL", 3600)),
+)
 
-def search_knowledge_base(query: str, top_k: int = 3) -> list[dict]:
-    """Search the DO Knowledge Base for relevant tax documents.
+logger = logging.getLogger(__name__)
 
-    Returns list of {text, score, metadata} dicts.
-    """
-    if not KB_URL:
-        return [{"text": "Knowledge base not configured. Using built-in tax data.", "score": 0, "metadata": {}}]
+_WHITESPACE = re.compile(r"\s+")
 
-    try:
-        response = httpx.post(
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", query.strip().lower())
+
+
+def income_band(income: float, filing_status: str | None = "single") -> str:
+    """Bracket-sized income band, so queries don't vary with exact dollars."""
+    low, high = get_schedule(filing_status or "single").bracket_bounds(income)
+    if high == float("inf"):
+        return f"${low:,.0f}+"
+    return f"${low:,.0f}-${high:,.0f}"
+
+
+def search_remote_knowledge_base(query: str, top_k: int = 3) -> list[dict]:
+    """Search the DO Knowledge Base for relevant tax documents. Raises on failure."""
+    def post(timeout: float) -> list[dict]:
+        response = get_client("kb").post(
             f"{KB_URL}/query",
             headers={
                 "Authorization": f"Bearer {KB_API_KEY}",
@@ -26,21 +59,55 @@ def search_knowledge_base(query: str, top_k: int = 3) -> list[dict]:
                 "query": query,
                 "top_k": top_k,
             },
-            timeout=10,
+            timeout=timeout,
         )
         response.raise_for_status()
         return response.json().get("results", [])
+
+    return resilience.get("kb").call(post)
+
+
+def answers(results: list[dict]) -> bool:
+    """Whether local hits are good enough to skip the remote KB."""
+    return bool(results) and results[0]["score"] >= KB_MIN_SCORE and results[0]["coverage"] >= KB_MIN_COVERAGE
+
+
+def _search(query: str, top_k: int) -> list[dict]:
+    results = get_index().search(query, top_k)
+    if not KB_URL or answers(results):
+        return results
+    return search_remote_knowledge_base(query, top_k)
+
+
+def search_knowledge_base(query: str, top_k: int = 3) -> list[dict]:
+    """Search the tax knowledge base for relevant passages.
+
+    Returns list of {text, score, metadata} dicts. Results are cached by
+    normalized query; failed remote lookups are not cached.
+    """
+    query = normalize_query(query)
+    try:
+        return kb_cache.get_or_compute((query, top_k), lambda: _search(query, top_k))
     except Exception as e:
-        return [{"text": f"KB query failed: {str(e)}", "score": 0, "metadata": {}}]
+        logger.warning("KB query failed: %s", e)
+        metrics.FALLBACKS.inc(node="knowledge_base")
+        return get_index().search(query, top_k) or [{"text": f"KB query failed: {str(e)}", "score": 0, "metadata": {}}]
 
 
 def get_deduction_info(category: str) -> str:
     """Get detailed info about a specific deduction category."""
-    results = search_knowledge_base(f"IRS deduction {category} eligibility requirements limits")
+    results = search_knowledge_base(f"IRS deduction {normalize_query(category)} eligibility requirements limits")
     return "\n".join(r.get("text", "") for r in results[:2])
 
 
 def get_credit_info(credit_name: str) -> str:
     """Get detailed info about a specific tax credit."""
-    results = search_knowledge_base(f"IRS tax credit {credit_name} eligibility amount phase-out")
+    results = search_knowledge_base(f"IRS tax credit {normalize_query(credit_name)} eligibility amount phase-out")
     return "\n".join(r.get("text", "") for r in results[:2])
+
+
+metrics.REGISTRY.add_collector(
+    lambda: metrics.stats_gauges("taxpilot_cache", "cache", {"kb": kb_cache.stats()}, (
+        "size", "hits", "misses", "coalesced", "evictions", "expirations", "hit_ratio",
+    ))
+)
@@ -0,0 +1,126 @@
+"""What-if scenarios: price many filing alternatives for one return at once.
+
+A Scenario changes some of a return's inputs (filing status, standard vs
+itemized deduction, extra deductions, credits or withholding) and
+``evaluate_scenarios`` computes a whole grid of them with one vectorized call
+into ``tools.tax_batch``, following the same arithmetic as form_builder_node.
+Results are ranked by estimated refund, with each scenario's savings measured
+against the return as filed.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from typing import NamedTuple
+
+import numpy as np
+
+from tools.tax_batch import FILING_STATUSES, FILING_STATUS_CODES, calculate_federal_tax_batch
+from tools.tax_calculator import DEFAULT_TAX_YEAR, get_standard_deduction
+
+MARRIED_STATUSES = ("married_filing_jointly", "married_filing_separately")
+
+
+@lru_cache(maxsize=None)
+def _standard(tax_year: int) -> np.ndarray:
+    """Standard deduction by filing status code."""
+    return np.array([get_standard_deduction(name, tax_year) for name in FILING_STATUSES], dtype=np.float64)
+
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    filing_status: str | None = None  # None keeps the return's filing status
+    use_standard: bool | None = None  # None takes the larger of standard and itemized
+    extra_deductions: float = 0.0     # added to the itemized total
+    extra_credits: float = 0.0
+    extra_withholding: float = 0.0
+
+    def describe(self, filing_status: str) -> str:
+        parts = [(self.filing_status or filing_status).replace("_", " ").capitalize()]
+        if self.use_standard is not None:
+            parts.append("standard deduction" if self.use_standard else "itemized deductions")
+        if self.extra_deductions:
+            parts.append(f"+${self.extra_deductions:,.0f} deductions")
+        if self.extra_credits:
+            parts.append(f"+${self.extra_credits:,.0f} credits")
+        if self.extra_withholding:
+            parts.append(f"{'+' if self.extra_withholding > 0 else '-'}${abs(self.extra_withholding):,.0f} withholding")
+        return ", ".join(parts)
+
+
+class ScenarioResult(NamedTuple):
+    scenario: Scenario
+    filing_status: str
+    use_standard: bool
+    deduction: float
+    taxable_income: float
+    federal_tax: float
+    estimated_refund: float
+    savings: float  # estimated_refund minus the refund as filed
+
+    @property
+    def label(self) -> str:
+        return self.scenario.describe(self.filing_status)
+
+
+def scenario_grid(filing_statuses=(None,), use_standard=(None,), extra_deductions=(0.0,),
+                  extra_credits=(0.0,), extra_withholding=(0.0,)) -> list[Scenario]:
+    """Every combination of the given variations."""
+    return [
+        Scenario(*values)
+        for values in product(filing_statuses, use_standard, extra_deductions, extra_credits, extra_withholding)
+    ]
+
+
+def eligible_filing_statuses(state: dict) -> tuple[str, ...]:
+    """Filing statuses worth comparing for this filer, the current one first."""
+    filing_status = state.get("filing_status") or "single"
+    if filing_status in MARRIED_STATUSES:
+        return (filing_status, *(s for s in MARRIED_STATUSES if s != filing_status))
+    if filing_status == "single" and state.get("dependents", 0) > 0:
+        return filing_status, "head_of_household"
+    return (filing_status,)
+
+
+def evaluate_scenarios(state: dict, scenarios: list[Scenario],
+                       tax_year: int = DEFAULT_TAX_YEAR) -> list[ScenarioResult]:
+    """Price each scenario against the state's return, best refund first."""
+    filing_status = state.get("filing_status") or "single"
+    # Row 0 is the return as filed, the baseline for savings
+    rows = [Scenario(use_standard=state.get("use_standard", True)), *scenarios]
+
+    try:
+        codes = np.array([FILING_STATUS_CODES[s.filing_status or filing_status] for s in rows], dtype=np.intp)
+    except KeyError as e:
+        raise ValueError(f"Unknown filing status: {e.args[0]}") from None
+    use_standard = np.array([s.use_standard is not False for s in rows])
+    choose = np.array([s.use_standard is None for s in rows])
+    extra = np.array([(s.extra_deductions, s.extra_credits, s.extra_withholding) for s in rows],
+                     dtype=np.float64).reshape(len(rows), 3)
+
+    standard = _standard(tax_year)[codes]
+    itemized = state.get("itemized_total", 0) + extra[:, 0]
+    use_standard = np.where(choose, standard >= itemized, use_standard)
+    deduction = np.where(use_standard, standard, itemized)
+    taxable = np.maximum(0.0, state.get("total_income", 0) - deduction)
+
+    federal_tax = calculate_federal_tax_batch(taxable, codes, tax_year)["federal_tax"]
+    tax_after_credits = np.maximum(0.0, federal_tax - (state.get("credits", 0) + extra[:, 1]))
+    refund = state.get("total_withheld", 0) + extra[:, 2] - tax_after_credits
+
+    savings = np.round(refund - refund[0], 2)
+
+    # Best refund first; ties keep the order the scenarios were given in
+    order = np.argsort(-refund[1:], kind="stable") + 1
+    return [
+        ScenarioResult(rows[i], FILING_STATUSES[code], std, ded, income, tax, ref, saved)
+        for i, code, std, ded, income, tax, ref, saved in zip(
+            order.tolist(), codes[order].tolist(), use_standard[order].tolist(), deduction[order].tolist(),
+            taxable[order].tolist(), federal_tax[order].tolist(), refund[order].tolist(), savings[order].tolist(),
+        )
+    ]
+
+
+def filing_alternatives(state: dict, tax_year: int = DEFAULT_TAX_YEAR) -> list[ScenarioResult]:
+    """Ranked comparison of the filer's eligible filing statuses, each with its best deduction."""
+    return evaluate_scenarios(state, scenario_grid(eligible_filing_statuses(state)), tax_year)
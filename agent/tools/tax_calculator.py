@@ -1,81 +1,46 @@
-"""Tax bracket computation for 2025 federal income tax."""
+"""Tax bracket computation for federal income tax.
 
-# 2025 Federal Tax Brackets
-BRACKETS: dict[str, list[tuple[float, float, float]]] = {
-    "single": [
-        (0, 11925, 0.10),
-        (11925, 48475, 0.12),
-        (48475, 103350, 0.22),
-        (103350, 197300, 0.24),
-        (197300, 250525, 0.32),
-        (250525, 626350, 0.35),
-        (626350, float("inf"), 0.37),
-    ],
-    "married_filing_jointly": [
-        (0, 23850, 0.10),
-        (23850, 96950, 0.12),
-        (96950, 206700, 0.22),
-        (206700, 394600, 0.24),
-        (394600, 501050, 0.32),
-        (501050, 751600, 0.35),
-        (751600, float("inf"), 0.37),
-    ],
-    "married_filing_separately": [
-        (0, 11925, 0.10),
-        (11925, 48475, 0.12),
-        (48475, 103350, 0.22),
-        (103350, 197300, 0.24),
-        (197300, 250525, 0.32),
-        (250525, 375800, 0.35),
-        (375800, float("inf"), 0.37),
-    ],
-    "head_of_household": [
-        (0, 17000, 0.10),
-        (17000, 64850, 0.12),
-        (64850, 103350, 0.22),
-        (103350, 197300, 0.24),
-        (197300, 250500, 0.32),
-        (250500, 626350, 0.35),
-        (626350, float("inf"), 0.37),
-    ],
-    "qualifying_widow": [
-        (0, 23850, 0.10),
-        (23850, 96950, 0.12),
-        (96950, 206700, 0.22),
-        (206700, 394600, 0.24),
-        (394600, 501050, 0.32),
-        (501050, 751600, 0.35),
-        (751600, float("inf"), 0.37),
-    ],
-}
+Brackets and standard deductions come from the table registry in
+``tools.tax_tables``, one table per tax year and jurisdiction.
+"""
 
+from functools import lru_cache
+
+# Tables and their compiled form live in the registry; re-exported for callers
+from tools.tax_tables import DEFAULT_TAX_YEAR, FEDERAL, BracketSchedule, TaxResult, get_table
+
+
+@lru_cache(maxsize=None)
+def get_schedule(filing_status: str = "single", tax_year: int = DEFAULT_TAX_YEAR) -> BracketSchedule:
+    """Return the compiled federal schedule, loading the year's table on first use."""
+    return get_table(tax_year, FEDERAL).schedule(filing_status)
 
-def calculate_federal_tax(taxable_income: float, filing_status: str = "single") -> float:
-    """Calculate federal income tax using progressive brackets."""
-    brackets = BRACKETS.get(filing_status, BRACKETS["single"])
-    tax = 0.0
 
-    for low, high, rate in brackets:
-        if taxable_income <= low:
-            break
-        bracket_income = min(taxable_income, high) - low
-        tax += bracket_income * rate
+def get_standard_deduction(filing_status: str = "single", tax_year: int = DEFAULT_TAX_YEAR,
+                           jurisdiction: str = FEDERAL) -> float:
+    """Standard deduction for the filing status, from the registry."""
+    return get_table(tax_year, jurisdiction).standard_deduction(filing_status)
 
-    return round(tax, 2)
+
+def calculate_federal_tax(taxable_income: float, filing_status: str = "single",
+                          tax_year: int = DEFAULT_TAX_YEAR) -> float:
+    """Calculate federal income tax using progressive brackets."""
+    return get_schedule(filing_status, tax_year).evaluate(taxable_income).tax
 
 
-def calculate_effective_rate(taxable_income: float, filing_status: str = "single") -> float:
+def calculate_effective_rate(taxable_income: float, filing_status: str = "single",
+                             tax_year: int = DEFAULT_TAX_YEAR) -> float:
     """Calculate effective tax rate."""
-    if taxable_income <= 0:
-        return 0.0
-    tax = calculate_federal_tax(taxable_income, filing_status)
-    return tax / taxable_income
+    return get_schedule(filing_status, tax_year).evaluate(taxable_income).effective_rate
 
 
-def calculate_marginal_rate(taxable_income: float, filing_status: str = "single") -> float:
+def calculate_marginal_rate(taxable_income: float, filing_status: str = "single",
+                            tax_year: int = DEFAULT_TAX_YEAR) -> float:
     """Get the marginal tax rate for the given income."""
-    brackets = BRACKETS.get(filing_status, BRACKETS["single"])
-    for low, high, rate in brackets:
-        if taxable_income <= high:
-            return rate
-    return 0.37  # Top bracket
+    return get_schedule(filing_status, tax_year).evaluate(taxable_income).marginal_rate
+
+
+def calculate_state_tax(taxable_income: float, jurisdiction: str, filing_status: str = "single",
+                        tax_year: int = DEFAULT_TAX_YEAR) -> float:
+    """State income tax from the state's table; ValueError if the registry has none."""
+    return get_table(tax_year, jurisdiction).schedule(filing_status).tax(taxable_income)
@@ -0,0 +1,168 @@
+"""Registry of bracket and standard-deduction tables by tax year and jurisdiction.
+
+Each table is one JSON file, ``tax_tables/<year>/<jurisdiction>.json``
+(TAX_TABLES_DIR), where the jurisdiction is ``US`` for federal tax or a
+state's two-letter code. The file holds:
+
+- ``brackets``: per filing status, ``[lower bound, rate]`` pairs from 0 up.
+  A string value names the status whose brackets it shares, and ``"*"``
+  covers every status not listed.
+- ``standard_deduction``: per filing status (or ``"*"``). Left out when the
+  jurisdiction has none.
+- ``source``: where the figures come from.
+
+Nothing is read at import. ``get_table`` parses and compiles a table the
+first time it is asked for, and the compiled table is shared by every session
+in the process. A year or state that is never used costs only its file on
+disk.
+"""
+
+import os
+import json
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+TAX_TABLES_DIR = Path(os.environ.get("TAX_TABLES_DIR", Path(__file__).resolve().parents[1] / "tax_tables"))
+
+DEFAULT_TAX_YEAR = 2025
+FEDERAL = "US"
+
+# Filing statuses every table covers, in the order the batch API codes them
+FILING_STATUSES: tuple[str, ...] = (
+    "single",
+    "married_filing_jointly",
+    "married_filing_separately",
+    "head_of_household",
+    "qualifying_widow",
+)
+
+
+class TaxResult(NamedTuple):
+    tax: float
+    marginal_rate: float
+    effective_rate: float
+
+
+@dataclass(frozen=True, slots=True)
+class BracketSchedule:
+    """Compiled bracket table for one (tax year, filing status).
+
+    ``base_tax[i]`` is the tax owed on income up to ``lows[i]``, accumulated in
+    bracket order so results match the progressive sum exactly.
+    """
+
+    tax_year: int
+    filing_status: str
+    lows: tuple[float, ...]
+    rates: tuple[float, ...]
+    base_tax: tuple[float, ...]
+
+    @classmethod
+    def compile(cls, tax_year: int, filing_status: str,
+                brackets: list[tuple[float, float]]) -> "BracketSchedule":
+        """Compile ``(lower bound, rate)`` pairs; each bracket ends where the next starts."""
+        lows = tuple(low for low, _ in brackets)
+        rates = tuple(rate for _, rate in brackets)
+        base_tax = []
+        tax = 0.0
+        for i, (low, rate) in enumerate(zip(lows, rates)):
+            base_tax.append(tax)
+            if i + 1 < len(lows):
+                tax += (lows[i + 1] - low) * rate
+        return cls(tax_year, filing_status, lows, rates, tuple(base_tax))
+
+    def evaluate(self, taxable_income: float) -> TaxResult:
+        """Tax, marginal rate and effective rate from a single bisect."""
+        # Bracket holding the last dollar; -1 when income <= 0
+        i = bisect_left(self.lows, taxable_income) - 1
+        if i < 0:
+            return TaxResult(0.0, self.rates[0], 0.0)
+        tax = round(self.base_tax[i] + (taxable_income - self.lows[i]) * self.rates[i], 2)
+        return TaxResult(tax, self.rates[i], tax / taxable_income)
+
+    def tax(self, taxable_income: float) -> float:
+        return self.evaluate(taxable_income).tax
+
+    def bracket_bounds(self, taxable_income: float) -> tuple[float, float]:
+        """(low, high) edges of the bracket holding the last dollar."""
+        i = max(0, bisect_left(self.lows, taxable_income) - 1)
+        high = self.lows[i + 1] if i + 1 < len(self.lows) else float("inf")
+        return self.lows[i], high
+
+
+@dataclass(frozen=True, slots=True)
+class TaxTable:
+    """One jurisdiction's compiled schedules and standard deductions for a tax year."""
+
+    tax_year: int
+    jurisdiction: str
+    schedules: dict[str, BracketSchedule]
+    standard_deductions: dict[str, float]
+    source: str = ""
+
+    def schedule(self, filing_status: str) -> BracketSchedule:
+        schedule = self.schedules.get(filing_status)
+        if schedule is None:
+            raise ValueError(f"Unknown filing status: {filing_status}")
+        return schedule
+
+    def standard_deduction(self, filing_status: str) -> float:
+        if filing_status not in self.schedules:
+            raise ValueError(f"Unknown filing status: {filing_status}")
+        return self.standard_deductions.get(filing_status, 0.0)
+
+
+def _by_status(values: dict, what: str, path: Path) -> dict:
+    """Expand ``"*"`` and status-name references to one entry per filing status."""
+    resolved = {}
+    for filing_status in FILING_STATUSES:
+        value = values.get(filing_status, values.get("*"))
+        if isinstance(value, str):
+            value = values.get(value)
+        if value is None:
+            raise ValueError(f"{path}: no {what} for {filing_status}")
+        resolved[filing_status] = value
+    return resolved
+
+
+def table_path(tax_year: int, jurisdiction: str = FEDERAL) -> Path:
+    return TAX_TABLES_DIR / str(tax_year) / f"{jurisdiction.upper()}.json"
+
+
+def get_table(tax_year: int = DEFAULT_TAX_YEAR, jurisdiction: str = FEDERAL) -> TaxTable:
+    """Return the compiled table, loading it on first use."""
+    return _load(tax_year, jurisdiction.upper())
+
+
+@lru_cache(maxsize=None)
+def _load(tax_year: int, jurisdiction: str) -> TaxTable:
+    path = table_path(tax_year, jurisdiction)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"No tax table for {jurisdiction} in tax year {tax_year}") from None
+
+    schedules = {
+        filing_status: BracketSchedule.compile(tax_year, filing_status, pairs)
+        for filing_status, pairs in _by_status(data["brackets"], "brackets", path).items()
+    }
+    deductions = data.get("standard_deduction")
+    standard_deductions = {
+        filing_status: float(amount) for filing_status, amount in _by_status(deductions, "standard deduction", path).items()
+    } if deductions else {}
+    return TaxTable(tax_year, jurisdiction, schedules, standard_deductions, data.get("source", ""))
+
+
+@lru_cache(maxsize=None)
+def available() -> dict[int, tuple[str, ...]]:
+    """Jurisdictions with a table on disk, by tax year. Lists files without reading them."""
+    if not TAX_TABLES_DIR.is_dir():
+        return {}
+    return {
+        int(year.name): tuple(sorted(path.stem for path in year.glob("*.json")))
+        for year in sorted(TAX_TABLES_DIR.iterdir()) if year.is_dir() and year.name.isdigit()
+    }
@@ -94,6 +94,13 @@ CREATE TABLE IF NOT EXISTS chat_messages (
   created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- Agent conversation state (session_id is tax_sessions.id when the web app starts the session)
+CREATE TABLE IF NOT EXISTS agent_sessions (
+  session_id VARCHAR(64) PRIMARY KEY,
+  state BYTEA NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
 -- Audit log
 CREATE TABLE IF NOT EXISTS audit_log (
   id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -112,3 +119,4 @@ CREATE INDEX IF NOT EXISTS idx_review_items_session ON review_items(session_id);
 CREATE INDEX IF NOT EXISTS idx_review_items_status ON review_items(status);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id);
 CREATE INDEX IF NOT EXISTS idx_audit_log_session ON audit_log(session_id);
+CREATE INDEX IF NOT EXISTS idx_agent_sessions_updated ON agent_sessions(updated_at);